@@ -0,0 +1,119 @@
+import json
+import os
+
+import geopandas as gpd
+import numpy as np
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Rows per Parquet row group. Rows are Hilbert-sorted, so each group covers
+# a compact area and a bbox read can skip most of them.
+ROW_GROUP_SIZE = 5000
+
+
+def parquet_path(path):
+    """GeoParquet artifact next to a .geojson name (or the path itself)."""
+    root, ext = os.path.splitext(path)
+    return root + ".parquet" if ext.lower() == ".geojson" else path
+
+
+def _is_list(value):
+    return isinstance(value, (list, tuple, np.ndarray))
+
+
+def _is_null(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def _arrow_safe(gdf):
+    """
+    Arrow needs one type per column. OSM tags mix scalars and lists (osmid
+    is an int or a list of ints): such columns are stored as strings, with
+    lists as JSON, the same text the GeoJSON export carried.
+    """
+    for column in gdf.columns:
+        if column == gdf.geometry.name or gdf[column].dtype != object:
+            continue
+        values = gdf[column]
+        has_list = values.map(_is_list).any()
+        has_scalar = values.map(lambda v: not _is_list(v) and not _is_null(v)).any()
+        if has_list and has_scalar:
+            gdf[column] = values.map(lambda v: json.dumps(np.asarray(v).tolist()) if _is_list(v)
+                                     else None if _is_null(v) else str(v))
+    return gdf
+
+
+def write_artifact(gdf, path, sort=True):
+    """
+    Writes a layer as GeoParquet: named index levels (osmnx u/v/key) become
+    columns, rows are Hilbert-sorted and a bbox covering column is added so
+    read_artifact(bbox=...) can filter row groups. Written through a temp
+    file and rename.
+    """
+    gdf = gdf.to_crs(epsg=4326) if gdf.crs is not None else gdf.set_crs(epsg=4326)
+    if any(name is not None for name in gdf.index.names):
+        gdf = gdf.reset_index()
+    else:
+        gdf = gdf.reset_index(drop=True)
+    gdf = _arrow_safe(gdf.copy())
+    if sort and len(gdf) > 1:
+        gdf = gdf.iloc[np.argsort(gdf.hilbert_distance().to_numpy(), kind="stable")].reset_index(drop=True)
+
+    tmp_path = path + ".tmp"
+    gdf.to_parquet(tmp_path, index=False, compression="zstd", row_group_size=ROW_GROUP_SIZE,
+                   write_covering_bbox=True)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_artifact(path, columns=None, bbox=None):
+    """
+    Reads a GeoParquet artifact in EPSG:4326. `columns` limits the
+    attributes read (geometry is always included); `bbox` (minx, miny,
+    maxx, maxy) only returns rows whose bounding box intersects it, reading
+    just the row groups that can match.
+    """
+    names = pq.read_schema(path).names
+    if columns is None:
+        columns = [c for c in names if c != "bbox"]
+    else:
+        columns = [c for c in columns if c in names and c not in ("geometry", "bbox")] + ["geometry"]
+    filters = None
+    if bbox is not None:
+        minx, miny, maxx, maxy = bbox
+        filters = ((pc.field("bbox", "xmin") <= maxx) & (pc.field("bbox", "xmax") >= minx)
+                   & (pc.field("bbox", "ymin") <= maxy) & (pc.field("bbox", "ymax") >= miny))
+    # Artifacts are always written in EPSG:4326, so the CRS is attached
+    # directly instead of parsing the stored PROJJSON, which costs more than
+    # reading a whole small layer
+    df = pq.read_table(path, columns=columns, filters=filters).to_pandas()
+    return gpd.GeoDataFrame(df, geometry=gpd.GeoSeries.from_wkb(df.pop("geometry")), crs=4326)
+
+
+def export_geojson(gdf, path):
+    """Optional GeoJSON export of an artifact (for clients that need the file)."""
+    if os.path.exists(path):
+        os.remove(path)
+    gdf.to_file(path, driver="GeoJSON")
+    return path
+
+
+def load_layer(name, columns=None, bbox=None):
+    """
+    A layer by its .geojson name: the GeoParquet artifact when there is one
+    (canonical), else the GeoJSON file itself.
+    """
+    path = parquet_path(name)
+    if os.path.exists(path):
+        return read_artifact(path, columns, bbox)
+    gdf = gpd.read_file(name, bbox=bbox)
+    if columns is not None:
+        gdf = gdf[[c for c in columns if c in gdf.columns and c != "geometry"] + ["geometry"]]
+    return gdf if gdf.crs is not None else gdf.set_crs(epsg=4326)
+
+
+def save_layer(gdf, name, geojson=False):
+    """Writes the artifact of a layer, plus its GeoJSON export if asked."""
+    write_artifact(gdf, parquet_path(name))
+    if geojson:
+        export_geojson(gdf, name)
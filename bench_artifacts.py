@@ -0,0 +1,66 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import geopandas as gpd
+
+from artifacts import read_artifact, write_artifact
+
+# Committed layers, largest first
+LAYERS = ["project8_roads.geojson", "flood_clipped.geojson", "qc_boundary.geojson"]
+
+# Attributes routing and the vector tiles actually read from the roads
+ROAD_COLUMNS = ["u", "v", "length", "risk_level"]
+
+
+def best_time(fn, repeats=5):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), out
+
+
+def quarter_bbox(bounds):
+    """South-west quarter of a layer's extent: a typical viewport/tile read."""
+    minx, miny, maxx, maxy = bounds
+    return minx, miny, (minx + maxx) / 2, (miny + maxy) / 2
+
+
+def main(out_dir):
+    warnings.filterwarnings("ignore", message="Could not parse column")
+    print(f"{'layer':<24} {'read':<30} {'bytes':>11} {'rows':>6} {'best ms':>9}")
+    for name in LAYERS:
+        parquet = os.path.join(out_dir, os.path.basename(name).replace(".geojson", ".parquet"))
+        gdf = gpd.read_file(name)
+        write_artifact(gdf, parquet)
+        bbox = quarter_bbox(gdf.total_bounds)
+        geojson_size, parquet_size = os.path.getsize(name), os.path.getsize(parquet)
+
+        def json_load():
+            with open(name) as f:
+                return json.load(f)["features"]
+
+        cases = [
+            ("GeoJSON json.load", geojson_size, json_load),
+            ("GeoJSON gpd.read_file", geojson_size, lambda: gpd.read_file(name)),
+            ("Parquet full", parquet_size, lambda: read_artifact(parquet)),
+            ("Parquet bbox (1/4 extent)", parquet_size, lambda: read_artifact(parquet, bbox=bbox)),
+        ]
+        if "roads" in name:
+            cases.append(("Parquet routing columns", parquet_size, lambda: read_artifact(parquet, ROAD_COLUMNS)))
+            cases.append(("GeoJSON routing columns", geojson_size, lambda: gpd.read_file(name, columns=ROAD_COLUMNS)))
+
+        for label, size, fn in cases:
+            seconds, out = best_time(fn)
+            print(f"{os.path.basename(name):<24} {label:<30} {size:>11,} {len(out):>6} {seconds * 1000:9.1f}")
+        print()
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        main(sys.argv[1] if len(sys.argv) > 1 else tmp)
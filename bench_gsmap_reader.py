@@ -0,0 +1,66 @@
+import gzip
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from gsmap_reader import GSMAP_COLS, GSMAP_ROWS, lat_to_idx, lon_to_idx, read_window
+
+# Windows the app and the scan scripts actually read
+WINDOWS = {
+    "Quezon City": (lat_to_idx(14.8), lat_to_idx(14.6), lon_to_idx(121.0), lon_to_idx(121.2)),
+    "QC context": (lat_to_idx(15.0), lat_to_idx(14.0) + 1, lon_to_idx(120.5), lon_to_idx(121.5) + 1),
+    "Philippines": (lat_to_idx(20), lat_to_idx(5), lon_to_idx(115), lon_to_idx(130)),
+}
+
+
+def full_read(path, row_start, row_stop, col_start, col_stop):
+    """Previous approach: decompress the whole globe, then slice."""
+    with gzip.open(path, 'rb') as f:
+        data = np.frombuffer(f.read(), dtype='<f4').reshape(GSMAP_ROWS, GSMAP_COLS)
+    return data[row_start:row_stop, col_start:col_stop].copy()
+
+
+def make_synthetic_frame(path):
+    """Global frame with realistic compressibility (mostly dry cells)."""
+    rng = np.random.default_rng(0)
+    grid = np.zeros((GSMAP_ROWS, GSMAP_COLS), dtype='<f4')
+    wet = rng.random(grid.shape) < 0.15
+    grid[wet] = rng.gamma(1.5, 2.0, wet.sum())
+    with gzip.open(path, 'wb') as f:
+        f.write(grid.tobytes())
+
+
+def measure(fn, path, window, repeats=5):
+    """Returns (best time s, peak traced bytes, output)."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = fn(path, *window)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn(path, *window)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak, out
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        frame = sys.argv[1]
+    else:
+        frame = os.path.join(tempfile.gettempdir(), "gsmap_bench.dat.gz")
+        make_synthetic_frame(frame)
+    print(f"Frame: {frame}")
+
+    for label, window in WINDOWS.items():
+        before = measure(full_read, frame, window)
+        after = measure(read_window, frame, window)
+        same = np.array_equal(before[2], after[2], equal_nan=True)
+        print(f"\n{label}: rows {window[0]}-{window[1]}, cols {window[2]}-{window[3]} (identical: {same})")
+        for name, (best, peak, _) in [("before (full read)", before), ("after (read_window)", after)]:
+            print(f"  {name:<20} {best * 1000:8.1f} ms   peak {peak / 1e6:7.2f} MB")
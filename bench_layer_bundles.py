@@ -0,0 +1,105 @@
+import http.client
+import json
+import os
+import sys
+import time
+from urllib.parse import urlparse
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine
+
+from layer_cache import LayerCache
+
+# Layers that dominate page load, with the table behind each
+LAYERS = {
+    "/flood_clipped.geojson": "flood_hazard",
+    "/project8_roads.geojson": "roads",
+    "/qc_boundary.geojson": "qc_boundary",
+}
+
+# Served by the running server from the layer cache, by Accept-Encoding
+SCENARIOS = [
+    ("after (identity)", "identity"),
+    ("after (gzip)", "gzip"),
+    ("after (br)", "br"),
+]
+
+
+def measure(base_url, path, accept_encoding, repeats=5):
+    """
+    Requests a layer and returns (bytes on wire, median TTFB s, median total s, content-encoding).
+    """
+    url = urlparse(base_url)
+    ttfbs, totals = [], []
+    size, encoding = 0, "identity"
+    for _ in range(repeats):
+        conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+        start = time.perf_counter()
+        conn.request("GET", path, headers={"Accept-Encoding": accept_encoding})
+        resp = conn.getresponse()
+        # getresponse() returns once the status line and headers arrived
+        first = resp.read(1)
+        ttfbs.append(time.perf_counter() - start)
+        body = first + resp.read()
+        totals.append(time.perf_counter() - start)
+        size = len(body)
+        encoding = resp.getheader("Content-Encoding", "identity")
+        conn.close()
+    ttfbs.sort()
+    totals.sort()
+    return size, ttfbs[len(ttfbs) // 2], totals[len(totals) // 2], encoding
+
+
+def warm(base_url, path, timeout=60.0):
+    """
+    Requests a layer until it is served from the layer cache: a cold layer
+    is streamed and compressed in the background, so the first responses
+    are identity only.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if measure(base_url, path, "gzip", repeats=1)[3] == "gzip":
+            return
+        time.sleep(0.2)
+    print(f"{path}: still not cached after {timeout:.0f} s")
+
+
+def measure_before(layer_cache, table_name, repeats=5):
+    """
+    Runs the previous handler in-process: read the table, gdf.to_json(),
+    json.loads() and FastAPI's re-encode of the dict, on every request.
+    Returns (body bytes, median build s); nothing was sent before the body
+    was complete, so the build time is a floor for both TTFB and total.
+    """
+    times = []
+    size = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        gdf = layer_cache.read_gdf(table_name)
+        # default= only for array columns of the local files; PostGIS rows never need it
+        text = gdf.to_json(default=lambda o: o.tolist() if hasattr(o, "tolist") else str(o))
+        body = JSONResponse(jsonable_encoder(json.loads(text))).body
+        times.append(time.perf_counter() - start)
+        size = len(body)
+    times.sort()
+    return size, times[len(times) // 2]
+
+
+def main(base_url):
+    # Same source as the server: PostGIS when DATABASE_URL is set, else the local files
+    database_url = os.getenv("DATABASE_URL")
+    layer_cache = LayerCache(create_engine(database_url) if database_url else None)
+    print(f"Benchmarking {base_url}")
+    print(f"{'layer':<28} {'scenario':<20} {'encoding':<9} {'bytes':>11} {'ttfb ms':>9} {'total ms':>9}")
+    for path, table_name in LAYERS.items():
+        size, build = measure_before(layer_cache, table_name)
+        print(f"{path:<28} {'before (to_json)':<20} {'identity':<9} {size:>11,} {build * 1000:>9.1f} {build * 1000:>9.1f}")
+        warm(base_url, path)
+        for label, accept in SCENARIOS:
+            size, ttfb, total, encoding = measure(base_url, path, accept)
+            print(f"{path:<28} {label:<20} {encoding:<9} {size:>11,} {ttfb * 1000:>9.1f} {total * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8909")
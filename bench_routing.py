@@ -0,0 +1,190 @@
+import argparse
+import heapq
+import time
+import warnings
+from itertools import count
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from artifacts import load_layer
+from landmarks import LANDMARK_COUNT, LandmarkTable
+from routing import RoadGraph, k_shortest_paths, lazy_k_shortest_paths, risk_weights
+
+# Fixed seed, so every run times the same origin/site pairs
+SEED = 20240611
+
+
+def grid_roads(size, spacing=0.001):
+    """size x size street lattice, a stand-in for a city-wide network."""
+    ids = np.arange(size * size).reshape(size, size)
+    u = np.concatenate([ids[:, :-1].ravel(), ids[:-1, :].ravel()])
+    v = np.concatenate([ids[:, 1:].ravel(), ids[1:, :].ravel()])
+    xy = np.column_stack([(ids % size).ravel(), (ids // size).ravel()]) * spacing + (121.0, 14.6)
+    rng = np.random.default_rng(SEED)
+    return gpd.GeoDataFrame({
+        "u": u, "v": v,
+        "length": rng.uniform(80, 140, len(u)),
+        "risk_level": rng.choice([0, 0, 0, 1, 2, 3], len(u)).astype(float),
+    }, geometry=shapely.linestrings(np.stack([xy[u], xy[v]], axis=1)), crs=4326)
+
+
+def pick_queries(graph, n_queries, n_sites):
+    """Random origins, each with the same random set of evacuation site nodes."""
+    rng = np.random.default_rng(SEED)
+    sites = set(rng.choice(graph.n_nodes, n_sites, replace=False).tolist())
+    origins = [int(o) for o in rng.choice(graph.n_nodes, n_queries, replace=False) if o not in sites]
+    return origins, sites
+
+
+# ---------------------------------------------------------------------------
+# Baseline: runYensAlgorithm / runDijkstra from static/dijkstra.js, ported
+# as written (string edge ids, linear neighbour lookups, joined-node hashes)
+# ---------------------------------------------------------------------------
+
+def js_adjacency(graph, weights):
+    """adjacencyList as built by data-loader.js, with weights already baked."""
+    adjacency = {n: [] for n in range(graph.n_nodes)}
+    for arc in range(len(graph.targets)):
+        u = int(np.searchsorted(graph.offsets, arc, side="right") - 1)
+        edge = int(graph.arc_edge[arc])
+        adjacency[u].append({"node": int(graph.targets[arc]), "feature": edge, "weight": float(weights[edge])})
+    return adjacency
+
+
+def js_dijkstra(start, targets, adjacency, excluded_nodes=frozenset(), excluded_edges=frozenset()):
+    if start in excluded_nodes:
+        return None
+    distances, previous, heap = {start: 0.0}, {}, [(0.0, start)]
+    while heap:
+        current_dist, current = heapq.heappop(heap)
+        if current_dist > distances.get(current, float("inf")):
+            continue
+        if current in targets:
+            nodes, features, trace = [], [], current
+            while trace != start:
+                nodes.insert(0, trace)
+                p = previous[trace]
+                features.insert(0, p["feature"])
+                trace = p["node"]
+            nodes.insert(0, start)
+            return {"nodes": nodes, "features": features, "target": current, "cost": distances[current]}
+        for neighbor in adjacency[current]:
+            nxt = neighbor["node"]
+            if nxt in excluded_nodes:
+                continue
+            if f"{current}->{nxt}" in excluded_edges:
+                continue
+            new_dist = current_dist + neighbor["weight"]
+            if new_dist < distances.get(nxt, float("inf")):
+                distances[nxt] = new_dist
+                previous[nxt] = {"node": current, "feature": neighbor["feature"]}
+                heapq.heappush(heap, (new_dist, nxt))
+    return None
+
+
+def js_yen(start, targets, adjacency, k):
+    first = js_dijkstra(start, targets, adjacency)
+    if first is None:
+        return []
+    accepted, candidates, hashes, tie = [first], [], set(), count()
+    for _ in range(1, k):
+        previous = accepted[-1]
+        for i in range(len(previous["nodes"]) - 1):
+            spur_node = previous["nodes"][i]
+            root_nodes = previous["nodes"][:i + 1]
+            root_weight = 0.0
+            for j in range(i):
+                # The first neighbour with that node id: on parallel roads
+                # this can be a dearer one than the path took, which
+                # overprices the candidate
+                u, v = previous["nodes"][j], previous["nodes"][j + 1]
+                root_weight += next(n for n in adjacency[u] if n["node"] == v)["weight"]
+            excluded_edges = set()
+            for path in accepted:
+                if len(path["nodes"]) > i and path["nodes"][:i + 1] == root_nodes:
+                    excluded_edges.add(f"{path['nodes'][i]}->{path['nodes'][i + 1]}")
+                    excluded_edges.add(f"{path['nodes'][i + 1]}->{path['nodes'][i]}")
+            excluded_nodes = set(root_nodes[:-1])
+            spur = js_dijkstra(spur_node, targets, adjacency, excluded_nodes, excluded_edges)
+            if spur:
+                nodes = root_nodes[:-1] + spur["nodes"]
+                path_hash = ",".join(map(str, nodes))
+                if path_hash not in hashes:
+                    path = {"nodes": nodes, "features": previous["features"][:i] + spur["features"],
+                            "target": spur["target"], "cost": root_weight + spur["cost"]}
+                    heapq.heappush(candidates, (path["cost"], next(tie), path))
+                    hashes.add(path_hash)
+        if not candidates:
+            break
+        found = None
+        while candidates:
+            path = heapq.heappop(candidates)[2]
+            path_hash = ",".join(map(str, path["nodes"]))
+            if not any(",".join(map(str, a["nodes"])) == path_hash for a in accepted):
+                found = path
+                break
+        if found is None:
+            break
+        accepted.append(found)
+    return accepted
+
+
+def time_queries(search, origins):
+    times, costs = [], []
+    for origin in origins:
+        start = time.perf_counter()
+        paths = search(origin)
+        times.append(time.perf_counter() - start)
+        costs.append([round(p["cost"] if isinstance(p, dict) else p.cost, 6) for p in paths])
+    return np.array(times) * 1000, costs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Yen k-shortest evacuation routes: baseline vs optimized variants")
+    parser.add_argument("--roads", default="project8_roads.geojson", help="roads layer")
+    parser.add_argument("--grid", type=int, help="use a synthetic grid of this many nodes per side instead")
+    parser.add_argument("--queries", type=int, default=20, help="origins to route from")
+    parser.add_argument("--sites", type=int, default=12, help="evacuation site nodes")
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 5, 10], help="paths per query")
+    parser.add_argument("--landmarks", type=int, default=LANDMARK_COUNT, help="ALT landmarks")
+    parser.add_argument("--no-baseline", action="store_true", help="skip the slow runYensAlgorithm port")
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings("ignore", message="Could not parse column")
+    gdf = grid_roads(args.grid) if args.grid else load_layer(args.roads, ["u", "v", "length", "risk_level"])
+    graph = RoadGraph(gdf, version="bench")
+    # Dry-weather risk weights, as the server bakes them without rainfall
+    weights = risk_weights(graph, np.zeros(graph.n_edges))
+    origins, sites = pick_queries(graph, args.queries, args.sites)
+    print(f"{graph.n_nodes} nodes, {graph.n_edges} edges, {len(origins)} origins, {len(sites)} sites")
+
+    start = time.perf_counter()
+    table = LandmarkTable(graph, weights, args.landmarks)
+    print(f"ALT preprocessing: {len(table.landmarks)} landmarks in {(time.perf_counter() - start) * 1000:.0f} ms, "
+          f"{table.distances.nbytes / 1e6:.1f} MB")
+    adjacency = None if args.no_baseline else js_adjacency(graph, weights)
+
+    for k in args.k:
+        variants = [
+            ("Yen (masks)", lambda o: k_shortest_paths(graph, weights, o, sites, k)),
+            ("Yen + ALT", lambda o: k_shortest_paths(graph, weights, o, sites, k, table)),
+            ("lazy Yen", lambda o: lazy_k_shortest_paths(graph, weights, o, sites, k)),
+        ]
+        if adjacency is not None:
+            variants.insert(0, ("runYensAlgorithm port", lambda o: js_yen(o, sites, adjacency, k)))
+
+        print(f"\nk={k}")
+        print(f"{'search':<22} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'cost diffs':>11}")
+        results = [(label, *time_queries(search, origins)) for label, search in variants]
+        # Path costs are compared with plain Yen on the same weights
+        reference = next(costs for label, _, costs in results if label == "Yen (masks)")
+        for label, ms, costs in results:
+            diffs = sum(a != b for a, b in zip(reference, costs))
+            print(f"{label:<22} {ms.mean():9.1f} {np.percentile(ms, 50):9.1f} {np.percentile(ms, 95):9.1f} "
+                  f"{ms.max():9.1f} {diffs:>11}")
+
+
+if __name__ == "__main__":
+    main()
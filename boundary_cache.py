@@ -0,0 +1,105 @@
+import hashlib
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import geopandas as gpd
+import pyarrow.parquet as pq
+
+BOUNDARY_CACHE_DIR = "cache/boundaries"
+
+
+def district_key(queries):
+    """Cache key of a dissolved district: its sorted barangay queries."""
+    return "district:" + "|".join(sorted(queries))
+
+
+class BoundaryCache:
+    """
+    Geocoded boundaries on disk, one GeoParquet file per query string.
+
+    The file name is a readable slug of the query plus a digest of the exact
+    string, so adding a barangay or a district only geocodes the new queries.
+    Files are written through a temp file and rename, so a worker killed
+    mid-write never leaves an unreadable entry behind.
+    """
+
+    def __init__(self, root=BOUNDARY_CACHE_DIR):
+        self.root = root
+
+    def path(self, query):
+        slug = re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-")[:60]
+        digest = hashlib.sha1(query.encode("utf-8")).hexdigest()[:10]
+        return os.path.join(self.root, f"{slug}-{digest}.parquet")
+
+    def __contains__(self, query):
+        return os.path.exists(self.path(query))
+
+    def get(self, query):
+        """Cached boundary (EPSG:4326 GeoDataFrame), or None."""
+        path = self.path(query)
+        if not os.path.exists(path):
+            return None
+        # Entries are always stored in EPSG:4326; attaching it directly skips
+        # gpd.read_parquet's PROJJSON parse, which is most of a read
+        df = pq.read_table(path).to_pandas()
+        return gpd.GeoDataFrame(df, geometry=gpd.GeoSeries.from_wkb(df.pop("geometry")), crs=4326)
+
+    def put(self, query, gdf):
+        gdf = gdf.to_crs(epsg=4326)
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(query)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        gdf.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+
+    def seed(self, query, geojson_path, overwrite=False):
+        """Stores a committed GeoJSON file under a query. Returns True if it was added."""
+        if query in self and not overwrite:
+            return False
+        self.put(query, gpd.read_file(geojson_path))
+        return True
+
+
+def resolve_boundaries(queries, geocode, cache, workers=4, offline=False, log=print):
+    """
+    Boundaries of many queries: cached ones are read from disk, the rest are
+    geocoded on a bounded thread pool and cached as they arrive.
+
+    Returns ({query: gdf}, {query: error}) with results in input order.
+    With offline=True nothing is geocoded and cache misses are failures.
+    """
+    results, failures = {}, {}
+    missing = []
+    for query in queries:
+        gdf = cache.get(query)
+        if gdf is not None:
+            results[query] = gdf
+        elif offline:
+            failures[query] = "not cached (offline)"
+        else:
+            missing.append(query)
+    if results:
+        log(f"  ✓ {len(results)} boundaries from cache")
+
+    def fetch(query):
+        gdf = geocode(query).to_crs(epsg=4326)
+        cache.put(query, gdf)
+        return gdf
+
+    if missing:
+        log(f"  Geocoding {len(missing)} boundaries ({workers} workers)...")
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(fetch, query): query for query in missing}
+            for future in as_completed(futures):
+                query = futures[future]
+                try:
+                    results[query] = future.result()
+                    log(f"  ✓ Loaded {query}")
+                except Exception as e:
+                    failures[query] = str(e)
+                    log(f"  ✗ Failed to load {query}: {e}")
+
+    ordered = {query: results[query] for query in queries if query in results}
+    return ordered, failures
@@ -0,0 +1,105 @@
+import threading
+
+import numpy as np
+from landmarks import weights_key
+from mc_weights import DEFAULT_MC_WEIGHTS
+from routing import Path, risk_weights, target_tree
+
+# Weightings the field is kept up to date for. "risk" is the live
+# risk-multiplier weighting /route uses outside simulation mode; the others
+# are mcWeights baked with the live rainfall, as in simulation mode.
+FIELD_PRESETS = {
+    "risk": None,
+    "balanced": DEFAULT_MC_WEIGHTS,
+    "shortest": {"length": 0.7, "risk": 0.2, "rainfall": 0.1},
+    "safest": {"length": 0.1, "risk": 0.7, "rainfall": 0.2},
+    "driest": {"length": 0.1, "risk": 0.2, "rainfall": 0.7},
+}
+
+
+def preset_weights(graph, mc_weights, rainfall, scorer):
+    """Baked edge weights of one preset (scorer: EdgeScorer of the same rainfall)."""
+    if mc_weights is None:
+        return risk_weights(graph, rainfall)
+    return scorer.baked(mc_weights)
+
+
+class EvacuationField:
+    """
+    Cost from every node to its nearest evacuation site under one set of
+    edge weights, with the next hop (node and edge) towards that site.
+
+    One multi-source Dijkstra from all sites at once: roads are two-way with
+    equal weights, so the shortest-path tree grown from the sites, read
+    backwards, is every node's best route out. A route is then a walk along
+    the `next` pointers, O(path length). The weights are the same baked
+    vector /route/evacuation uses, so field and route costs agree.
+    """
+
+    def __init__(self, graph, edge_weights, site_nodes):
+        self.version = graph.version
+        self.key = weights_key(edge_weights)
+        self.site_nodes = np.unique(np.asarray(site_nodes, dtype=np.int64))
+        cost, next_node, next_arc, site = target_tree(graph, edge_weights, self.site_nodes)
+        self.cost = cost
+        self.next = next_node.astype(np.int32)
+        self.site = site.astype(np.int32)
+        self.next_edge = np.where(next_arc >= 0, graph.arc_edge[next_arc], -1).astype(np.int32)
+
+    def matches(self, graph, weights_digest, site_nodes):
+        return (self.version == graph.version and self.key == weights_digest
+                and np.array_equal(self.site_nodes, np.unique(site_nodes)))
+
+    def path(self, origin):
+        """Best route from a node index to its nearest site, or None if none is reachable."""
+        if not np.isfinite(self.cost[origin]):
+            return None
+        nodes, edges, node = [origin], [], origin
+        while self.next[node] >= 0:
+            edges.append(int(self.next_edge[node]))
+            node = int(self.next[node])
+            nodes.append(node)
+        return Path(nodes, edges, float(self.cost[origin]), node)
+
+
+class EvacuationFieldStore:
+    """
+    The current EvacuationField of every preset. refresh() is called for
+    each new frame (or roads/sites version) and only rebuilds the presets
+    whose baked weights actually changed: a frame that leaves every edge in
+    the same rainfall class keeps the "risk" field as it is.
+    """
+
+    def __init__(self):
+        self.source_key = None
+        self.frame = None
+        self.sites = []
+        self.site_by_node = {}
+        self._fields = {}
+        self._lock = threading.Lock()
+
+    def refresh(self, graph, weights_by_preset, site_nodes, sites, source_key, frame=None):
+        """Returns the names of the presets that were rebuilt."""
+        rebuilt = []
+        with self._lock:
+            for preset, weights in weights_by_preset.items():
+                field = self._fields.get(preset)
+                if field is None or not field.matches(graph, weights_key(weights), site_nodes):
+                    self._fields[preset] = EvacuationField(graph, weights, site_nodes)
+                    rebuilt.append(preset)
+            # First site wins when two snap to the same node
+            self.site_by_node = {}
+            for i, node in enumerate(site_nodes):
+                self.site_by_node.setdefault(int(node), i)
+            self.sites = sites
+            self.frame = frame
+            self.source_key = source_key
+        return rebuilt
+
+    def get(self, preset):
+        return self._fields.get(preset)
+
+    def site_for(self, node):
+        """The site snapped to a node index, or None."""
+        i = self.site_by_node.get(int(node))
+        return None if i is None else self.sites[i]
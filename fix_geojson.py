@@ -1,69 +1,56 @@
-import json
+import os
 
-def fix_geojson():
-    # 1. Fix District 1 Boundary
-    # I have to reconstruct it carefully because the previous attempt failed.
-    # Looking at the coordinates in Step 730, it seems the MultiPolygon has multiple rings.
-    # The first list in [[[[...]]]] is the main ring.
-    
-    with open('district1_boundary.geojson', 'r') as f:
-        data = json.load(f)
+import numpy as np
+import shapely
+from shapely.geometry import MultiPolygon, Polygon
+
+from artifacts import load_layer, save_layer
+
+# District 1 Boundary Box (Roughly)
+# District 1 is roughly [120.98, 14.61] to [121.06, 14.68]
+# Marikina is much further east (approx 121.10+)
+MIN_LON, MAX_LON = 120.98, 121.06
+MIN_LAT, MAX_LAT = 14.61, 14.70
 
-    for feature in data['features']:
-        if feature['geometry']['type'] == 'MultiPolygon':
-            # Identify the largest polygon by coordinate count (heuristic for main district)
-            polygons = feature['geometry']['coordinates']
-            main_poly_idx = 0
-            max_len = 0
-            for i, poly in enumerate(polygons):
-                if len(poly[0]) > max_len:
-                    max_len = len(poly[0])
-                    main_poly_idx = i
-            
-            # Keep only the main polygon and its outer ring (remove holes)
-            feature['geometry']['coordinates'] = [[polygons[main_poly_idx][0]]]
 
-    with open('district1_boundary.geojson', 'w') as f:
-        json.dump(data, f)
+def _save(gdf, name):
+    # The artifact is canonical; an existing GeoJSON export is kept in sync
+    save_layer(gdf, name, geojson=os.path.exists(name))
+
+
+def fix_geojson():
+    # 1. Fix District 1 Boundary
+    # Keep only the main polygon of each MultiPolygon and its outer ring (remove holes)
+    boundary = load_layer('district1_boundary.geojson')
+
+    def main_polygon(geom):
+        if geom.geom_type != 'MultiPolygon':
+            return geom
+        # Identify the largest polygon by coordinate count (heuristic for main district)
+        largest = max(geom.geoms, key=lambda poly: len(poly.exterior.coords))
+        return MultiPolygon([Polygon(largest.exterior)])
+
+    boundary['geometry'] = boundary.geometry.map(main_polygon)
+    _save(boundary, 'district1_boundary.geojson')
     print("Fixed District 1 Boundary.")
 
     # 2. Fix Road Network (Filtering by District 1 Boundary)
     # We'll use a simple bounding box check first to remove distant clusters like those near Marikina.
-    # District 1 is roughly [120.98, 14.61] to [121.06, 14.68]
-    # Marikina is much further east (approx 121.10+)
-    
-    with open('district1_roads.geojson', 'r') as f:
-        roads_data = json.load(f)
+    # Only the row groups overlapping the box are read from the artifact.
+    name = 'district1_roads.geojson'
+    total = len(load_layer(name, columns=[]))
+    roads = load_layer(name, bbox=(MIN_LON, MIN_LAT, MAX_LON, MAX_LAT))
 
-    # District 1 Boundary Box (Roughly)
-    MIN_LON, MAX_LON = 120.98, 121.06
-    MIN_LAT, MAX_LAT = 14.61, 14.70
+    # Keep roads with at least one vertex inside our rough District 1 box
+    coords, index = shapely.get_coordinates(roads.geometry.values, return_index=True)
+    inside = ((coords[:, 0] >= MIN_LON) & (coords[:, 0] <= MAX_LON)
+              & (coords[:, 1] >= MIN_LAT) & (coords[:, 1] <= MAX_LAT))
+    keep = np.bincount(index[inside], minlength=len(roads)) > 0
+    roads = roads[keep]
 
-    filtered_features = []
-    removed_count = 0
-    for feature in roads_data['features']:
-        coords = feature['geometry']['coordinates']
-        # Check if any part of the road is within our rough District 1 box
-        is_inside = False
-        if feature['geometry']['type'] == 'LineString':
-            for pt in coords:
-                if MIN_LON <= pt[0] <= MAX_LON and MIN_LAT <= pt[1] <= MAX_LAT:
-                    is_inside = True
-                    break
-        elif feature['geometry']['type'] == 'Point':
-            pt = coords
-            if MIN_LON <= pt[0] <= MAX_LON and MIN_LAT <= pt[1] <= MAX_LAT:
-                is_inside = True
-        
-        if is_inside:
-            filtered_features.append(feature)
-        else:
-            removed_count += 1
+    _save(roads, name)
+    print(f"Filtered Road Network: Removed {total - len(roads)} outlier features.")
 
-    roads_data['features'] = filtered_features
-    with open('district1_roads.geojson', 'w') as f:
-        json.dump(roads_data, f)
-    print(f"Filtered Road Network: Removed {removed_count} outlier features.")
 
 if __name__ == "__main__":
     fix_geojson()
@@ -0,0 +1,234 @@
+import datetime
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from gsmap_reader import lat_to_idx, lon_to_idx, read_window
+
+ARCHIVE_DIR = "cache/jaxa/archive"
+
+# (north, south, west, east) kept on ingest: the Philippines with margin,
+# covering every rainscan region
+ARCHIVE_BBOX = (21.0, 4.0, 114.0, 130.0)
+
+KEY_FORMAT = "%Y%m%d%H%M"
+
+
+def frame_key(timestamp):
+    """Index key of a frame time (datetime or already formatted key)."""
+    if isinstance(timestamp, str):
+        return timestamp
+    return timestamp.strftime(KEY_FORMAT)
+
+
+class FrameArchive:
+    """
+    Persistent per-product stack of clipped GSMaP frames.
+
+    Frames are cut to ARCHIVE_BBOX on ingest and appended to one raw
+    little-endian float32 file (slot x rows x cols) that is read back through
+    np.memmap, so a historical window is a slice rather than a download and
+    a gunzip. index.json maps frame time -> slot; slots are content addressed
+    (sha256 of the clipped frame), so identical frames share storage.
+
+    Data is appended before the index is atomically replaced, so a crash
+    never leaves the index pointing at a partial slot.
+    """
+
+    def __init__(self, product="now", root=ARCHIVE_DIR, bbox=ARCHIVE_BBOX):
+        self.product = product
+        self.dir = os.path.join(root, product)
+        self.data_path = os.path.join(self.dir, "frames.f32")
+        self.index_path = os.path.join(self.dir, "index.json")
+        self._lock = threading.Lock()
+        self._index_stamp = None
+        self._mm = None
+        self._load_index(bbox)
+
+    def _new_index(self, bbox):
+        north, south, west, east = bbox
+        row0, row1 = lat_to_idx(north), lat_to_idx(south)
+        col0, col1 = lon_to_idx(west), lon_to_idx(east)
+        return {
+            "bbox": list(bbox),
+            "row0": row0,
+            "col0": col0,
+            "shape": [row1 - row0, col1 - col0],
+            "slots": 0,
+            "frames": {},
+            "digests": {},
+        }
+
+    def _index_file_stamp(self):
+        """
+        Identity of the index file on disk. Every write replaces the file
+        with a new inode, so this changes even when two writes land in the
+        same mtime tick.
+        """
+        stat = os.stat(self.index_path)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load_index(self, bbox=ARCHIVE_BBOX):
+        try:
+            stamp = self._index_file_stamp()
+        except OSError:
+            self.index = self._new_index(bbox)
+            self._index_stamp = None
+            self._mm = None
+            return
+        if stamp == self._index_stamp:
+            return
+        with open(self.index_path) as f:
+            self.index = json.load(f)
+        self._index_stamp = stamp
+        self._mm = None
+
+    def _refresh(self):
+        """Picks up frames ingested by another process."""
+        self._load_index(self.index["bbox"])
+
+    def _write_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+        self._index_stamp = self._index_file_stamp()
+        self._mm = None
+
+    @property
+    def row0(self):
+        return self.index["row0"]
+
+    @property
+    def col0(self):
+        return self.index["col0"]
+
+    @property
+    def shape(self):
+        return tuple(self.index["shape"])
+
+    @property
+    def version(self):
+        """Changes whenever a frame is added (index file identity)."""
+        self._refresh()
+        return self._index_stamp
+
+    def keys(self):
+        """Archived frame keys (YYYYMMDDHHMM), oldest first."""
+        self._refresh()
+        return sorted(self.index["frames"])
+
+    def timestamps(self):
+        """Archived frame times, oldest first."""
+        return [datetime.datetime.strptime(k, KEY_FORMAT) for k in self.keys()]
+
+    def __contains__(self, timestamp):
+        self._refresh()
+        return frame_key(timestamp) in self.index["frames"]
+
+    def __len__(self):
+        self._refresh()
+        return len(self.index["frames"])
+
+    def _stack(self):
+        if self._mm is None:
+            n = self.index["slots"]
+            if n == 0:
+                return np.empty((0,) + self.shape, dtype='<f4')
+            self._mm = np.memmap(self.data_path, dtype='<f4', mode='r', shape=(n,) + self.shape)
+        return self._mm
+
+    def append(self, timestamp, clipped, source=""):
+        """Stores an already clipped (rows x cols) frame. Returns its slot."""
+        clipped = np.ascontiguousarray(clipped, dtype='<f4')
+        if clipped.shape != self.shape:
+            raise ValueError(f"Frame shape {clipped.shape} does not match archive shape {self.shape}")
+
+        key = frame_key(timestamp)
+        digest = hashlib.sha256(clipped.tobytes()).hexdigest()
+        with self._lock:
+            self._refresh()
+            slot = self.index["digests"].get(digest)
+            if slot is None:
+                os.makedirs(self.dir, exist_ok=True)
+                slot = self.index["slots"]
+                frame_bytes = clipped.nbytes
+                with open(self.data_path, "ab") as f:
+                    # Drop a partial slot left by an interrupted append
+                    if f.tell() != slot * frame_bytes:
+                        f.truncate(slot * frame_bytes)
+                    f.write(clipped.tobytes())
+                self.index["slots"] = slot + 1
+                self.index["digests"][digest] = slot
+            self.index["frames"][key] = {"slot": slot, "source": source, "sha256": digest}
+            self._write_index()
+            return slot
+
+    def ingest(self, path, timestamp):
+        """Clips a gzipped global frame to the archive bbox and stores it."""
+        rows, cols = self.shape
+        clipped = read_window(path, self.row0, self.row0 + rows, self.col0, self.col0 + cols)
+        return self.append(timestamp, clipped, os.path.basename(path))
+
+    def frame(self, timestamp):
+        """Memory-mapped (rows x cols) view of one frame, or None."""
+        self._refresh()
+        entry = self.index["frames"].get(frame_key(timestamp))
+        if entry is None:
+            return None
+        return self._stack()[entry["slot"]]
+
+    def source(self, timestamp):
+        entry = self.index["frames"].get(frame_key(timestamp))
+        return entry["source"] if entry else None
+
+    def contains_window(self, row_start, row_stop, col_start, col_stop):
+        rows, cols = self.shape
+        return (self.row0 <= row_start <= row_stop <= self.row0 + rows
+                and self.col0 <= col_start <= col_stop <= self.col0 + cols)
+
+    def window(self, timestamp, row_start, row_stop, col_start, col_stop):
+        """
+        Same result as gsmap_reader.read_window on the original frame, given
+        global lattice rows/cols inside the archive bbox. None if not archived.
+        """
+        if not self.contains_window(row_start, row_stop, col_start, col_stop):
+            raise ValueError("Window is outside the archive bbox")
+        data = self.frame(timestamp)
+        if data is None:
+            return None
+        return data[row_start - self.row0:row_stop - self.row0, col_start - self.col0:col_stop - self.col0]
+
+    def series(self, start, end, row_start, row_stop, col_start, col_stop):
+        """
+        Frames between start and end (inclusive) over a global window.
+        Returns (timestamps, time x rows x cols array).
+        """
+        if not self.contains_window(row_start, row_stop, col_start, col_stop):
+            raise ValueError("Window is outside the archive bbox")
+        self._refresh()
+        lo, hi = frame_key(start), frame_key(end)
+        keys = [k for k in sorted(self.index["frames"]) if lo <= k <= hi]
+        slots = [self.index["frames"][k]["slot"] for k in keys]
+        r = slice(row_start - self.row0, row_stop - self.row0)
+        c = slice(col_start - self.col0, col_stop - self.col0)
+        stack = self._stack()
+        data = stack[slots, r, c] if slots else np.empty((0, row_stop - row_start, col_stop - col_start), dtype='<f4')
+        return [datetime.datetime.strptime(k, KEY_FORMAT) for k in keys], data
+
+
+_archives = {}
+_archives_lock = threading.Lock()
+
+
+def get_archive(product="now", root=ARCHIVE_DIR):
+    """Shared archive per product so memmaps and indexes are reused."""
+    key = (product, root)
+    with _archives_lock:
+        archive = _archives.get(key)
+        if archive is None:
+            archive = _archives[key] = FrameArchive(product, root)
+        return archive
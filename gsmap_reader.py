@@ -0,0 +1,75 @@
+import gzip
+
+import numpy as np
+
+# GSMaP global grid: 1200 rows (60N -> 60S) x 3600 cols (0E -> 360E), little-endian float32
+GSMAP_ROWS = 1200
+GSMAP_COLS = 3600
+ROW_BYTES = GSMAP_COLS * 4
+FRAME_BYTES = GSMAP_ROWS * ROW_BYTES
+
+# Decompressed bytes discarded per read while skipping to the first row
+SKIP_CHUNK = 1 << 20
+
+
+def read_window(source, row_start, row_stop, col_start, col_stop):
+    """
+    Reads grid[row_start:row_stop, col_start:col_stop] from a gzipped GSMaP
+    frame without materializing the globe.
+
+    The file is stream-decompressed: rows above the window are decoded into a
+    small scratch buffer and dropped, the rows of the window are read into one
+    band buffer, and decompression stops right after the last needed row.
+    `source` is a path or an already opened binary file object.
+    """
+    if not (0 <= row_start <= row_stop <= GSMAP_ROWS and 0 <= col_start <= col_stop <= GSMAP_COLS):
+        raise ValueError(f"Window [{row_start}:{row_stop}, {col_start}:{col_stop}] is outside the GSMaP grid")
+
+    n_rows = row_stop - row_start
+    window = np.empty((n_rows, col_stop - col_start), dtype='<f4')
+    if n_rows == 0 or col_start == col_stop:
+        return window
+
+    with gzip.open(source, 'rb') as f:
+        _skip(f, row_start * ROW_BYTES)
+
+        band = np.empty((n_rows, GSMAP_COLS), dtype='<f4')
+        _read_exact(f, memoryview(band).cast('B'))
+
+    # Only the requested byte range of each row is kept
+    window[:] = band[:, col_start:col_stop]
+    return window
+
+
+def read_bbox(source, north, south, west, east):
+    """
+    Reads the cells covering a lat/lon box. Uses the same index convention as
+    the scan scripts: int((60 - lat) / 0.1) and int(lon / 0.1), end exclusive.
+    """
+    return read_window(source, lat_to_idx(north), lat_to_idx(south), lon_to_idx(west), lon_to_idx(east))
+
+
+def lat_to_idx(lat):
+    return int((60.0 - lat) / 0.1)
+
+
+def lon_to_idx(lon):
+    return int(lon / 0.1)
+
+
+def _skip(f, n_bytes):
+    scratch = memoryview(bytearray(min(SKIP_CHUNK, max(n_bytes, 1))))
+    while n_bytes > 0:
+        n = f.readinto(scratch[:min(len(scratch), n_bytes)])
+        if not n:
+            raise EOFError("GSMaP frame ended before the requested rows")
+        n_bytes -= n
+
+
+def _read_exact(f, view):
+    filled = 0
+    while filled < len(view):
+        n = f.readinto(view[filled:])
+        if not n:
+            raise EOFError("GSMaP frame ended before the requested rows")
+        filled += n
@@ -0,0 +1,232 @@
+import datetime
+import ftplib
+import os
+import posixpath
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+JAXA_HOST = "hokusai.eorc.jaxa.jp"
+
+# Remote day directories per GSMaP product
+PRODUCT_DIRS = {
+    "now": "/now/half_hour_G/{year}/{month}/{day}/",
+    "v8": "/standard/v8/hourly/{year}/{month}/{day}/",
+}
+
+# Hours covered by one frame (GSMaP values are mm/h rates)
+PRODUCT_INTERVALS = {
+    "now": 0.5,
+    "v8": 1.0,
+}
+
+# Downloaded frames shared by every tool: cache/jaxa/frames/<product>/<YYYYMMDD>/<file>
+FRAME_CACHE_DIR = "cache/jaxa/frames"
+
+
+def product_dir(product, day):
+    """Remote directory of a product for a date/datetime."""
+    return PRODUCT_DIRS[product].format(year=f"{day.year:04d}", month=f"{day.month:02d}", day=f"{day.day:02d}")
+
+
+def frame_cache_path(product, filename, cache_dir=FRAME_CACHE_DIR):
+    stamp = parse_frame_time(filename)
+    day = stamp.strftime("%Y%m%d") if stamp else "unknown"
+    return os.path.join(cache_dir, product, day, filename)
+
+
+def parse_frame_time(filename):
+    """
+    UTC time of a GSMaP frame from its name, e.g.
+    gsmap_gauge_now.20241023.0600.dat.gz -> 2024-10-23 06:00. None if absent.
+    """
+    parts = filename.split('.')
+    for i, part in enumerate(parts[:-1]):
+        nxt = parts[i + 1]
+        if len(part) == 8 and part.isdigit() and len(nxt) == 4 and nxt.isdigit():
+            try:
+                return datetime.datetime.strptime(part + nxt, "%Y%m%d%H%M")
+            except ValueError:
+                return None
+    return None
+
+
+class FTPSessionPool:
+    """
+    Bounded pool of logged-in FTP sessions. At most `size` sessions exist at
+    once; idle ones are reused instead of reconnecting and logging in again.
+    """
+
+    def __init__(self, host, user, password, size=4, port=21, timeout=60):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.timeout = timeout
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        ftp = ftplib.FTP(timeout=self.timeout)
+        ftp.connect(self.host, self.port)
+        ftp.login(self.user, self.password)
+        return ftp
+
+    @contextmanager
+    def session(self):
+        """
+        Borrows a session. A session that raised is assumed broken and is
+        closed instead of being returned to the pool.
+        """
+        self._slots.acquire()
+        ftp = None
+        try:
+            try:
+                ftp = self._idle.get_nowait()
+            except queue.Empty:
+                ftp = self._connect()
+            yield ftp
+        except BaseException:
+            if ftp is not None:
+                _close_quietly(ftp)
+                ftp = None
+            raise
+        finally:
+            if ftp is not None:
+                self._idle.put(ftp)
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                ftp = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            _close_quietly(ftp)
+
+
+def _close_quietly(ftp):
+    try:
+        ftp.quit()
+    except Exception:
+        ftp.close()
+
+
+def _is_permanent(error):
+    # 5xx replies (e.g. 550 no such file) will not succeed on retry
+    return isinstance(error, ftplib.error_perm)
+
+
+class JaxaFTPClient:
+    """
+    JAXA FTP access shared by the app and the scan tools: pooled sessions,
+    retries with exponential backoff, cached directory listings and
+    concurrent downloads. Paths are absolute, so sessions carry no cwd state.
+    """
+
+    def __init__(self, host=JAXA_HOST, user="", password="", port=21, pool_size=4,
+                 retries=3, backoff=1.0, listing_ttl=300, timeout=60):
+        self.pool = FTPSessionPool(host, user, password, size=pool_size, port=port, timeout=timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.listing_ttl = listing_ttl
+        self._listings = {}
+        self._listings_lock = threading.Lock()
+
+    def _call(self, fn):
+        """Runs fn(ftp) on a pooled session, retrying transient failures."""
+        for attempt in range(self.retries + 1):
+            try:
+                with self.pool.session() as ftp:
+                    return fn(ftp)
+            except ftplib.all_errors as e:
+                if _is_permanent(e) or attempt == self.retries:
+                    raise
+                delay = self.backoff * (2 ** attempt)
+                print(f"FTP retry {attempt + 1}/{self.retries} in {delay:.1f}s: {e}")
+                time.sleep(delay)
+
+    def list_dir(self, path, use_cache=True):
+        """
+        File names in a remote directory. Listings are cached for
+        `listing_ttl` seconds; pass use_cache=False for directories that
+        change often such as /now/latest/.
+        """
+        now = time.monotonic()
+        if use_cache:
+            with self._listings_lock:
+                cached = self._listings.get(path)
+            if cached and now - cached[0] < self.listing_ttl:
+                return cached[1]
+
+        # Some servers return full paths from NLST, keep only the names
+        names = [posixpath.basename(n.rstrip('/')) for n in self._call(lambda ftp: ftp.nlst(path))]
+        with self._listings_lock:
+            self._listings[path] = (now, names)
+        return names
+
+    def download(self, remote_path, local_path, skip_existing=False):
+        """
+        Downloads one file. Data goes to a temp file that is renamed on
+        success, so an interrupted transfer never leaves a partial file.
+        """
+        if skip_existing and os.path.exists(local_path) and os.path.getsize(local_path) > 0:
+            return local_path
+
+        os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+        tmp_path = f"{local_path}.part{threading.get_ident()}"
+
+        def retrieve(ftp):
+            with open(tmp_path, 'wb') as f:
+                ftp.retrbinary(f"RETR {remote_path}", f.write)
+
+        try:
+            self._call(retrieve)
+            os.replace(tmp_path, local_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return local_path
+
+    def download_many(self, items, max_workers=None, skip_existing=True):
+        """
+        Downloads (remote_path, local_path) pairs concurrently, one pooled
+        session per worker. Yields (remote_path, local_path, error) as each
+        transfer finishes; error is None on success. Closing the generator
+        early cancels the transfers that have not started yet.
+        """
+        items = list(items)
+        if not items:
+            return
+        workers = min(max_workers or self.pool.size, self.pool.size, len(items))
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = {
+                executor.submit(self.download, remote, local, skip_existing): (remote, local)
+                for remote, local in items
+            }
+            for future in as_completed(futures):
+                remote, local = futures[future]
+                yield remote, local, future.exception()
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def close(self):
+        self.pool.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(host, user, password, port=21):
+    """Shared client per server/account so the session pool outlives a request."""
+    key = (host, port, user, password)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = JaxaFTPClient(host, user, password, port=port)
+        return client
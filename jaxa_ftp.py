@@ -1,163 +1,232 @@
-import ftplib
 import os
-import gzip
 import numpy as np
-import json
 
-def fetch_jaxa_forecast(host, user, password, local_path="cache/jaxa/", date="", hour=""):
+from frame_archive import get_archive
+from gsmap_reader import read_window
+from jaxa_client import get_client, parse_frame_time
+from rainfall_index import LATEST_GRID_PATH, save_grid
+from rainfall_store import get_store
+
+def fetch_jaxa_forecast(host, user, password, local_path="cache/jaxa/", date="", hour="", client=None):
     """
     Connects to JAXA FTP server and downloads the latest or historical rainfall forecast data.
+    Sessions come from a shared pooled client, so repeated syncs skip the login.
+    Frames already in the local archive are served from it without any FTP round-trip.
     """
+    archive = get_archive("now")
+    
+    # Historical request: the archive may already hold a frame for that hour
+    if date and hour and len(date.split('-')) == 3:
+        prefix = date.replace('-', '') + hour
+        archived = [ts for ts in archive.timestamps() if ts.strftime("%Y%m%d%H%M").startswith(prefix)]
+        if archived:
+            print(f"Serving {date} {hour}h from the frame archive")
+            return publish_archived_frame(archive, archived[-1])
+    
     print(f"Connecting to JAXA FTP: {host} as {user}... (History: {date} {hour})")
     
-    if not os.path.exists(local_path):
-        os.makedirs(local_path)
-        
     try:
-        ftp = ftplib.FTP(host)
-        ftp.login(user, password)
-        
-        # Decide directory based on whether a specific date is requested
-        if date:
-            # Format date: YYYY-MM-DD -> YYYY/MM/DD
-            parts = date.split('-')
-            if len(parts) == 3:
-                year, month, day = parts
-                target_dir = f"/now/half_hour_G/{year}/{month}/{day}/"
-                print(f"Navigating to historical directory: {target_dir}")
-                ftp.cwd(target_dir)
-            else:
-                print("Invalid date format. Using latest.")
-                ftp.cwd('/now/latest/')
-        else:
-            ftp.cwd('/now/latest/') 
-        
-        files = ftp.nlst()
-        # Look for the gauge-adjusted real-time data
-        target_files = [f for f in files if f.startswith('gsmap_gauge_now') and f.endswith('.gz')]
-        
-        if not target_files:
-            print(f"No files found in {ftp.pwd()}")
+        client = client or get_client(host, user, password)
+        target_dir, latest_file = find_jaxa_file(client, date, hour)
+        if latest_file is None:
             return False
-            
-        # If a specific hour is requested, find the closest file
-        if date and hour:
-            # File format: gsmap_gauge_now.YYYYMMDD.HHMM.dat.gz
-            target_files = [f for f in target_files if f.split('.')[2].startswith(hour)]
-            if not target_files:
-                print(f"No files found for hour {hour}. Available files: {files[:5]}...")
-                return False
-
-        latest_file = sorted(target_files)[-1]
-        local_file_path = os.path.join(local_path, latest_file)
-        
-        print(f"Downloading: {latest_file}")
-        with open(local_file_path, 'wb') as f:
-            ftp.retrbinary(f"RETR {latest_file}", f.write)
-            
-        ftp.quit()
-        print("Download complete.")
-        
-        # Process the downloaded file for QC
-        return parse_jaxa_binary_for_qc(local_file_path)
+        return fetch_jaxa_file(client, target_dir, latest_file, local_path)
         
     except Exception as e:
         print(f"FTP Error: {e}")
         return False
 
+def find_jaxa_file(client, date="", hour=""):
+    """
+    Remote directory and newest gauge-adjusted frame for the latest data or a
+    historical date/hour. The file name is None when nothing matches.
+    """
+    # Decide directory based on whether a specific date is requested
+    target_dir = '/now/latest/'
+    if date:
+        # Format date: YYYY-MM-DD -> YYYY/MM/DD
+        parts = date.split('-')
+        if len(parts) == 3:
+            year, month, day = parts
+            target_dir = f"/now/half_hour_G/{year}/{month}/{day}/"
+            print(f"Navigating to historical directory: {target_dir}")
+        else:
+            print("Invalid date format. Using latest.")
+    
+    # Past days never change, the latest directory does
+    files = client.list_dir(target_dir, use_cache=target_dir != '/now/latest/')
+    # Look for the gauge-adjusted real-time data
+    target_files = [f for f in files if f.startswith('gsmap_gauge_now') and f.endswith('.gz')]
+    
+    if not target_files:
+        print(f"No files found in {target_dir}")
+        return target_dir, None
+        
+    # If a specific hour is requested, find the closest file
+    if date and hour:
+        # File format: gsmap_gauge_now.YYYYMMDD.HHMM.dat.gz
+        target_files = [f for f in target_files if f.split('.')[2].startswith(hour)]
+        if not target_files:
+            print(f"No files found for hour {hour}. Available files: {files[:5]}...")
+            return target_dir, None
+
+    return target_dir, sorted(target_files)[-1]
+
+def fetch_jaxa_file(client, target_dir, filename, local_path="cache/jaxa/"):
+    """
+    Publishes one remote frame for the app: from the archive when it is
+    already there, otherwise downloaded, archived and parsed.
+    """
+    archive = get_archive("now")
+    frame_time = parse_frame_time(filename)
+    if frame_time and frame_time in archive:
+        print(f"{filename} is already archived, skipping download")
+        return publish_archived_frame(archive, frame_time)
+    
+    if not os.path.exists(local_path):
+        os.makedirs(local_path)
+    local_file_path = os.path.join(local_path, filename)
+    
+    print(f"Downloading: {filename}")
+    client.download(target_dir + filename, local_file_path)
+    print("Download complete.")
+    
+    if frame_time:
+        try:
+            archive.ingest(local_file_path, frame_time)
+        except Exception as e:
+            print(f"Archive Error: {e}")
+    
+    # Process the downloaded file for QC
+    return parse_jaxa_binary_for_qc(local_file_path)
+
+def qc_window():
+    """
+    Global GSMaP rows/cols published for the app.
+    Row 0 is 60N (0.1 degree steps down to 60S), column 0 is 0E
+    Wider Bounding Box for better context: Lat 14.0 to 15.0, Lon 120.5 to 121.5
+    """
+    def lat_to_idx(lat): return int((60.0 - lat) / 0.1)
+    def lon_to_idx(lon): return int(lon / 0.1)
+    
+    lat_start, lat_end = lat_to_idx(15.0), lat_to_idx(14.0)
+    lon_start, lon_end = lon_to_idx(120.5), lon_to_idx(121.5)
+    return lat_start, lat_end + 1, lon_start, lon_end + 1
+
 def parse_jaxa_binary_for_qc(file_path):
     """
     Parses JAXA GSMaP binary data (0.1 degree grid) and extracts Quezon City area.
     Data format: 4-byte float, 3600 (lon) x 1200 (lat)
     Coverage: 60N to 60S
+    Output is a compact grid (origin, cell size, shape, flat intensities);
+    GeoJSON is only built on request by grid_to_geojson.
     """
     print(f"Parsing JAXA binary: {file_path}")
     
     try:
-        with gzip.open(file_path, 'rb') as f:
-            # Map the binary data to a numpy array (3600x1200)
-            # JAXA GSMaP binary is often 4-byte floats in Little Endian
-            data = np.frombuffer(f.read(), dtype='<f4').reshape(1200, 3600)
-            
-            # Flip since 0 is 60N
-            # Lat range: 60N to 60S (0.1 degree steps) -> 1200 points
-            # Lon range: 0 to 360E (0.1 degree steps) -> 3600 points
-            
-            # Wider Bounding Box for better context: 
-            # Lat 14.0 to 15.0, Lon 120.5 to 121.5
-            def lat_to_idx(lat): return int((60.0 - lat) / 0.1)
-            def lon_to_idx(lon): return int(lon / 0.1)
-            
-            lat_start, lat_end = lat_to_idx(15.0), lat_to_idx(14.0)
-            lon_start, lon_end = lon_to_idx(120.5), lon_to_idx(121.5)
-            
-            # Extract the region
-            qc_data = data[lat_start:lat_end+1, lon_start:lon_end+1]
-            
-            print(f"Extracted Grid Shape: {qc_data.shape}")
-            
-            # Create a GeoJSON-like grid for the frontend
-            features = []
-            for r in range(qc_data.shape[0]):
-                for c in range(qc_data.shape[1]):
-                    val = float(qc_data[r, c])
-                    
-                    # Handle JAXA "No Data" or invalid values (usually negative)
-                    if val < 0 or val > 500:
-                        val = 0.0
-                    
-                    # Coordinate mid-points for the 0.1 degree cell
-                    # r=0 is lat_start (highest lat), so we move DOWN
-                    lat = 60.0 - (lat_start + r) * 0.1
-                    # c=0 is lon_start (lowest lon), so we move RIGHT
-                    lon = (lon_start + c) * 0.1
-                    
-                    features.append({
-                        "type": "Feature",
-                        "geometry": {
-                            "type": "Polygon",
-                            "coordinates": [[
-                                [lon, lat],
-                                [lon + 0.1, lat],
-                                [lon + 0.1, lat - 0.1],
-                                [lon, lat - 0.1],
-                                [lon, lat]
-                            ]]
-                        },
-                        "properties": {
-                            "intensity": val,
-                            "source": "JAXA Real-time"
-                        }
-                    })
-            
-            # Extract the actual data timestamp from the filename
-            # Format: gsmap_gauge_now.YYYYMMDD.HHMM.dat.gz
-            fname = os.path.basename(file_path)
-            data_date = "Unknown"
-            if len(fname.split('.')) >= 3:
-                ts_part = fname.split('.')[1] # YYYYMMDD
-                hr_part = fname.split('.')[2] # HHMM
-                data_date = f"{ts_part[:4]}-{ts_part[4:6]}-{ts_part[6:8]} {hr_part[:2]}:{hr_part[2:4]} UTC"
-
-            # Save the processed data for the web app
-            output = {
-                "type": "FeatureCollection",
-                "features": features,
-                "timestamp": data_date,
-                "processed_at": datetime.datetime.now().isoformat(),
-                "filename": fname
-            }
-            
-            with open("cache/jaxa_qc_latest.json", "w") as out:
-                json.dump(output, out)
-            
-            print("Successfully extracted QC rainfall data.")
-            return True
+        # Extract the region, decompressing only up to its last row
+        qc_data = read_window(file_path, *qc_window())
+        return publish_qc_grid(qc_data, os.path.basename(file_path))
 
     except Exception as e:
         print(f"Parsing Error: {e}")
         return False
 
+def publish_archived_frame(archive, frame_time):
+    """Publishes the QC grid of an archived frame (a memmap slice)."""
+    try:
+        qc_data = np.array(archive.window(frame_time, *qc_window()))
+        return publish_qc_grid(qc_data, archive.source(frame_time) or frame_time.strftime("gsmap_gauge_now.%Y%m%d.%H%M.dat.gz"))
+    except Exception as e:
+        print(f"Archive Error: {e}")
+        return False
+
+def publish_qc_grid(qc_data, fname):
+    """
+    Publishes the QC window of a frame as the app's latest rainfall grid
+    (a new rainfall store version plus the lattice-positioned .npz).
+    """
+    lat_start, _, lon_start, _ = qc_window()
+    print(f"Extracted Grid Shape: {qc_data.shape}")
+    
+    # Handle JAXA "No Data" or invalid values (usually negative) in one pass
+    valid = np.isfinite(qc_data) & (qc_data >= 0) & (qc_data <= 500)
+    intensity = np.where(valid, qc_data, 0.0).astype(np.float32)
+    
+    # Extract the actual data timestamp from the filename
+    # Format: gsmap_gauge_now.YYYYMMDD.HHMM.dat.gz
+    data_date = "Unknown"
+    if len(fname.split('.')) >= 3:
+        ts_part = fname.split('.')[1] # YYYYMMDD
+        hr_part = fname.split('.')[2] # HHMM
+        data_date = f"{ts_part[:4]}-{ts_part[4:6]}-{ts_part[6:8]} {hr_part[:2]}:{hr_part[2:4]} UTC"
+
+    # Save the processed data for the web app
+    output = {
+        "format": "grid",
+        # North-west corner of cell [0, 0]; rows run south, columns east
+        "origin": [round(lon_start * 0.1, 6), round(60.0 - lat_start * 0.1, 6)],
+        "cell_size": 0.1,
+        "shape": list(intensity.shape),
+        "intensity": np.round(intensity.astype(np.float64), 3).ravel().tolist(),
+        "timestamp": data_date,
+        "processed_at": datetime.datetime.now().isoformat(),
+        "filename": fname
+    }
+    
+    # New version in the rainfall store (atomic, kept with the last N frames)
+    version = get_store().publish(output)
+    
+    # Keep the grid's lattice position too, so the backend can gather
+    # per-edge rainfall with one lookup
+    save_grid(LATEST_GRID_PATH, intensity, lat_start, lon_start, fname, data_date)
+    
+    print(f"Successfully extracted QC rainfall data (version {version}).")
+    return True
+
+def grid_to_geojson(grid):
+    """
+    Expands a compact rainfall grid into the per-cell Polygon
+    FeatureCollection the map overlay used to receive.
+    """
+    rows, cols = grid["shape"]
+    size = grid["cell_size"]
+    lon0, lat0 = grid["origin"]
+    intensity = np.asarray(grid["intensity"], dtype=np.float64).reshape(rows, cols)
+    
+    # Top-left corner of every cell
+    lats = lat0 - np.arange(rows) * size
+    lons = lon0 + np.arange(cols) * size
+    
+    features = []
+    for r, lat in enumerate(lats.tolist()):
+        for c, lon in enumerate(lons.tolist()):
+            features.append({
+                "type": "Feature",
+                "geometry": {
+                    "type": "Polygon",
+                    "coordinates": [[
+                        [lon, lat],
+                        [lon + size, lat],
+                        [lon + size, lat - size],
+                        [lon, lat - size],
+                        [lon, lat]
+                    ]]
+                },
+                "properties": {
+                    "intensity": float(intensity[r, c]),
+                    "source": "JAXA Real-time"
+                }
+            })
+    
+    return {
+        "type": "FeatureCollection",
+        "features": features,
+        "timestamp": grid.get("timestamp"),
+        "processed_at": grid.get("processed_at"),
+        "filename": grid.get("filename")
+    }
+
 import datetime
 if __name__ == "__main__":
     fetch_jaxa_forecast("hokusai.eorc.jaxa.jp", "rainmap", "Niskur+1404")
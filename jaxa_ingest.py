@@ -0,0 +1,172 @@
+import asyncio
+import datetime
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from jaxa_client import JAXA_HOST, get_client
+from jaxa_ftp import fetch_jaxa_file, fetch_jaxa_forecast, find_jaxa_file
+from rainfall_index import LATEST_GRID_PATH, load_grid
+
+# Jobs kept for the status endpoint
+MAX_JOBS = 200
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+class IngestJob:
+    def __init__(self, host, user, password, date="", hour="", source="request"):
+        self.id = uuid.uuid4().hex
+        self.host = host
+        self.user = user
+        self.password = password
+        self.date = date
+        self.hour = hour
+        self.source = source
+        self.status = "queued" # queued | running | success | error
+        self.message = ""
+        self.filename = None
+        self.created_at = _now()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def key(self):
+        # A retry with corrected credentials must not join the job using the
+        # old ones; a digest keeps the password itself out of the key
+        password = hashlib.sha256(self.password.encode("utf-8")).hexdigest()
+        return (self.host, self.user, password, self.date, self.hour)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "message": self.message,
+            "source": self.source,
+            "date": self.date,
+            "hour": self.hour,
+            "filename": self.filename,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestService:
+    """
+    JAXA ingestion off the request path.
+
+    Jobs go through an asyncio queue and run one at a time on a worker
+    thread, so FTP logins, downloads and parsing never block the event loop
+    and two syncs never write the published frame at once. An identical job
+    that is still queued or running is reused instead of enqueued twice.
+    When credentials are configured, /now/latest/ is also polled on a
+    schedule; a frame whose file name is already published is skipped.
+    The published grid itself is swapped atomically by publish_qc_grid.
+    Callbacks registered with on_publish run on the worker thread after
+    every successful job, to refresh whatever derives from the frame.
+    """
+
+    def __init__(self, host=None, user=None, password=None, poll_interval=None):
+        self.host = host or os.getenv("JAXA_FTP_HOST", JAXA_HOST)
+        self.user = user if user is not None else os.getenv("JAXA_FTP_USER", "")
+        self.password = password if password is not None else os.getenv("JAXA_FTP_PASSWORD", "")
+        self.poll_interval = float(poll_interval if poll_interval is not None else os.getenv("JAXA_POLL_SECONDS", 600))
+        self.jobs = OrderedDict()
+        self._active = {}
+        self._lock = threading.Lock()
+        self._queue = None
+        self._tasks = []
+        self._listeners = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jaxa-ingest")
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker())]
+        if self.poll_interval > 0 and self.user:
+            print(f"JAXA ingest: polling /now/latest/ every {self.poll_interval:.0f}s")
+            self._tasks.append(asyncio.create_task(self._poll()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, host="", user="", password="", date="", hour="", source="request"):
+        """Queues a sync and returns its job (an equivalent pending job is reused)."""
+        job = IngestJob(host or self.host, user or self.user, password or self.password, date, hour, source)
+        with self._lock:
+            pending = self._active.get(job.key)
+            if pending is not None:
+                return pending
+            self._active[job.key] = job
+            self.jobs[job.id] = job
+            while len(self.jobs) > MAX_JOBS:
+                self.jobs.popitem(last=False)
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def on_publish(self, callback):
+        """Calls callback() (no arguments) after each successful job."""
+        self._listeners.append(callback)
+
+    def _notify(self):
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                print(f"JAXA ingest: publish callback failed: {e}")
+
+    async def _poll(self):
+        while True:
+            self.submit(source="schedule")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            job.status, job.started_at = "running", _now()
+            try:
+                ok, job.message = await loop.run_in_executor(self._executor, self._run, job)
+                job.status = "success" if ok else "error"
+                if ok:
+                    await loop.run_in_executor(self._executor, self._notify)
+            except Exception as e:
+                job.status, job.message = "error", str(e)
+            finally:
+                job.finished_at = _now()
+                with self._lock:
+                    self._active.pop(job.key, None)
+                self._queue.task_done()
+            print(f"JAXA ingest job {job.id[:8]} ({job.source}): {job.status} {job.message}")
+
+    def _run(self, job):
+        """Blocking part of a job, on the worker thread. Returns (ok, message)."""
+        if job.date:
+            ok = fetch_jaxa_forecast(job.host, job.user, job.password, date=job.date, hour=job.hour)
+            return ok, "JAXA data refreshed from FTP." if ok else "Failed to connect or download from JAXA FTP."
+
+        client = get_client(job.host, job.user, job.password)
+        target_dir, filename = find_jaxa_file(client)
+        if filename is None:
+            return False, f"No frames found in {target_dir}"
+        job.filename = filename
+
+        # Deduplicate by file name: the newest frame is already published
+        grid = load_grid(LATEST_GRID_PATH)
+        if grid is not None and grid[3] == filename:
+            return True, f"Already up to date ({filename})."
+
+        ok = fetch_jaxa_file(client, target_dir, filename)
+        return ok, "JAXA data refreshed from FTP." if ok else f"Failed to ingest {filename}."
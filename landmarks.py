@@ -0,0 +1,157 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components, dijkstra as sparse_dijkstra
+
+# Landmarks per table; each adds one full-graph distance row
+LANDMARK_COUNT = int(os.getenv("LANDMARK_COUNT", 16))
+
+
+def cheapest_arcs(graph, edge_weights):
+    """
+    (src, dst, weight, arc index) of every arc, sorted by (src, dst). Parallel
+    roads between the same two nodes keep only the cheapest one, which is
+    the only one a shortest path can use.
+    """
+    n = graph.n_nodes
+    src = np.repeat(np.arange(n, dtype=np.int64), np.diff(graph.offsets))
+    dst = graph.targets.astype(np.int64)
+    weights = np.asarray(edge_weights, dtype=np.float64)[graph.arc_edge]
+    key = src * n + dst
+    order = np.lexsort((weights, key))
+    key = key[order]
+    first = np.ones(len(key), dtype=bool)
+    first[1:] = key[1:] != key[:-1]
+    keep = order[first]
+    return src[keep], dst[keep], weights[keep], keep
+
+
+def arc_matrix(graph, edge_weights):
+    """Sparse adjacency matrix of the graph under edge_weights."""
+    src, dst, weights, _ = cheapest_arcs(graph, edge_weights)
+    return csr_matrix((weights, (src, dst)), shape=(graph.n_nodes, graph.n_nodes))
+
+
+def weights_key(edge_weights):
+    """Digest of a baked weight vector, so equal weights share one table."""
+    return hashlib.sha1(np.ascontiguousarray(edge_weights, dtype=np.float64).tobytes()).hexdigest()
+
+
+class LandmarkTable:
+    """
+    ALT preprocessing of one graph under one set of edge weights: exact
+    shortest-path distances from a few landmarks to every node, as a
+    (landmarks x nodes) float64 array.
+
+    Roads are two-way with equal weights, so by the triangle inequality
+    |d(L, t) - d(L, v)| <= d(v, t) for every landmark L. Landmarks are
+    picked farthest-first: each one is the node worst covered by those
+    chosen so far, which puts them on the edges of the network where the
+    bounds are tightest.
+    """
+
+    def __init__(self, graph, edge_weights, n_landmarks=LANDMARK_COUNT):
+        self.version = graph.version
+        self.key = weights_key(edge_weights)
+        matrix = arc_matrix(graph, edge_weights)
+        n_landmarks = min(n_landmarks, graph.n_nodes)
+
+        # Landmarks all go to the main component (OSM extracts carry many
+        # small disconnected fragments); elsewhere the bound is simply 0.
+        # The first one is the node farthest from an arbitrary start.
+        _, labels = connected_components(matrix, directed=False)
+        start = int(np.argmax(labels == np.argmax(np.bincount(labels))))
+        coverage = sparse_dijkstra(matrix, directed=True, indices=start)
+        coverage[~np.isfinite(coverage)] = -1.0
+        landmarks, rows = [], []
+        for _ in range(n_landmarks):
+            landmark = int(np.argmax(coverage))
+            if landmarks and coverage[landmark] <= 0:
+                break
+            row = sparse_dijkstra(matrix, directed=True, indices=landmark)
+            landmarks.append(landmark)
+            rows.append(row)
+            coverage = np.minimum(coverage, row) if len(rows) > 1 else np.where(np.isfinite(row), row, -1.0)
+        self.landmarks = np.array(landmarks, dtype=np.int64)
+        self.distances = np.vstack(rows) if rows else np.zeros((0, graph.n_nodes))
+
+    def heuristic(self, targets):
+        """
+        Lower bound on the distance from every node to the nearest of
+        `targets`, as a list indexed by node. For each landmark the bound to
+        a target set is the gap to the closest target value (a sorted
+        search), which stays consistent, so A* with it settles each node
+        once and still returns exact shortest paths.
+        """
+        targets = np.fromiter(targets, dtype=np.int64)
+        bound = np.zeros(self.distances.shape[1])
+        for row in self.distances:
+            # Targets outside this landmark's component cannot be reached
+            # from the nodes it bounds, so only the reachable ones count
+            values = np.sort(row[targets])
+            values = values[np.isfinite(values)]
+            if len(values) == 0:
+                continue
+            above = np.searchsorted(values, row).clip(0, len(values) - 1)
+            below = (above - 1).clip(0)
+            gap = np.minimum(np.abs(row - values[above]), np.abs(row - values[below]))
+            gap[~np.isfinite(row)] = 0.0
+            np.maximum(bound, gap, out=bound)
+        return bound.tolist()
+
+
+class LandmarkStore:
+    """
+    Keeps LandmarkTables keyed by (graph version, weights digest), so the
+    preprocessing only reruns when the network or the baked weights change.
+
+    Tables are built on one background thread, never on the request that
+    first needs them: get() returns None for weights without a table yet
+    and the caller runs plain search (an ALT build costs several plain
+    queries). Only the newest requested key waits in the queue, so a
+    dragged slider does not queue up a build per position.
+    """
+
+    def __init__(self, n_landmarks=LANDMARK_COUNT, max_entries=4):
+        self.n_landmarks = n_landmarks
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="landmarks")
+
+    def get(self, graph, edge_weights):
+        """LandmarkTable for these weights (never negative, see bake_weights), or None while it is built."""
+        key = (graph.version, weights_key(edge_weights))
+        with self._lock:
+            table = self._entries.get(key)
+            if table is not None:
+                self._entries.move_to_end(key)
+                return table
+            if key not in self._pending:
+                # Builds queued for older keys are dropped if not started
+                for stale, future in list(self._pending.items()):
+                    if future.cancel():
+                        del self._pending[stale]
+                weights = np.array(edge_weights, dtype=np.float64)
+                self._pending[key] = self._executor.submit(self._build, key, graph, weights)
+            return None
+
+    def _build(self, key, graph, edge_weights):
+        try:
+            table = LandmarkTable(graph, edge_weights, self.n_landmarks)
+        except Exception as e:
+            print(f"Landmarks: build failed: {e}")
+            table = None
+        with self._lock:
+            self._pending.pop(key, None)
+            if table is not None:
+                self._entries[key] = table
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return table
@@ -0,0 +1,143 @@
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+BUNDLE_DIR = "cache/layers/"
+
+# Tables served by the layer endpoints in server.py
+LAYER_TABLES = ["flood_hazard", "qc_boundary", "district_boundary", "roads", "evacuation_sites"]
+
+# Preferred order when the client accepts several encodings equally
+ENCODING_PREFERENCE = ["br", "gzip", "identity"]
+
+SUFFIXES = {"identity": ".geojson", "gzip": ".geojson.gz", "br": ".geojson.br"}
+
+
+def compress_variants(body):
+    """
+    Builds every encoded variant of a serialized layer. This runs once per
+    table version, never per request.
+    """
+    variants = {
+        "identity": body,
+        # mtime=0 keeps the output (and its ETag) deterministic
+        "gzip": gzip.compress(body, compresslevel=9, mtime=0),
+    }
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=11, mode=brotli.MODE_TEXT)
+    return variants
+
+
+def _atomic_write(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_bundles(table_name, variants, version, out_dir=BUNDLE_DIR):
+    """
+    Writes all variants of a layer to disk. The version marker is written
+    last so a half-written bundle is never picked up by read_bundles.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    for encoding, data in variants.items():
+        _atomic_write(os.path.join(out_dir, table_name + SUFFIXES[encoding]), data)
+    _atomic_write(os.path.join(out_dir, table_name + ".version"), version.encode("utf-8"))
+
+
+def read_bundles(table_name, version, out_dir=BUNDLE_DIR):
+    """
+    Returns the pre-compressed variants of a layer if the bundle on disk was
+    built from the given table version, otherwise None.
+    """
+    marker = os.path.join(out_dir, table_name + ".version")
+    try:
+        with open(marker, "rb") as f:
+            if f.read().decode("utf-8") != version:
+                return None
+    except OSError:
+        return None
+
+    variants = {}
+    for encoding, suffix in SUFFIXES.items():
+        path = os.path.join(out_dir, table_name + suffix)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                variants[encoding] = f.read()
+    if "identity" not in variants:
+        return None
+    return variants
+
+
+def choose_encoding(accept_encoding, available):
+    """
+    Picks the best available content-coding for an Accept-Encoding header.
+    Falls back to identity, which is always available.
+    """
+    if not accept_encoding:
+        return "identity"
+
+    qualities = {}
+    for part in accept_encoding.split(","):
+        pieces = part.strip().split(";")
+        coding = pieces[0].strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in pieces[1:]:
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding] = q
+
+    def quality(coding):
+        if coding in qualities:
+            return qualities[coding]
+        if coding == "identity":
+            return qualities.get("*", 1.0) if "*" in qualities else 1.0
+        return qualities.get("*", 0.0)
+
+    best, best_q = "identity", 0.0
+    for coding in ENCODING_PREFERENCE:
+        if coding not in available:
+            continue
+        q = quality(coding)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def build_all(cache, tables=LAYER_TABLES):
+    """
+    Builds the bundles of every served layer, so the first request after a
+    data rebuild does not pay for the compression. main.py runs it after
+    saving the layers; run this module after loading tables into PostGIS.
+    """
+    for table_name in tables:
+        try:
+            layer = cache.get(table_name)
+            sizes = ", ".join(f"{enc}={len(data) / 1024:.0f} KB" for enc, data in layer.variants.items())
+            print(f"  ✓ {table_name}: {sizes}")
+        except Exception as e:
+            print(f"  ✗ {table_name}: {e}")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from sqlalchemy import create_engine
+    from layer_cache import LayerCache
+
+    load_dotenv()
+    # Without a database the bundles are built from the committed layer files, as the server serves them
+    url = os.getenv("DATABASE_URL")
+    engine = create_engine(url) if url else None
+    print(f"Building pre-compressed layer bundles in {BUNDLE_DIR}")
+    build_all(LayerCache(engine, check_interval=0))
@@ -0,0 +1,265 @@
+import hashlib
+import os
+import threading
+import time
+
+import geopandas as gpd
+from sqlalchemy import text
+
+from artifacts import load_layer, parquet_path
+from layer_bundles import compress_variants, read_bundles, write_bundles
+
+# Committed GeoJSON files used when no DATABASE_URL is configured; a
+# GeoParquet artifact of the same name (see artifacts.py) takes precedence
+LOCAL_LAYER_FILES = {
+    "flood_hazard": "flood_clipped.geojson",
+    "qc_boundary": "qc_boundary.geojson",
+    "district_boundary": "district1_boundary.geojson",
+    "roads": "project8_roads.geojson",
+    "evacuation_sites": "evacuation_sites.geojson",
+}
+
+# Rows fetched per round trip when streaming a table from PostGIS
+STREAM_BATCH_ROWS = int(os.getenv("LAYER_STREAM_BATCH_ROWS", 2000))
+
+# Larger serialized layers are never held in memory; they are streamed on every request
+MAX_CACHED_BYTES = int(os.getenv("LAYER_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+FEATURE_COLLECTION_HEAD = b'{"type": "FeatureCollection", "features": ['
+FEATURE_COLLECTION_TAIL = b']}'
+
+
+class CachedLayer:
+    """
+    Pre-serialized GeoJSON body of one table, its pre-compressed variants
+    (identity/gzip/br) and their validators.
+    """
+
+    def __init__(self, table_name, variants, version):
+        self.table_name = table_name
+        self.variants = variants
+        self.body = variants["identity"]
+        self.version = version
+        # Strong ETag: derived from the exact bytes we send. Each encoding is
+        # a different representation, so it gets its own tag.
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.etags = {
+            encoding: self.etag if encoding == "identity" else f'"{digest}-{encoding}"'
+            for encoding in variants
+        }
+
+
+class LayerCache:
+    """
+    Keeps the serialized GeoJSON bytes of each PostGIS layer in memory.
+
+    Entries are re-validated against a cheap table fingerprint (row count and
+    newest xmin) at most once every `check_interval` seconds, so a full
+    SELECT/serialize only happens when the table actually changed.
+    With no engine, layers come from the committed GeoJSON files instead.
+
+    A table that is not serialized yet can be streamed straight from PostGIS
+    (stream_and_cache): the first request gets its first bytes at once and
+    the cache is filled from the same pass, unless the body grows past
+    max_cached_bytes, in which case that table version is only ever streamed.
+    """
+
+    def __init__(self, engine, check_interval=5.0, max_cached_bytes=MAX_CACHED_BYTES):
+        self.engine = engine
+        self.check_interval = check_interval
+        self.max_cached_bytes = max_cached_bytes
+        self._entries = {}
+        self._too_large = {}
+        self._storing = {}
+        self._versions = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def _lock_for(self, table_name):
+        with self._guard:
+            if table_name not in self._locks:
+                self._locks[table_name] = threading.Lock()
+            return self._locks[table_name]
+
+    def local_path(self, table_name):
+        """Path of the local fallback file for a table (GeoParquet artifact or GeoJSON)."""
+        if table_name not in LOCAL_LAYER_FILES:
+            raise FileNotFoundError(f"No local GeoJSON fallback for {table_name}")
+        path = parquet_path(LOCAL_LAYER_FILES[table_name])
+        return path if os.path.exists(path) else LOCAL_LAYER_FILES[table_name]
+
+    def fingerprint(self, table_name):
+        """
+        Returns a version string that changes whenever rows are added, removed,
+        updated or the table is re-created by to_postgis(if_exists='replace').
+        """
+        if self.engine is None:
+            stat = os.stat(self.local_path(table_name))
+            return f"file-{stat.st_mtime_ns}-{stat.st_size}"
+
+        query = text(
+            f"SELECT '{table_name}'::regclass::oid, count(*), "
+            f"coalesce(max(xmin::text::bigint), 0) FROM {table_name}"
+        )
+        with self.engine.connect() as conn:
+            oid, rows, xmin = conn.execute(query).one()
+        return f"{oid}-{rows}-{xmin}"
+
+    def version(self, table_name):
+        """Current table version, re-checked at most every check_interval seconds."""
+        cached = self._versions.get(table_name)
+        now = time.monotonic()
+        if cached and now - cached[1] < self.check_interval:
+            return cached[0]
+        version = self.fingerprint(table_name)
+        self._versions[table_name] = (version, now)
+        return version
+
+    def stream(self, table_name, batch_rows=STREAM_BATCH_ROWS):
+        """
+        Yields the table as GeoJSON FeatureCollection chunks.
+
+        PostGIS builds each feature with ST_AsGeoJSON (PostGIS 3+) and rows
+        come through a server-side cursor, batch_rows at a time, so no side
+        ever holds more than one batch: no GeoDataFrame, no to_json string,
+        no re-parse. Geometries are expected in EPSG:4326, as everywhere else.
+        """
+        if self.engine is None:
+            yield self._load_local(table_name)
+            return
+
+        query = text(f"SELECT ST_AsGeoJSON(t.*, 'geometry')::text FROM {table_name} AS t")
+        first = True
+        with self.engine.connect().execution_options(stream_results=True, yield_per=batch_rows) as conn:
+            result = conn.execute(query)
+            # Only start the body once the query ran, so errors surface on the first chunk
+            yield FEATURE_COLLECTION_HEAD
+            for rows in result.partitions():
+                chunk = ",".join(row[0] for row in rows).encode("utf-8")
+                yield chunk if first else b"," + chunk
+                first = False
+        yield FEATURE_COLLECTION_TAIL
+
+    def _load_local(self, table_name):
+        path = self.local_path(table_name)
+        if path.endswith(".parquet"):
+            gdf = load_layer(path)
+            return gdf.to_json(default=lambda o: o.tolist() if hasattr(o, "tolist") else str(o)).encode("utf-8")
+        with open(path, "rb") as f:
+            return f.read()
+
+    def load(self, table_name):
+        """Reads the whole table and serializes it once."""
+        return b"".join(self.stream(table_name))
+
+    def read_gdf(self, table_name, columns=None):
+        """Loads a table (or its local fallback) as a GeoDataFrame in EPSG:4326."""
+        if self.engine is None:
+            gdf = load_layer(self.local_path(table_name), columns)
+        else:
+            select = "*" if columns is None else ", ".join(f'"{c}"' for c in list(columns) + ["geometry"])
+            gdf = gpd.read_postgis(f"SELECT {select} FROM {table_name}", self.engine, geom_col='geometry')
+        if gdf.crs is None:
+            gdf.set_crs(epsg=4326, inplace=True)
+        return gdf.to_crs(epsg=4326)
+
+    def cached(self, table_name):
+        """
+        CachedLayer of the current table version if it is in memory or in a
+        bundle on disk, else None. Never reads the table itself.
+        """
+        version = self.version(table_name)
+        entry = self._entries.get(table_name)
+        if entry and entry.version == version:
+            return entry
+        variants = read_bundles(table_name, version)
+        if variants is None:
+            return None
+        entry = CachedLayer(table_name, variants, version)
+        self._entries[table_name] = entry
+        return entry
+
+    def _store(self, table_name, body, version):
+        try:
+            variants = compress_variants(body)
+            try:
+                write_bundles(table_name, variants, version)
+            except OSError as e:
+                print(f"Layer cache: could not write bundles for {table_name}: {e}")
+            entry = CachedLayer(table_name, variants, version)
+            self._entries[table_name] = entry
+            return entry
+        finally:
+            with self._guard:
+                self._storing.pop(table_name, None)
+
+    def get(self, table_name):
+        """
+        Returns the CachedLayer for a table, rebuilding it only when the
+        table fingerprint no longer matches the cached version.
+        """
+        entry = self.cached(table_name)
+        if entry is not None:
+            return entry
+
+        with self._lock_for(table_name):
+            # Another request may have rebuilt it while we waited
+            entry = self.cached(table_name)
+            if entry is not None:
+                return entry
+            version = self.version(table_name)
+            print(f"Layer cache: rebuilding {table_name} (version {version})")
+            return self._store(table_name, self.load(table_name), version)
+
+    def stream_and_cache(self, table_name):
+        """
+        Streams the current table version and caches the streamed body once
+        it is complete, compressing it on a background thread so the
+        response is not held up. Bodies over max_cached_bytes are dropped as
+        soon as they cross the limit, which keeps memory flat for any size.
+        """
+        version = self.version(table_name)
+        parts = None if self._too_large.get(table_name) == version else []
+        size = 0
+        for chunk in self.stream(table_name):
+            if parts is not None:
+                size += len(chunk)
+                if size > self.max_cached_bytes:
+                    print(f"Layer cache: {table_name} is over {self.max_cached_bytes} bytes, streaming only")
+                    parts = None
+                    self._too_large[table_name] = version
+                else:
+                    parts.append(chunk)
+            yield chunk
+
+        if parts is None:
+            return
+        with self._guard:
+            # Concurrent cold requests all stream, but only one compresses
+            if self._storing.get(table_name) == version:
+                return
+            self._storing[table_name] = version
+        threading.Thread(target=self._store, args=(table_name, b"".join(parts), version), daemon=True).start()
+
+    def invalidate(self, table_name=None):
+        """Drops one cached table, or all of them."""
+        if table_name is None:
+            self._entries.clear()
+            self._versions.clear()
+            self._too_large.clear()
+        else:
+            self._entries.pop(table_name, None)
+            self._versions.pop(table_name, None)
+            self._too_large.pop(table_name, None)
+
+
+def etag_matches(if_none_match, etag):
+    """Checks an If-None-Match header value against an ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    # Weak comparison is allowed for If-None-Match (RFC 9110 13.1.2)
+    return any(c.removeprefix("W/") == etag for c in candidates)
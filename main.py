@@ -1,17 +1,49 @@
-import geopandas as gpd
-import pandas as pd
-import osmnx as ox
+"""
+Builds the boundary, road network, clipped flood hazard and per-road risk
+layers of an area: one or more QC districts, geocoded places or a polygon.
+
+    python main.py                                   # District 1, as before
+    python main.py --place "Quezon City, Philippines" --name qc --tile-size 1500
+    python main.py --polygon area.geojson --name area --workers 8
+    python main.py --seed --offline --boundary-only  # no network needed
+
+Boundaries are geocoded concurrently and cached per query under
+cache/boundaries/, so reruns only geocode queries they have not seen.
+--seed fills the cache from the committed boundary GeoJSON files.
+
+The road/flood overlay (max class touched and length fraction per hazard
+class of every road) runs per tile on a process pool (risk_join),
+so the area size is bounded by the tiles, not by one big spatial join.
+Every stage reports its wall time and the peak memory so far.
+
+Layers are written as GeoParquet (artifacts.py), which the server and the
+fix-up scripts read in preference to GeoJSON; --geojson also exports them.
+The server's pre-compressed layer bundles are then rebuilt (layer_bundles),
+from PostGIS when DATABASE_URL is set, else from the layer files.
+"""
+import argparse
 import os
+import sys
+import time
+from contextlib import contextmanager
 from datetime import datetime
 
-def log(msg):
-    print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
+import geopandas as gpd
+import osmnx as ox
+import pandas as pd
 
-# ---------------------
-# 1. Get District 1 Boundary
-# ---------------------
-log("Getting District 1 (QC) boundary...")
-district1_barangays = [
+try:
+    import resource
+except ImportError:  # not available on Windows; peak memory is then not reported
+    resource = None
+
+from artifacts import parquet_path, save_layer
+from boundary_cache import BOUNDARY_CACHE_DIR, BoundaryCache, district_key, resolve_boundaries
+from layer_bundles import build_all
+from layer_cache import LayerCache
+from risk_join import TILE_SIZE_M, road_flood_overlay
+
+DISTRICT1_BARANGAYS = [
     "Alicia", "Bagong Pag-asa", "Bahay Toro", "Balingasa", "Bungad",
     "Damar", "Damayan", "Del Monte", "Katipunan", "Lourdes",
     "Maharlika", "Manresa", "Mariblo", "Masambong", "N.S. Amoranto",
@@ -22,90 +54,262 @@ district1_barangays = [
     "Veterans Village", "West Triangle"
 ]
 
-district1_parts = []
-for brgy in district1_barangays:
-    query = f"{brgy}, Quezon City, Philippines"
-    try:
-        brgy_gdf = ox.geocode_to_gdf(query)
-        brgy_gdf = brgy_gdf.to_crs(epsg=4326)
-        district1_parts.append(brgy_gdf)
-        log(f"  ✓ Loaded {brgy}")
-    except Exception as e:
-        log(f"  ✗ Failed to load {brgy}: {e}")
-
-if not district1_parts:
-    log("Critical Error: Could not load any District 1 barangays. Exiting.")
-    exit(1)
-
-district1_boundary_gdf = gpd.GeoDataFrame(
-    pd.concat(district1_parts, ignore_index=True),
-    crs=district1_parts[0].crs
-).dissolve()
-log(f"  ✓ District 1 boundary created (EPSG:4326)")
+# Barangays of each district that --district accepts
+DISTRICTS = {
+    "district1": DISTRICT1_BARANGAYS,
+}
+
+QC_QUERY = "Quezon City, Philippines"
+
+FLOOD_SHAPEFILE = "ph137404000_fh100yr_30m_10m.shp"
+
+
+def log(msg):
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
+
+
+def peak_memory_mb():
+    """(this process, largest finished pool worker) peak RSS in MB, or None."""
+    if resource is None:
+        return None
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return own, workers
+
+
+class StageTimer:
+    """Wall time of each pipeline stage and the peak memory after it."""
+
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - start, peak_memory_mb()))
+
+    def report(self):
+        log("Stage timings:")
+        for name, seconds, memory in self.stages:
+            peak = f"peak {memory[0]:.0f} MB (workers {memory[1]:.0f} MB)" if memory else "peak n/a"
+            log(f"  {name:<10} {seconds:8.2f} s  {peak}")
+        log(f"  {'total':<10} {sum(s for _, s, _ in self.stages):8.2f} s")
+
+
+def barangay_query(barangay):
+    return f"{barangay}, Quezon City, Philippines"
+
+
+def seed_files():
+    """Cache keys that the committed GeoJSON files can stand in for."""
+    queries = [barangay_query(b) for b in DISTRICT1_BARANGAYS]
+    return {
+        district_key(queries): "district1_boundary.geojson",
+        QC_QUERY: "qc_boundary.geojson",
+    }
+
+
+def seed_cache(cache):
+    for query, path in seed_files().items():
+        if os.path.exists(path) and cache.seed(query, path):
+            log(f"  ✓ Seeded boundary cache from {path}")
+
+
+# ---------------------
+# 1. Get Area Boundary
+# ---------------------
+def build_district_boundary(cache, barangays=DISTRICT1_BARANGAYS, workers=4, offline=False, label="district1"):
+    """
+    Dissolved boundary of the barangays. The dissolved result is cached too,
+    keyed by the barangay list, so an unchanged district is a single read.
+    """
+    log(f"Getting {label} (QC) boundary...")
+    queries = [barangay_query(b) for b in barangays]
+    key = district_key(queries)
+    boundary = cache.get(key)
+    if boundary is not None:
+        log(f"  ✓ {label} boundary loaded from cache")
+        return boundary
+
+    parts, failures = resolve_boundaries(queries, ox.geocode_to_gdf, cache, workers=workers, offline=offline, log=log)
+    if not parts:
+        log(f"Critical Error: Could not load any {label} barangays. Exiting.")
+        sys.exit(1)
+
+    parts = list(parts.values())
+    boundary = gpd.GeoDataFrame(
+        pd.concat(parts, ignore_index=True),
+        crs=parts[0].crs
+    ).dissolve()
+    # A partial district is not cached, so the failed barangays are retried next run
+    if not failures:
+        cache.put(key, boundary)
+    log(f"  ✓ {label} boundary created (EPSG:4326)")
+    return boundary
+
+
+def get_place_boundaries(cache, places, workers=4, offline=False):
+    parts, failures = resolve_boundaries(places, ox.geocode_to_gdf, cache, workers=workers, offline=offline, log=log)
+    if failures:
+        log(f"Critical Error: Could not load {', '.join(failures)}. Exiting.")
+        sys.exit(1)
+    return list(parts.values())
+
+
+def build_area(cache, districts=(), places=(), polygons=(), workers=4, offline=False):
+    """Dissolved union of districts, geocoded places and polygon files (EPSG:4326)."""
+    parts = [build_district_boundary(cache, DISTRICTS[d], workers, offline, label=d) for d in districts]
+    parts += get_place_boundaries(cache, list(places), workers, offline) if places else []
+    parts += [gpd.read_file(path).to_crs(epsg=4326) for path in polygons]
+    if len(parts) == 1:
+        return parts[0]
+    return gpd.GeoDataFrame(pd.concat(parts, ignore_index=True), crs=parts[0].crs).dissolve()
+
 
 # ---------------------
 # 2. Get Road Network (with 500m Buffer for Context)
 # ---------------------
-log("Fetching road network (with 500m buffer for context)...")
-utm_crs = district1_boundary_gdf.estimate_utm_crs()
-buffered_boundary_utm = district1_boundary_gdf.to_crs(utm_crs).buffer(500)
-buffered_boundary_4326 = buffered_boundary_utm.to_crs(epsg=4326).iloc[0]
+def fetch_roads(boundary_gdf, buffer_m=500):
+    log(f"Fetching road network (with {buffer_m}m buffer for context)...")
+    utm_crs = boundary_gdf.estimate_utm_crs()
+    buffered_boundary_utm = boundary_gdf.to_crs(utm_crs).buffer(buffer_m)
+    buffered_boundary_4326 = buffered_boundary_utm.to_crs(epsg=4326).iloc[0]
+
+    G = ox.graph_from_polygon(buffered_boundary_4326, network_type='all', retain_all=True)
+    nodes, buffered_roads = ox.graph_to_gdfs(G)
+    log(f"  ✓ {len(buffered_roads)} road segments fetched (including {buffer_m}m buffer)")
+    return buffered_roads
 
-G = ox.graph_from_polygon(buffered_boundary_4326, network_type='all', retain_all=True)
-nodes, buffered_roads = ox.graph_to_gdfs(G)
-log(f"  ✓ {len(buffered_roads)} road segments fetched (including 500m buffer)")
 
 # ---------------------
-# 3. Load and CLIP Flood Data (Strictly to District 1)
+# 3. Load and CLIP Flood Data (Strictly to the Area)
 # ---------------------
-log("Checking flood shapefile...")
-temp_gdf = gpd.read_file("ph137404000_fh100yr_30m_10m.shp", rows=1)
-shapefile_crs = temp_gdf.crs
+def load_flood(boundary_gdf, shapefile=FLOOD_SHAPEFILE):
+    log("Checking flood shapefile...")
+    temp_gdf = gpd.read_file(shapefile, rows=1)
+    shapefile_crs = temp_gdf.crs
+
+    log("Loading and clipping flood data...")
+    boundary_for_mask = boundary_gdf.to_crs(shapefile_crs)
+    flood_gdf = gpd.read_file(shapefile, mask=boundary_for_mask)
+    flood_gdf = flood_gdf.to_crs(epsg=4326)
+    flood_gdf = gpd.clip(flood_gdf, boundary_gdf)
 
-log("Loading and clipping flood data...")
-boundary_for_mask = district1_boundary_gdf.to_crs(shapefile_crs)
-flood_gdf = gpd.read_file("ph137404000_fh100yr_30m_10m.shp", mask=boundary_for_mask)
-flood_gdf = flood_gdf.to_crs(epsg=4326)
-flood_gdf = gpd.clip(flood_gdf, district1_boundary_gdf)
+    log("Simplifying flood geometries...")
+    flood_gdf['geometry'] = flood_gdf.simplify(0.00005, preserve_topology=True)
+    log(f"  ✓ Processed {len(flood_gdf)} clipped flood polygons")
+    return flood_gdf
 
-log("Simplifying flood geometries...")
-flood_gdf['geometry'] = flood_gdf.simplify(0.00005, preserve_topology=True)
-log(f"  ✓ Processed {len(flood_gdf)} clipped flood polygons")
 
 # ---------------------
 # 4. Analyze Risk
 # ---------------------
-log("Analyzing flood risk on roads...")
-if buffered_roads.crs != flood_gdf.crs:
-    buffered_roads = buffered_roads.to_crs(flood_gdf.crs)
+def analyze_risk(roads, flood_gdf, tile_size_m=TILE_SIZE_M, workers=None):
+    log("Analyzing flood risk on roads...")
+    if roads.crs != flood_gdf.crs:
+        roads = roads.to_crs(flood_gdf.crs)
 
-roads_joined = gpd.sjoin(buffered_roads, flood_gdf[['Var', 'geometry']], how="left", predicate="intersects")
+    # risk_level (max class touched) plus exposure_1..3 (length fraction per class)
+    overlay = road_flood_overlay(roads, flood_gdf, tile_size_m, workers, log=log)
+    for column in overlay.columns:
+        roads[column] = overlay[column]
+    log("  ✓ Risk analysis complete")
+    return roads
 
-if 'Var' in roads_joined.columns:
-    roads_joined['Var'] = pd.to_numeric(roads_joined['Var'], errors='coerce').fillna(0)
-    road_risks = roads_joined.groupby(level=[0, 1, 2])['Var'].max()
-    buffered_roads['risk_level'] = road_risks
-else:
-    buffered_roads['risk_level'] = 0
-log("  ✓ Risk analysis complete")
 
 # ---------------------
 # 5. Save Files
 # ---------------------
-qc_boundary_gdf = ox.geocode_to_gdf("Quezon City, Philippines").to_crs(epsg=4326)
-
-log("Saving results...")
-output_files = {
-    "flood_clipped.geojson": flood_gdf,
-    "qc_boundary.geojson": qc_boundary_gdf,
-    "district1_boundary.geojson": district1_boundary_gdf,
-    "district1_roads.geojson": buffered_roads
-}
+def save_outputs(output_files, geojson=False):
+    """Writes each layer as a GeoParquet artifact, plus its GeoJSON export if asked."""
+    log("Saving results...")
+    for filename, gdf in output_files.items():
+        save_layer(gdf, filename, geojson)
+        log(f"  ✓ Saved {parquet_path(filename)}" + (f" and {filename}" if geojson else ""))
+
+
+def build_bundles():
+    """Rebuilds the server's pre-compressed layer bundles from the fresh layers."""
+    from dotenv import load_dotenv
+    from sqlalchemy import create_engine
+
+    load_dotenv()
+    url = os.getenv("DATABASE_URL")
+    log("Building layer bundles...")
+    build_all(LayerCache(create_engine(url) if url else None, check_interval=0))
+
+
+def output_files(name):
+    """Output name of each layer (.geojson names; the artifacts are .parquet next to them)."""
+    if name == "district1":
+        return {"flood": "flood_clipped.geojson", "boundary": "district1_boundary.geojson", "roads": "district1_roads.geojson"}
+    return {"flood": f"{name}_flood_clipped.geojson", "boundary": f"{name}_boundary.geojson", "roads": f"{name}_roads.geojson"}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the boundary, road and flood layers of an area.")
+    parser.add_argument("--district", action="append", choices=sorted(DISTRICTS), help="QC district (repeatable)")
+    parser.add_argument("--place", action="append", help="Geocoded place, e.g. \"Quezon City, Philippines\" (repeatable)")
+    parser.add_argument("--polygon", action="append", help="GeoJSON/shapefile of the area (repeatable)")
+    parser.add_argument("--name", help="Output file prefix (default: the district names, else 'area')")
+    parser.add_argument("--buffer", type=float, default=500, help="Road network buffer around the area, in metres")
+    parser.add_argument("--flood", default=FLOOD_SHAPEFILE, help="Flood hazard shapefile")
+    parser.add_argument("--tile-size", type=float, default=TILE_SIZE_M, help="Risk join tile edge, in metres")
+    parser.add_argument("--risk-workers", type=int, default=None,
+                        help="Risk join processes (default: CPU count; 1 runs in-process)")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Concurrent geocoding requests (keep this low against the public Nominatim server)")
+    parser.add_argument("--cache-dir", default=BOUNDARY_CACHE_DIR)
+    parser.add_argument("--seed", action="store_true", help="Seed the boundary cache from the committed GeoJSON files")
+    parser.add_argument("--offline", action="store_true", help="Never geocode; fail on boundaries that are not cached")
+    parser.add_argument("--boundary-only", action="store_true", help="Stop after the area boundary")
+    parser.add_argument("--geojson", action="store_true", help="Also export every layer as GeoJSON")
+    parser.add_argument("--no-bundles", action="store_true", help="Do not rebuild the server's layer bundles")
+    args = parser.parse_args(argv)
+
+    districts = args.district or ([] if args.place or args.polygon else ["district1"])
+    name = args.name or ("_".join(districts) if districts and not (args.place or args.polygon) else "area")
+    outputs = output_files(name)
+    timer = StageTimer()
+
+    cache = BoundaryCache(args.cache_dir)
+    if args.seed:
+        seed_cache(cache)
+
+    try:
+        with timer.stage("boundary"):
+            boundary_gdf = build_area(cache, districts, args.place or (), args.polygon or (), args.workers, args.offline)
+        if args.boundary_only:
+            log(f"{name} boundary: {len(boundary_gdf)} polygon(s), bounds {boundary_gdf.total_bounds.round(5).tolist()}")
+            return
+
+        with timer.stage("roads"):
+            buffered_roads = fetch_roads(boundary_gdf, args.buffer)
+        with timer.stage("flood"):
+            flood_gdf = load_flood(boundary_gdf, args.flood)
+        with timer.stage("risk"):
+            buffered_roads = analyze_risk(buffered_roads, flood_gdf, args.tile_size, args.risk_workers)
+        with timer.stage("save"):
+            qc_boundary_gdf = get_place_boundaries(cache, [QC_QUERY], offline=args.offline)[0]
+            save_outputs({
+                outputs["flood"]: flood_gdf,
+                "qc_boundary.geojson": qc_boundary_gdf,
+                outputs["boundary"]: boundary_gdf,
+                outputs["roads"]: buffered_roads
+            }, args.geojson)
+        if not args.no_bundles:
+            with timer.stage("bundles"):
+                build_bundles()
+    finally:
+        timer.report()
+
+    log(f"Success! {name} data is ready.")
 
-for filename, gdf in output_files.items():
-    if os.path.exists(filename):
-        os.remove(filename)
-    gdf.to_file(filename, driver="GeoJSON")
-    log(f"  ✓ Saved {filename}")
 
-log("Success! District 1 data is ready.")
+if __name__ == "__main__":
+    main()
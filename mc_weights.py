@@ -0,0 +1,129 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+CRITERIA = ["length", "risk", "rainfall"]
+
+DEFAULT_MC_WEIGHTS = {"length": 0.2, "risk": 0.5, "rainfall": 0.3}
+
+
+def weight_vector(mc_weights):
+    weights = {**DEFAULT_MC_WEIGHTS, **(mc_weights or {})}
+    return np.array([float(weights[c]) for c in CRITERIA])
+
+
+class EdgeScorer:
+    """
+    Columnar WSM/TOPSIS scoring of every edge (calculateMCWeights).
+
+    Everything that does not depend on mcWeights is computed once: the WSM
+    min-max normalized matrix, the TOPSIS vector-normalized matrix and its
+    per-criterion min/max. Because the weights only scale each criterion,
+    PIS = w * min and NIS = w * max, so a slider move only redoes the final
+    weighted combination. A new rainfall vector only refreshes its own row.
+    """
+
+    def __init__(self, length, risk, rainfall):
+        self.length = np.asarray(length, dtype=np.float64)
+        self.n_edges = len(self.length)
+        # Rows: length, risk, rainfall
+        self.minmax_norm = np.empty((3, self.n_edges))
+        self.vector_norm = np.empty((3, self.n_edges))
+        self.vector_min = np.zeros(3)
+        self.vector_max = np.zeros(3)
+
+        lo, hi = (self.length.min(), self.length.max()) if self.n_edges else (0.0, 0.0)
+        self._set_row(0, self.length, lo, hi)
+        self._set_row(1, np.asarray(risk, dtype=np.float64), 0.0, 3.0)
+        self.set_rainfall(rainfall)
+
+    def _set_row(self, row, values, lo, hi):
+        if hi == lo:
+            self.minmax_norm[row] = 0.5
+        else:
+            self.minmax_norm[row] = (values - lo) / (hi - lo)
+
+        # The JS gathers every edge twice (once per direction), which doubles
+        # the sum of squares in the TOPSIS denominator.
+        denom = np.sqrt(2.0 * np.dot(values, values)) or 1.0
+        self.vector_norm[row] = values / denom
+        if self.n_edges:
+            self.vector_min[row] = self.vector_norm[row].min()
+            self.vector_max[row] = self.vector_norm[row].max()
+
+    def set_rainfall(self, rainfall):
+        """Incremental update: only the rainfall criterion is renormalized."""
+        rainfall = np.broadcast_to(np.asarray(rainfall, dtype=np.float64), (self.n_edges,))
+        self.rainfall = rainfall
+        self._set_row(2, rainfall, 0.0, max(10.0, float(rainfall.max(initial=0.0))))
+
+    def with_rainfall(self, rainfall):
+        """Copy sharing the length/risk rows, with a new rainfall row."""
+        scorer = EdgeScorer.__new__(EdgeScorer)
+        scorer.length = self.length
+        scorer.n_edges = self.n_edges
+        scorer.minmax_norm = self.minmax_norm.copy()
+        scorer.vector_norm = self.vector_norm.copy()
+        scorer.vector_min = self.vector_min.copy()
+        scorer.vector_max = self.vector_max.copy()
+        scorer.set_rainfall(rainfall)
+        return scorer
+
+    def wsm(self, mc_weights):
+        """Weighted sum of min-max normalized criteria per edge."""
+        return weight_vector(mc_weights) @ self.minmax_norm
+
+    def topsis(self, mc_weights):
+        """TOPSIS closeness coefficient per edge (higher = closer to ideal)."""
+        w = weight_vector(mc_weights)
+        weighted = self.vector_norm * w[:, None]
+        # All criteria are costs: PIS is the minimum, NIS the maximum
+        pis = (w * self.vector_min)[:, None]
+        nis = (w * self.vector_max)[:, None]
+        d_pis = np.sqrt(((weighted - pis) ** 2).sum(axis=0))
+        d_nis = np.sqrt(((weighted - nis) ** 2).sum(axis=0))
+        total = d_pis + d_nis
+        return np.divide(d_nis, total, out=np.zeros_like(total), where=total != 0)
+
+    def baked(self, mc_weights):
+        """
+        Dijkstra weight: length scaled by the WSM cost, length * (1 + 5 * wsm),
+        floored at 0. A negative risk_level code (-2 in the roads table)
+        makes the WSM negative, and on a two-way road a negative weight is a
+        negative cycle that Dijkstra never gets out of.
+        """
+        return np.maximum(self.length * (1 + self.wsm(mc_weights) * 5), 0.0)
+
+
+class ScorerCache:
+    """
+    Keeps EdgeScorers keyed by (graph version, rainfall key) so repeated
+    bakes with new slider values reuse the cached normalization.
+    """
+
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, graph, rainfall_key, rainfall):
+        key = (graph.version, rainfall_key)
+        with self._lock:
+            scorer = self._entries.get(key)
+            if scorer is not None:
+                self._entries.move_to_end(key)
+                return scorer
+
+            # Same network, new rainfall: reuse the static rows
+            for (version, _), cached in reversed(self._entries.items()):
+                if version == graph.version:
+                    scorer = cached.with_rainfall(rainfall)
+                    break
+            else:
+                scorer = EdgeScorer(graph.edge_length, graph.edge_risk, rainfall)
+
+            self._entries[key] = scorer
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return scorer
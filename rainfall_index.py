@@ -0,0 +1,111 @@
+import os
+import threading
+
+import numpy as np
+
+# GSMaP global lattice: 0.1 degree cells, row 0 starts at 60N, col 0 at 0E
+GRID_TOP_LAT = 60.0
+GRID_LEFT_LON = 0.0
+CELL_SIZE = 0.1
+GRID_ROWS = 1200
+GRID_COLS = 3600
+
+LATEST_GRID_PATH = "cache/jaxa_qc_latest.npz"
+
+
+def lat_to_row(lat):
+    """Global GSMaP row containing a latitude (works on scalars and arrays)."""
+    # The small epsilon keeps exact cell edges (e.g. 15.0) from rounding down
+    return np.floor((GRID_TOP_LAT - np.asarray(lat)) / CELL_SIZE + 1e-9).astype(np.int64)
+
+
+def lon_to_col(lon):
+    """Global GSMaP column containing a longitude."""
+    return np.floor((np.asarray(lon) % 360.0 - GRID_LEFT_LON) / CELL_SIZE + 1e-9).astype(np.int64)
+
+
+def save_grid(path, intensity, row0, col0, filename="", timestamp=""):
+    """Stores a clipped frame together with its position on the global lattice."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, intensity=intensity.astype(np.float32), row0=row0, col0=col0,
+             filename=filename, timestamp=timestamp)
+    os.replace(tmp_path, path)
+
+
+def load_grid(path=LATEST_GRID_PATH):
+    """Returns (intensity, row0, col0, filename) or None if no frame is stored."""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return data["intensity"], int(data["row0"]), int(data["col0"]), str(data["filename"])
+
+
+class EdgeRainfallIndex:
+    """
+    Global lattice row/column of every edge midpoint, computed once per road
+    network version. Applying a frame is then a single fancy-index gather.
+    """
+
+    def __init__(self, graph):
+        self.version = graph.version
+        self.rows = lat_to_row(graph.edge_mid[:, 1])
+        self.cols = lon_to_col(graph.edge_mid[:, 0])
+
+    def gather(self, intensity, row0, col0):
+        """Per-edge rainfall from a clipped frame whose [0, 0] cell is (row0, col0)."""
+        r = self.rows - row0
+        c = self.cols - col0
+        inside = (r >= 0) & (r < intensity.shape[0]) & (c >= 0) & (c < intensity.shape[1])
+        rainfall = np.zeros(len(self.rows), dtype=np.float32)
+        rainfall[inside] = intensity[r[inside], c[inside]]
+        return rainfall
+
+
+class EdgeRainfallCache:
+    """
+    Keeps the per-edge rainfall vector of the latest frame, recomputed only
+    when the road network or the frame changes.
+    """
+
+    def __init__(self, path=LATEST_GRID_PATH):
+        self.path = path
+        self._index = None
+        self._key = None
+        self._rainfall = None
+        self._filename = None
+        self._lock = threading.Lock()
+
+    def index_for(self, graph):
+        """EdgeRainfallIndex of the current road network."""
+        with self._lock:
+            if self._index is None or self._index.version != graph.version:
+                self._index = EdgeRainfallIndex(graph)
+            return self._index
+
+    def _frame_key(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def get(self, graph):
+        """Returns (rainfall per edge, frame filename or None)."""
+        frame_key = self._frame_key()
+        key = (graph.version, frame_key)
+        with self._lock:
+            if key == self._key:
+                return self._rainfall, self._filename
+
+            if self._index is None or self._index.version != graph.version:
+                self._index = EdgeRainfallIndex(graph)
+
+            grid = load_grid(self.path) if frame_key else None
+            if grid is None:
+                self._rainfall, self._filename = np.zeros(graph.n_edges, dtype=np.float32), None
+            else:
+                intensity, row0, col0, filename = grid
+                self._rainfall, self._filename = self._index.gather(intensity, row0, col0), filename
+            self._key = key
+            return self._rainfall, self._filename
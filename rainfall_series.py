@@ -0,0 +1,218 @@
+import bisect
+import datetime
+import math
+import re
+import threading
+
+import numpy as np
+
+from frame_archive import KEY_FORMAT, get_archive
+from jaxa_client import PRODUCT_INTERVALS
+from rainfall_index import CELL_SIZE, GRID_LEFT_LON, GRID_TOP_LAT
+
+AGGREGATIONS = ("sum", "max")
+
+# Frames of the latest hours kept as running sums in memory (3 days of half-hourly frames)
+MAX_STACK_FRAMES = 144
+
+_WINDOW_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)\s*(m|min|h)$")
+
+
+def parse_window(value):
+    """'30m', '1h', '3h', '24h' -> timedelta."""
+    match = _WINDOW_PATTERN.match(str(value).strip().lower())
+    if not match or float(match.group(1)) <= 0:
+        raise ValueError(f"Invalid window: {value} (use e.g. 30m, 1h, 3h)")
+    amount = float(match.group(1))
+    return datetime.timedelta(hours=amount) if match.group(2) == "h" else datetime.timedelta(minutes=amount)
+
+
+def bbox_to_window(west, south, east, north):
+    """Global lattice (row_start, row_stop, col_start, col_stop) of the cells touching a bbox."""
+    if west >= east or south >= north:
+        raise ValueError("bbox must be west,south,east,north")
+    row_start = math.floor((GRID_TOP_LAT - north) / CELL_SIZE + 1e-9)
+    row_stop = math.ceil((GRID_TOP_LAT - south) / CELL_SIZE - 1e-9)
+    col_start = math.floor((west - GRID_LEFT_LON) / CELL_SIZE + 1e-9)
+    col_stop = math.ceil((east - GRID_LEFT_LON) / CELL_SIZE - 1e-9)
+    return row_start, row_stop, col_start, col_stop
+
+
+def clean(frames):
+    """JAXA "no data" (negative) and implausible values count as no rain."""
+    frames = np.asarray(frames, dtype=np.float64)
+    return np.where(np.isfinite(frames) & (frames >= 0) & (frames <= 500), frames, 0.0)
+
+
+class AccumulationStack:
+    """
+    Running rainfall depth (mm) over the newest archived frames of a product,
+    on the archive's whole clipped grid.
+
+    cum[k] is the depth accumulated before frame k, so the total over frames
+    j..i is cum[i + 1] - cum[j]: any window is one subtraction, and a new
+    frame costs a single O(cells) addition. Older frames than the newest
+    `max_frames` are not kept here; windows reaching back that far are summed
+    from the archive memmap instead.
+    """
+
+    def __init__(self, archive, interval_hours, max_frames=MAX_STACK_FRAMES):
+        self.archive = archive
+        self.interval = interval_hours
+        self.max_frames = max_frames
+        self.keys = []
+        self.times = []
+        self.cum = []
+        # True when the archive holds frames older than self.keys[0]
+        self.truncated = False
+        self._version = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        with self._lock:
+            version = self.archive.version
+            if version == self._version:
+                return
+            all_keys = self.archive.keys()
+            keys = all_keys[-self.max_frames:]
+
+            last = self.keys[-1] if self.keys else None
+            known = [k for k in keys if last is not None and k <= last]
+            if last is not None and known == self.keys[len(self.keys) - len(known):]:
+                # Only newer frames arrived: extend the running sums
+                new_keys = keys[len(known):]
+            else:
+                # First load or a backfill in the middle: rebuild
+                self.keys, self.times = [], []
+                self.cum = [np.zeros(self.archive.shape)]
+                new_keys = keys
+
+            for key in new_keys:
+                self.cum.append(self.cum[-1] + clean(self.archive.frame(key)) * self.interval)
+                self.keys.append(key)
+                self.times.append(datetime.datetime.strptime(key, KEY_FORMAT))
+
+            drop = len(self.keys) - self.max_frames
+            if drop > 0:
+                self.keys, self.times, self.cum = self.keys[drop:], self.times[drop:], self.cum[drop:]
+            self.truncated = len(all_keys) > len(self.keys)
+            self._version = version
+
+    def window_sums(self, end_index, window, rows, cols):
+        """
+        Depth over (times[end_index] - window, times[end_index]] and the number
+        of frames in it, or None if the window reaches past the cached frames.
+        """
+        start = bisect.bisect_right(self.times, self.times[end_index] - window)
+        if start == 0 and self.truncated:
+            return None
+        depth = self.cum[end_index + 1][rows, cols] - self.cum[start][rows, cols]
+        return depth, end_index + 1 - start
+
+
+def _rolling(times, values, out_indexes, window, agg, interval):
+    """Window aggregates of cleaned frames `values` (time x rows x cols)."""
+    results, counts = [], []
+    if agg == "sum":
+        cum = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values * interval, axis=0)])
+    for i in out_indexes:
+        j = bisect.bisect_right(times, times[i] - window)
+        if agg == "sum":
+            results.append(cum[i + 1] - cum[j])
+        else:
+            results.append(values[j:i + 1].max(axis=0))
+        counts.append(i + 1 - j)
+    return results, counts
+
+
+def series(product, row_start, row_stop, col_start, col_stop, start=None, end=None, window="1h", agg="sum"):
+    """
+    Rolling `agg` over `window` ending at every archived frame in [start, end],
+    over a global lattice window inside the archive bbox.
+
+    sum is the rainfall depth in mm, max the peak rate in mm/h. Returns a
+    dict with times, frames (frames inside each window) and values
+    (time x rows x cols), or None if nothing is archived.
+    """
+    if agg not in AGGREGATIONS:
+        raise ValueError(f"Unknown agg: {agg} (use sum or max)")
+    window = parse_window(window)
+    stack = get_stack(product)
+    archive = stack.archive
+    if not archive.contains_window(row_start, row_stop, col_start, col_stop):
+        raise ValueError("bbox is outside the archived area")
+
+    keys = archive.keys()
+    if not keys:
+        return None
+    end_key = end.strftime(KEY_FORMAT) if end else keys[-1]
+    start_key = start.strftime(KEY_FORMAT) if start else end_key
+    out_keys = [k for k in keys if start_key <= k <= end_key]
+    if not out_keys:
+        return {"times": [], "frames": [], "values": np.empty((0, row_stop - row_start, col_stop - col_start))}
+
+    rows = slice(row_start - archive.row0, row_stop - archive.row0)
+    cols = slice(col_start - archive.col0, col_stop - archive.col0)
+
+    # Hot path: running sums of the newest frames
+    if agg == "sum":
+        stack.refresh()
+        position = {k: i for i, k in enumerate(stack.keys)}
+        if all(k in position for k in out_keys):
+            sums = [stack.window_sums(position[k], window, rows, cols) for k in out_keys]
+            if all(s is not None for s in sums):
+                return {
+                    "times": [datetime.datetime.strptime(k, KEY_FORMAT) for k in out_keys],
+                    "frames": [n for _, n in sums],
+                    "values": np.stack([d for d, _ in sums]),
+                }
+
+    # Cold path: read just the needed frames of the bbox from the memmap
+    first = datetime.datetime.strptime(out_keys[0], KEY_FORMAT) - window
+    times, frames = archive.series(first, datetime.datetime.strptime(end_key, KEY_FORMAT),
+                                   row_start, row_stop, col_start, col_stop)
+    index_of = {t.strftime(KEY_FORMAT): i for i, t in enumerate(times)}
+    values, counts = _rolling(times, clean(frames), [index_of[k] for k in out_keys], window, agg,
+                              PRODUCT_INTERVALS.get(product, 1.0))
+    return {
+        "times": [datetime.datetime.strptime(k, KEY_FORMAT) for k in out_keys],
+        "frames": counts,
+        "values": np.stack(values),
+    }
+
+
+def latest_window_rate(window, product="now"):
+    """
+    Mean rainfall rate (mm/h) over the trailing window ending at the newest
+    archived frame, on the whole archive grid: (rate, row0, col0, frame key),
+    or None if nothing is archived. The depth is divided by the hours the
+    archived frames in the window actually cover, not the window length:
+    right after a restart a 3h window may hold a single frame.
+    """
+    stack = get_stack(product)
+    stack.refresh()
+    if not stack.keys:
+        return None
+    archive = stack.archive
+    sums = stack.window_sums(len(stack.keys) - 1, parse_window(window), slice(None), slice(None))
+    if sums is not None:
+        depth, count = sums
+    else:
+        rows, cols = archive.shape
+        result = series(product, archive.row0, archive.row0 + rows, archive.col0, archive.col0 + cols,
+                        window=window, agg="sum")
+        depth, count = result["values"][-1], result["frames"][-1]
+    return (depth / (count * stack.interval)).astype(np.float32), archive.row0, archive.col0, stack.keys[-1]
+
+
+_stacks = {}
+_stacks_lock = threading.Lock()
+
+
+def get_stack(product="now"):
+    """Shared accumulation stack per product."""
+    with _stacks_lock:
+        stack = _stacks.get(product)
+        if stack is None:
+            stack = _stacks[product] = AccumulationStack(get_archive(product), PRODUCT_INTERVALS.get(product, 1.0))
+        return stack
@@ -0,0 +1,163 @@
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from layer_bundles import compress_variants
+from layer_cache import CachedLayer
+
+STORE_DIR = "cache/rainfall"
+
+# Published frames kept on disk
+KEEP_FRAMES = int(os.getenv("RAINFALL_KEEP_FRAMES", 48))
+
+# Older versions kept loaded and compressed in memory for ?version= requests
+LOADED_VERSIONS = int(os.getenv("RAINFALL_LOADED_VERSIONS", 8))
+
+
+def _atomic_write(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class RainfallStore:
+    """
+    Versioned store of the published rainfall grid.
+
+    Every publish writes <version>.json (version = content digest) through a
+    temp file and rename, then swaps manifest.json, which names the current
+    version and the last `keep` ones; older files are pruned. Readers only
+    ever follow the manifest, so they never see a torn grid.
+
+    The current grid is held in memory pre-serialized and pre-compressed
+    (a CachedLayer), so serving it costs no disk I/O. Grids published by
+    another process are picked up by re-checking the manifest at most every
+    `check_interval` seconds. Older versions requested by clients are kept
+    compressed in a small LRU, so replaying a frame does not re-read and
+    re-compress it on every request.
+    """
+
+    def __init__(self, root=STORE_DIR, keep=KEEP_FRAMES, check_interval=1.0, loaded=LOADED_VERSIONS):
+        self.root = root
+        self.keep = keep
+        self.check_interval = check_interval
+        self.loaded = loaded
+        self._loaded = OrderedDict()
+        self._loaded_lock = threading.Lock()
+        self.manifest_path = os.path.join(root, "manifest.json")
+        self._lock = threading.Lock()
+        self._current = None
+        self._manifest_key = None
+        self._checked_at = 0.0
+
+    def _path(self, version):
+        return os.path.join(self.root, f"{version}.json")
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"current": None, "versions": []}
+
+    def _stat_manifest(self):
+        try:
+            stat = os.stat(self.manifest_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def publish(self, grid):
+        """Stores a grid dict as the new current frame and returns its version."""
+        body = json.dumps(grid).encode("utf-8")
+        version = hashlib.sha256(body).hexdigest()[:16]
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            _atomic_write(self._path(version), body)
+
+            manifest = self._read_manifest()
+            versions = [v for v in manifest["versions"] if v["version"] != version]
+            versions.append({
+                "version": version,
+                "filename": grid.get("filename"),
+                "timestamp": grid.get("timestamp"),
+                "published_at": datetime.datetime.now().isoformat(),
+            })
+            stale, versions = versions[:-self.keep], versions[-self.keep:]
+            _atomic_write(self.manifest_path, json.dumps({"current": version, "versions": versions}).encode("utf-8"))
+
+            for entry in stale:
+                try:
+                    os.remove(self._path(entry["version"]))
+                except OSError:
+                    pass
+
+            self._current = CachedLayer("rainfall", compress_variants(body), version)
+            self._manifest_key = self._stat_manifest()
+            self._checked_at = time.monotonic()
+        return version
+
+    def current(self):
+        """Hot copy of the current grid (CachedLayer), or None if nothing is published."""
+        now = time.monotonic()
+        if self._current is not None and now - self._checked_at < self.check_interval:
+            return self._current
+
+        with self._lock:
+            self._checked_at = now
+            key = self._stat_manifest()
+            if key is None:
+                return None
+            if key != self._manifest_key or self._current is None:
+                version = self._read_manifest()["current"]
+                if version is None:
+                    return None
+                if self._current is None or self._current.version != version:
+                    self._current = self._load(version)
+                self._manifest_key = key
+            return self._current
+
+    def get(self, version):
+        """A kept version, or None if it was pruned or never existed."""
+        current = self.current()
+        if current is not None and current.version == version:
+            return current
+        if version not in {v["version"] for v in self.versions()}:
+            return None
+        with self._loaded_lock:
+            layer = self._loaded.get(version)
+            if layer is not None:
+                self._loaded.move_to_end(version)
+                return layer
+        layer = self._load(version)
+        with self._loaded_lock:
+            self._loaded[version] = layer
+            while len(self._loaded) > self.loaded:
+                self._loaded.popitem(last=False)
+        return layer
+
+    def _load(self, version):
+        with open(self._path(version), "rb") as f:
+            return CachedLayer("rainfall", compress_variants(f.read()), version)
+
+    def versions(self):
+        """Kept versions with their frame file name and timestamps, oldest first."""
+        return self._read_manifest()["versions"]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Process-wide store, shared by the ingest worker and the API."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RainfallStore()
+        return _store
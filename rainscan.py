@@ -0,0 +1,247 @@
+"""
+Historical GSMaP rainfall scan.
+
+Lists the frames of a product over a time range, samples them, serves what it
+can from the frame archive, downloads the rest into the shared frame cache,
+and computes per-frame statistics over a bbox.
+
+    python rainscan.py --region qc --start 2024-10-22 --end 2024-10-24 --stride 6 --threshold 5
+    python rainscan.py --bbox 20 10 118 126 --start 2026-02-03 --end 2026-02-04T23:59 --stride 4 --threshold 0.5 --first
+
+Credentials are read from JAXA_FTP_USER / JAXA_FTP_PASSWORD (or --user / --password).
+"""
+import argparse
+import csv
+import datetime
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from dotenv import load_dotenv
+
+from frame_archive import ARCHIVE_DIR, FrameArchive
+from gsmap_reader import lat_to_idx, lon_to_idx, read_window
+from jaxa_client import (FRAME_CACHE_DIR, JAXA_HOST, PRODUCT_DIRS, JaxaFTPClient,
+                         frame_cache_path, parse_frame_time, product_dir)
+
+# (north, south, west, east) boxes the old one-off scan scripts used
+REGIONS = {
+    "qc": (14.8, 14.6, 121.0, 121.2),
+    "luzon": (20, 10, 118, 126),
+    "central_luzon": (18, 12, 120, 123),
+    "mindanao": (10, 4, 118, 127),
+    "philippines": (20, 5, 115, 130),
+}
+
+COLUMNS = ["frame_time", "filename", "max", "mean", "percentile", "wet_cells", "cells", "exceeds"]
+
+
+def parse_time(value):
+    """YYYY-MM-DD or YYYY-MM-DDTHH:MM (UTC)."""
+    for fmt in ("%Y-%m-%dT%H:%M", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"Invalid time: {value}")
+
+
+def parse_end_time(value):
+    """Like parse_time, but a bare date covers the whole day."""
+    end = parse_time(value)
+    if len(value) == 10:
+        end = end.replace(hour=23, minute=59, second=59)
+    return end
+
+
+def list_frames(client, product, start, end, stride=1, hours=None):
+    """
+    Remote frames between start and end (inclusive), sorted by time, keeping
+    every `stride`-th one and, optionally, only the given UTC hours.
+    Returns [(frame time, remote path)].
+    """
+    today = datetime.datetime.utcnow().date()
+    frames = []
+    day = start.date()
+    while day <= end.date():
+        remote_dir = product_dir(product, day)
+        try:
+            # Today's directory still grows, past days never change
+            names = client.list_dir(remote_dir, use_cache=day != today)
+        except Exception as e:
+            print(f"Skipping {remote_dir}: {e}", file=sys.stderr)
+            names = []
+        for name in names:
+            stamp = parse_frame_time(name)
+            if name.endswith('.gz') and stamp and start <= stamp <= end:
+                frames.append((stamp, remote_dir + name))
+        day += datetime.timedelta(days=1)
+
+    frames.sort()
+    if hours is not None:
+        frames = [f for f in frames if f[0].hour in hours]
+    return frames[::stride]
+
+
+def window_stats(window, percentile, threshold):
+    """Statistics of a frame window."""
+    # Negative values are JAXA "no data"
+    valid = window[np.isfinite(window) & (window >= 0)]
+    if valid.size == 0:
+        max_rain = mean_rain = pct_rain = 0.0
+    else:
+        max_rain = float(valid.max())
+        mean_rain = float(valid.mean())
+        pct_rain = float(np.percentile(valid, percentile))
+    return {
+        "max": round(max_rain, 3),
+        "mean": round(mean_rain, 3),
+        "percentile": round(pct_rain, 3),
+        "wet_cells": int((valid > 0).sum()),
+        "cells": int(window.size),
+        "exceeds": max_rain >= threshold,
+    }
+
+
+def bbox_window(bbox):
+    """Global lattice (row_start, row_stop, col_start, col_stop) of a bbox."""
+    north, south, west, east = bbox
+    return lat_to_idx(north), lat_to_idx(south), lon_to_idx(west), lon_to_idx(east)
+
+
+def scan(client, product, bbox, start, end, stride=1, hours=None, threshold=0.5,
+         percentile=95, workers=None, cache_dir=FRAME_CACHE_DIR, archive=None):
+    """
+    Yields one row per sampled frame in time order.
+
+    Frames already in the archive are sliced from its memmap. The rest are
+    downloaded on the client's session pool (unless in the frame cache) and
+    decompressed in worker processes as their downloads finish, while rows
+    are already being yielded; when the bbox lies inside the archive,
+    workers return the archive window so each frame is also archived.
+    """
+    window = bbox_window(bbox)
+    if archive is not None and not archive.contains_window(*window):
+        print("bbox is outside the frame archive, reading frames directly", file=sys.stderr)
+        archive = None
+    if archive is not None:
+        rows, cols = archive.shape
+        read_rows_cols = (archive.row0, archive.row0 + rows, archive.col0, archive.col0 + cols)
+    else:
+        read_rows_cols = window
+
+    frames = list_frames(client, product, start, end, stride, hours)
+    archived = {remote for stamp, remote in frames if archive is not None and stamp in archive}
+    local = {remote: frame_cache_path(product, os.path.basename(remote), cache_dir)
+             for _, remote in frames if remote not in archived}
+    missing = [(remote, path) for remote, path in local.items() if not os.path.exists(path)]
+    print(f"{len(frames)} frames selected: {len(archived)} archived, "
+          f"{len(local) - len(missing)} in the frame cache, {len(missing)} to download", file=sys.stderr)
+
+    failed = set()
+    pool = ProcessPoolExecutor(max_workers=workers)
+    downloads = client.download_many(missing)
+    downloading = {remote for remote, _ in missing}
+
+    def wait_for(remote):
+        # Reads are submitted as downloads finish, in whatever order they do
+        while remote in downloading:
+            done, path, error = next(downloads)
+            downloading.discard(done)
+            if error:
+                print(f"Download failed {done}: {error}", file=sys.stderr)
+                failed.add(done)
+            else:
+                futures[done] = pool.submit(read_window, path, *read_rows_cols)
+
+    try:
+        futures = {}
+        for remote, path in local.items():
+            if remote not in downloading:
+                futures[remote] = pool.submit(read_window, path, *read_rows_cols)
+
+        for stamp, remote in frames:
+            wait_for(remote)
+            if remote in failed:
+                continue
+            if remote in archived:
+                data = archive.window(stamp, *window)
+            else:
+                try:
+                    data = futures[remote].result()
+                except Exception as e:
+                    print(f"Could not read {local[remote]}: {e}", file=sys.stderr)
+                    continue
+                if archive is not None:
+                    archive.append(stamp, data, os.path.basename(remote))
+                    data = archive.window(stamp, *window)
+            stats = window_stats(data, percentile, threshold)
+            yield {"frame_time": stamp.strftime("%Y-%m-%d %H:%M"), "filename": os.path.basename(remote), **stats}
+    finally:
+        # Stopping early (--first) cancels the downloads not started yet and
+        # drops the frames not analysed yet
+        downloads.close()
+        pool.shutdown(cancel_futures=True)
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Scan historical JAXA GSMaP frames for rainfall over an area.")
+    area = parser.add_mutually_exclusive_group(required=True)
+    area.add_argument("--region", choices=sorted(REGIONS), help="Named bounding box")
+    area.add_argument("--bbox", nargs=4, type=float, metavar=("NORTH", "SOUTH", "WEST", "EAST"))
+    parser.add_argument("--start", type=parse_time, required=True, help="UTC, YYYY-MM-DD[THH:MM]")
+    parser.add_argument("--end", type=parse_end_time, required=True, help="UTC, YYYY-MM-DD[THH:MM]; a bare date means the whole day")
+    parser.add_argument("--product", choices=sorted(PRODUCT_DIRS), default="now")
+    parser.add_argument("--stride", type=int, default=1, help="Keep every Nth frame")
+    parser.add_argument("--hours", type=lambda v: {int(h) for h in v.split(',')}, help="Only these UTC hours, e.g. 0,6,12,18")
+    parser.add_argument("--threshold", type=float, default=0.5, help="mm/h; frames whose max reaches it are flagged")
+    parser.add_argument("--percentile", type=float, default=95)
+    parser.add_argument("--only-matches", action="store_true", help="Print only frames above the threshold")
+    parser.add_argument("--first", action="store_true", help="Stop at the first frame above the threshold")
+    parser.add_argument("--workers", type=int, default=None, help="Analysis processes (default: CPU count)")
+    parser.add_argument("--connections", type=int, default=4, help="Concurrent FTP sessions")
+    parser.add_argument("--cache-dir", default=FRAME_CACHE_DIR)
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--no-archive", action="store_true", help="Neither read from nor add to the frame archive")
+    parser.add_argument("--csv", help="Also write the table to this file")
+    parser.add_argument("--host", default=os.getenv("JAXA_FTP_HOST", JAXA_HOST))
+    parser.add_argument("--port", type=int, default=int(os.getenv("JAXA_FTP_PORT", 21)))
+    parser.add_argument("--user", default=os.getenv("JAXA_FTP_USER", ""))
+    parser.add_argument("--password", default=os.getenv("JAXA_FTP_PASSWORD", ""))
+    args = parser.parse_args(argv)
+
+    bbox = tuple(args.bbox) if args.bbox else REGIONS[args.region]
+    archive = None if args.no_archive else FrameArchive(args.product, args.archive_dir)
+    client = JaxaFTPClient(args.host, args.user, args.password, port=args.port, pool_size=args.connections)
+    out = open(args.csv, "w", newline="") if args.csv else None
+    writer = csv.DictWriter(out, fieldnames=COLUMNS) if out else None
+    if writer:
+        writer.writeheader()
+
+    print(f"{'frame (UTC)':<17} {'max':>8} {'mean':>8} {'p' + format(args.percentile, 'g'):>8} {'wet':>6}")
+    matches = 0
+    try:
+        for row in scan(client, args.product, bbox, args.start, args.end, args.stride, args.hours,
+                        args.threshold, args.percentile, args.workers, args.cache_dir, archive):
+            if writer:
+                writer.writerow(row)
+            if row["exceeds"]:
+                matches += 1
+            if row["exceeds"] or not args.only_matches:
+                flag = "  <-- above threshold" if row["exceeds"] else ""
+                print(f"{row['frame_time']:<17} {row['max']:8.2f} {row['mean']:8.2f} {row['percentile']:8.2f} "
+                      f"{row['wet_cells']:>6}{flag}")
+            if row["exceeds"] and args.first:
+                break
+    finally:
+        client.close()
+        if out:
+            out.close()
+
+    print(f"{matches} frame(s) at or above {args.threshold} mm/h", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
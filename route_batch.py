@@ -0,0 +1,159 @@
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from routing import Path, SearchGraph, lazy_k_shortest_paths, target_tree
+
+# Worker processes of the shared batch routing pool (default: CPU count, at most 4)
+BATCH_WORKERS = int(os.getenv("ROUTE_BATCH_WORKERS", 0)) or min(os.cpu_count() or 1, 4)
+
+# Sources per task: enough to amortize the inter-process round trip
+BATCH_CHUNK = 16
+
+# Jobs whose arrays a worker keeps attached (concurrent batch requests)
+WORKER_JOBS = 4
+
+# Per-process state: the graph, set by _init_worker, and the attached jobs
+_graph = None
+_jobs = OrderedDict()
+
+
+def _init_worker(offsets, targets, arc_edge, version):
+    global _graph
+    _graph = SearchGraph(offsets, targets, arc_edge, version)
+
+
+def _job_state(job):
+    """The arrays of a job, attached from shared memory once per worker."""
+    job_id, blocks, goal_nodes, k = job
+    state = _jobs.get(job_id)
+    if state is None:
+        handles, arrays = [], []
+        for name, dtype, shape in blocks:
+            handle = shared_memory.SharedMemory(name=name)
+            handles.append(handle)
+            arrays.append(np.ndarray(shape, dtype=dtype, buffer=handle.buf))
+        weights, tree = arrays[0], tuple(arrays[1:])
+        state = _jobs[job_id] = {
+            "handles": handles,
+            "weights": weights,
+            "goals": set(goal_nodes),
+            "k": k,
+            "tree": tree,
+        }
+        while len(_jobs) > WORKER_JOBS:
+            _, old = _jobs.popitem(last=False)
+            old.clear()  # drop the views before closing the blocks
+            for handle in old.get("handles", []):
+                handle.close()
+    return state
+
+
+def _route_sources(graph, state, chunk):
+    """(position, source) pairs -> (position, [(nodes, edges, cost, target), ...])."""
+    results = []
+    for position, source in chunk:
+        paths = lazy_k_shortest_paths(graph, state["weights"], source, state["goals"], state["k"], state["tree"])
+        results.append((position, [(p.nodes, p.edges, p.cost, p.target) for p in paths]))
+    return results
+
+
+def _route_chunk(job, chunk):
+    return _route_sources(_graph, _job_state(job), chunk)
+
+
+class BatchPool:
+    """
+    One process pool shared by every batch request, holding the CSR arrays
+    of the current road graph (sent once per worker by the initializer) and
+    started again only when the graph version changes. The per-request
+    arrays (weights and target tree) go through shared memory, so a task
+    only carries the job's block names and its sources.
+    """
+
+    def __init__(self, workers=BATCH_WORKERS):
+        self.workers = workers
+        self._pool = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, graph):
+        with self._lock:
+            if self._pool is None or self._version != graph.version:
+                if self._pool is not None:
+                    # Requests still running on the old pool keep it until they finish
+                    self._pool.shutdown(wait=False)
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                 initargs=(graph.offsets, graph.targets, graph.arc_edge, graph.version))
+                self._version = graph.version
+            return self._pool
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+
+batch_pool = BatchPool()
+
+
+def _share(arrays):
+    """Copies arrays into new shared memory blocks: (handles, [(name, dtype, shape), ...])."""
+    handles, blocks = [], []
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        handle = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=handle.buf)[...] = array
+        handles.append(handle)
+        blocks.append((handle.name, array.dtype.str, array.shape))
+    return handles, blocks
+
+
+def route_many(graph, edge_weights, sources, goal_nodes, k=1, pool=batch_pool, chunk_size=BATCH_CHUNK):
+    """
+    Yields (position, [Path, ...]) for every source node, in the order the
+    searches finish.
+
+    The weights are baked once by the caller and the target_tree into the
+    goal set is built once here; every search (lazy Yen) shares it, so
+    k=1 is a walk down the tree. Sources are searched in chunks on the
+    shared BatchPool; a single chunk (or a one-worker pool) runs inline.
+    """
+    weights = np.asarray(edge_weights, dtype=np.float64)
+    goal_nodes = sorted(set(int(n) for n in goal_nodes))
+    tree = target_tree(graph, weights, goal_nodes)
+    jobs = list(enumerate(int(s) for s in sources))
+    chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+
+    def unpack(results):
+        for position, paths in results:
+            yield position, [Path(*p) for p in paths]
+
+    if pool is None or pool.workers <= 1 or len(chunks) <= 1:
+        search = SearchGraph(graph.offsets, graph.targets, graph.arc_edge, graph.version)
+        state = {"weights": weights, "goals": set(goal_nodes), "k": k, "tree": tree}
+        for chunk in chunks:
+            yield from unpack(_route_sources(search, state, chunk))
+        return
+
+    handles, blocks = _share([weights, *tree])
+    job = (uuid.uuid4().hex, blocks, goal_nodes, k)
+    futures = []
+    try:
+        executor = pool.get(graph)
+        futures = [executor.submit(_route_chunk, job, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            yield from unpack(future.result())
+    finally:
+        # A client that disconnects mid-stream drops the chunks not started yet
+        for future in futures:
+            future.cancel()
+        for handle in handles:
+            handle.close()
+            handle.unlink()
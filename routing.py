@@ -0,0 +1,564 @@
+import heapq
+import json
+import threading
+from itertools import accumulate, count
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra as sparse_dijkstra
+
+from landmarks import cheapest_arcs
+from mc_weights import DEFAULT_MC_WEIGHTS, EdgeScorer
+from risk_join import EXPOSURE_CLASSES, EXPOSURE_COLUMNS
+from snapping import SnapIndex
+
+# Same multipliers as getEffectedWeight in static/dijkstra.js
+RISK_MULTIPLIERS = {1: 1.5, 2: 3.0, 3: 10.0}
+
+
+class RoadGraph:
+    """
+    Compact CSR representation of the road network.
+
+    Every road feature becomes two arcs (u->v and v->u), exactly like the
+    adjacency list built in static/data-loader.js. Edge arrays are indexed by
+    feature order in the roads table; arc arrays by CSR position.
+    """
+
+    def __init__(self, gdf, version=None):
+        self.version = version
+        self.gdf = gdf.reset_index(drop=True)
+
+        u_ids = self.gdf["u"].to_numpy(dtype=np.int64)
+        v_ids = self.gdf["v"].to_numpy(dtype=np.int64)
+        self.node_ids, inverse = np.unique(np.concatenate([u_ids, v_ids]), return_inverse=True)
+        n_edges = len(u_ids)
+        self.edge_u = inverse[:n_edges].astype(np.int32)
+        self.edge_v = inverse[n_edges:].astype(np.int32)
+        self._node_index = {int(n): i for i, n in enumerate(self.node_ids)}
+
+        # `length || 1` for weights, `length || 0` for reported distances
+        raw_length = self.gdf["length"].to_numpy(dtype=np.float64, na_value=0.0) if "length" in self.gdf else np.zeros(n_edges)
+        self.edge_length_raw = np.nan_to_num(raw_length)
+        self.edge_length = np.where(self.edge_length_raw > 0, self.edge_length_raw, 1.0)
+        risk = self.gdf["risk_level"].to_numpy(dtype=np.float64, na_value=0.0) if "risk_level" in self.gdf else np.zeros(n_edges)
+        self.edge_risk = np.nan_to_num(risk)
+        # Fraction of each edge's length in flood classes 1..3 (edges x classes),
+        # None for road tables built before the exposure overlay
+        if all(c in self.gdf for c in EXPOSURE_COLUMNS):
+            self.edge_exposure = np.nan_to_num(self.gdf[EXPOSURE_COLUMNS].to_numpy(dtype=np.float64, na_value=0.0))
+        else:
+            self.edge_exposure = None
+
+        # Midpoint = middle vertex of the line (coords[floor(len / 2)] in JS),
+        # node coordinates = first/last vertex of each line
+        self.edge_mid = np.zeros((n_edges, 2))
+        self.node_coords = np.zeros((len(self.node_ids), 2))
+        for i, geom in enumerate(self.gdf.geometry.values):
+            coords = np.asarray(geom.coords)
+            self.edge_mid[i] = coords[len(coords) // 2]
+            self.node_coords[self.edge_u[i]] = coords[0]
+            self.node_coords[self.edge_v[i]] = coords[-1]
+
+        # CSR arrays over both directions
+        src = np.concatenate([self.edge_u, self.edge_v])
+        dst = np.concatenate([self.edge_v, self.edge_u])
+        edge = np.concatenate([np.arange(n_edges), np.arange(n_edges)])
+        order = np.argsort(src, kind="stable")
+        self.targets = dst[order].astype(np.int32)
+        self.arc_edge = edge[order].astype(np.int32)
+        self.offsets = np.zeros(len(self.node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=len(self.node_ids)), out=self.offsets[1:])
+
+        # Plain lists are much faster than NumPy scalars inside the heap loop
+        self._offsets = self.offsets.tolist()
+        self._targets = self.targets.tolist()
+        self._arc_edge = self.arc_edge.tolist()
+
+        # Built once per network version, like the graph itself
+        self.snap = SnapIndex(self)
+
+    @property
+    def n_nodes(self):
+        return len(self.node_ids)
+
+    @property
+    def n_edges(self):
+        return len(self.edge_u)
+
+    def node_index(self, node_id):
+        """Internal index of an OSM node id (None if it is not in the graph)."""
+        return self._node_index.get(int(node_id))
+
+    def nearest_nodes(self, lats, lngs):
+        """
+        Vectorized nearest-node lookup: the closest usable node in metres
+        (see SnapIndex).
+        """
+        return self.snap.nearest_nodes(lats, lngs)[0]
+
+    def features(self, edge_ids):
+        """GeoJSON features of the given edges, in order."""
+        if len(edge_ids) == 0:
+            return []
+        # List-valued OSM tags come back as arrays from the GeoJSON fallback
+        body = self.gdf.iloc[list(edge_ids)].to_json(default=lambda o: o.tolist() if hasattr(o, "tolist") else str(o))
+        return json.loads(body)["features"]
+
+
+class SearchGraph:
+    """
+    The CSR arrays of a RoadGraph without its GeoDataFrame: everything the
+    searches read, and cheap to send to worker processes.
+    """
+
+    def __init__(self, offsets, targets, arc_edge, version=None):
+        self.version = version
+        self.offsets = offsets
+        self.targets = targets
+        self.arc_edge = arc_edge
+        self._offsets = offsets.tolist()
+        self._targets = targets.tolist()
+        self._arc_edge = arc_edge.tolist()
+
+    @property
+    def n_nodes(self):
+        return len(self.offsets) - 1
+
+
+# ---------------------------------------------------------------------------
+# Edge weights
+# ---------------------------------------------------------------------------
+
+def _class_multiplier(levels):
+    multiplier = np.ones(len(levels))
+    for level, factor in RISK_MULTIPLIERS.items():
+        multiplier[levels == level] = factor
+    return multiplier
+
+
+def risk_weights(graph, rainfall, exposure_weighted=False):
+    """
+    Vectorized getEffectedWeight: length scaled by the worse of the static
+    flood risk and the rainfall class at the edge midpoint.
+
+    With exposure_weighted, the same rule is applied per stretch of road
+    instead of per edge: the part of the edge inside each flood class gets
+    the multiplier of the worse of that class and the rainfall class, the
+    dry part only the rainfall one. A long road clipping the corner of a
+    high-hazard polygon is then no longer priced as fully submerged. Road
+    tables without exposure columns fall back to the per-edge rule.
+    """
+    rain_class = np.select([rainfall > 30, rainfall > 15, rainfall > 5], [3, 2, 1], 0)
+    if not exposure_weighted or graph.edge_exposure is None:
+        return graph.edge_length * _class_multiplier(np.maximum(graph.edge_risk, rain_class))
+
+    exposure = graph.edge_exposure
+    multiplier = (1.0 - exposure.sum(axis=1)) * _class_multiplier(rain_class)
+    for column, level in enumerate(EXPOSURE_CLASSES):
+        multiplier += exposure[:, column] * _class_multiplier(np.maximum(level, rain_class))
+    return graph.edge_length * multiplier
+
+
+# ---------------------------------------------------------------------------
+# Search
+# ---------------------------------------------------------------------------
+
+class Path:
+    def __init__(self, nodes, edges, cost, target, deviation=0):
+        self.nodes = nodes
+        self.edges = edges
+        self.cost = cost
+        self.target = target
+        # Node index where the path leaves the accepted path it was spurred
+        # from; Yen spur searches before it cannot find anything new
+        self.deviation = deviation
+        self.prefix = None
+
+
+def _trace(arc_edge, prev, source, node, cost):
+    nodes, edges = [node], []
+    while node != source:
+        node, arc = prev[node]
+        nodes.append(node)
+        edges.append(arc_edge[arc])
+    nodes.reverse()
+    edges.reverse()
+    return Path(nodes, edges, cost, nodes[-1])
+
+
+def dijkstra(graph, arc_weights, source, targets, blocked_nodes=None, blocked_arcs=None):
+    """
+    Single-source Dijkstra on the CSR graph that stops at the first settled
+    target. `arc_weights` is a list indexed by arc; `targets` is a set of
+    node indices; `blocked_nodes` / `blocked_arcs` are bytearray masks
+    (nonzero = excluded) indexed by node / arc.
+    """
+    if blocked_nodes is None:
+        blocked_nodes = bytes(graph.n_nodes)
+    if blocked_arcs is None:
+        blocked_arcs = bytes(len(arc_weights))
+    if blocked_nodes[source]:
+        return None
+
+    offsets, out, arc_edge = graph._offsets, graph._targets, graph._arc_edge
+    dist = {source: 0.0}
+    prev = {}
+    heap = [(0.0, source)]
+
+    while heap:
+        d, node = heapq.heappop(heap)
+        if d > dist.get(node, float("inf")):
+            continue
+        if node in targets:
+            return _trace(arc_edge, prev, source, node, d)
+
+        for arc in range(offsets[node], offsets[node + 1]):
+            nxt = out[arc]
+            if blocked_arcs[arc] or blocked_nodes[nxt]:
+                continue
+            nd = d + arc_weights[arc]
+            if nd < dist.get(nxt, float("inf")):
+                dist[nxt] = nd
+                prev[nxt] = (node, arc)
+                heapq.heappush(heap, (nd, nxt))
+
+    return None
+
+
+def astar(graph, arc_weights, source, targets, heuristic, blocked_nodes=None, blocked_arcs=None):
+    """
+    dijkstra() guided by a consistent lower bound on the remaining distance
+    to the target set (`heuristic`, a list indexed by node, see
+    LandmarkTable.heuristic). The heap is ordered by cost + bound, so the
+    search heads for the targets instead of growing a disc around the
+    source, and the first settled target is still the nearest one.
+    Masks only remove arcs, which keeps the bound valid.
+    """
+    if blocked_nodes is None:
+        blocked_nodes = bytes(graph.n_nodes)
+    if blocked_arcs is None:
+        blocked_arcs = bytes(len(arc_weights))
+    if blocked_nodes[source]:
+        return None
+
+    offsets, out, arc_edge = graph._offsets, graph._targets, graph._arc_edge
+    dist = {source: 0.0}
+    prev = {}
+    heap = [(heuristic[source], 0.0, source)]
+
+    while heap:
+        _, d, node = heapq.heappop(heap)
+        if d > dist.get(node, float("inf")):
+            continue
+        if node in targets:
+            return _trace(arc_edge, prev, source, node, d)
+
+        for arc in range(offsets[node], offsets[node + 1]):
+            nxt = out[arc]
+            if blocked_arcs[arc] or blocked_nodes[nxt]:
+                continue
+            nd = d + arc_weights[arc]
+            if nd < dist.get(nxt, float("inf")):
+                dist[nxt] = nd
+                prev[nxt] = (node, arc)
+                heapq.heappush(heap, (nd + heuristic[nxt], nd, nxt))
+
+    return None
+
+
+def target_tree(graph, edge_weights, targets):
+    """
+    Shortest-path tree into a target set: for every node its distance to the
+    nearest target, the next node and arc towards it, and that target
+    (-1 at the targets and where none is reachable). One multi-source
+    Dijkstra from the targets in scipy: roads are two-way with equal
+    weights, so distances from the targets are distances to them. Weights
+    must not be negative (bake_weights never makes them so).
+    """
+    n = graph.n_nodes
+    src, dst, weights, arcs = cheapest_arcs(graph, edge_weights)
+    matrix = csr_matrix((weights, (src, dst)), shape=(n, n))
+    targets = np.unique(np.fromiter(targets, dtype=np.int64))
+    cost, pred, nearest = sparse_dijkstra(matrix, directed=True, indices=targets, min_only=True,
+                                          return_predecessors=True)
+    next_node = np.where(pred >= 0, pred, -1)
+    # Arc of each (node, next) hop: arcs come sorted by src * n + dst
+    next_arc = np.full(n, -1, dtype=np.int64)
+    hops = np.flatnonzero(next_node >= 0)
+    next_arc[hops] = arcs[np.searchsorted(src * n + dst, hops * n + next_node[hops])]
+    return cost, next_node, next_arc, np.where(nearest >= 0, nearest, -1)
+
+
+def _accept(path, weights):
+    """Marks a path accepted: adds the cost prefix sums of its edges."""
+    path.prefix = list(accumulate((weights[e] for e in path.edges), initial=0.0))
+    return path
+
+
+def _block_pair(graph, blocked_arcs, a, b, touched):
+    """Masks every arc between nodes a and b, both ways (as runYensAlgorithm does)."""
+    offsets, out = graph._offsets, graph._targets
+    for x, y in ((a, b), (b, a)):
+        for arc in range(offsets[x], offsets[x + 1]):
+            if out[arc] == y:
+                blocked_arcs[arc] = 1
+                touched.append(arc)
+
+
+def _spur(graph, search, path, i, accepted, blocked_nodes, blocked_arcs):
+    """
+    Yen's spur candidate at node i of an accepted path: the best path that
+    follows its root up to node i, then leaves every accepted path sharing
+    that root. Root nodes and the next arcs of those paths are masked for
+    the search and unmasked afterwards, touching only what was set.
+    """
+    root = path.edges[:i]
+    touched = []
+    for other in accepted:
+        if len(other.edges) > i and other.edges[:i] == root:
+            _block_pair(graph, blocked_arcs, other.nodes[i], other.nodes[i + 1], touched)
+    root_nodes = path.nodes[:i]
+    for node in root_nodes:
+        blocked_nodes[node] = 1
+    try:
+        spur = search(path.nodes[i], blocked_nodes, blocked_arcs)
+    finally:
+        for node in root_nodes:
+            blocked_nodes[node] = 0
+        for arc in touched:
+            blocked_arcs[arc] = 0
+    if spur is None:
+        return None
+    return Path(root_nodes + spur.nodes, root + spur.edges, path.prefix[i] + spur.cost, spur.target, deviation=i)
+
+
+def k_shortest_paths(graph, edge_weights, source, targets, k=3, landmarks=None):
+    """
+    Yen's algorithm with multi-target support, mirroring runYensAlgorithm:
+    spur searches exclude the root-path nodes and both directions of the
+    edges already used by accepted paths sharing the same root.
+
+    Exclusions are bytearray masks over node and arc indices, root costs
+    come from prefix sums, and paths are deduplicated by their edge-index
+    tuples. As in Lawler's refinement, spur nodes before the one a path
+    deviated at are skipped: those roots were already searched.
+
+    With a LandmarkTable for these weights, the first search and every spur
+    search run as A* on one shared bound to the target set.
+    """
+    weights = np.asarray(edge_weights, dtype=np.float64)
+    arc_weights = weights[graph.arc_edge].tolist()
+    weights = weights.tolist()
+    targets = set(targets)
+    heuristic = landmarks.heuristic(targets) if landmarks is not None else None
+
+    def search(start, blocked_nodes=None, blocked_arcs=None):
+        if heuristic is None:
+            return dijkstra(graph, arc_weights, start, targets, blocked_nodes, blocked_arcs)
+        return astar(graph, arc_weights, start, targets, heuristic, blocked_nodes, blocked_arcs)
+
+    first = search(source)
+    if first is None:
+        return []
+    accepted = [_accept(first, weights)]
+    blocked_nodes, blocked_arcs = bytearray(graph.n_nodes), bytearray(len(arc_weights))
+    candidates, seen = [], {tuple(first.edges)}
+    tie = count()
+
+    for _ in range(1, k):
+        previous = accepted[-1]
+        for i in range(previous.deviation, len(previous.nodes) - 1):
+            candidate = _spur(graph, search, previous, i, accepted, blocked_nodes, blocked_arcs)
+            if candidate is None:
+                continue
+            key = tuple(candidate.edges)
+            if key in seen:
+                continue
+            seen.add(key)
+            heapq.heappush(candidates, (candidate.cost, next(tie), candidate))
+
+        if not candidates:
+            break
+        accepted.append(_accept(heapq.heappop(candidates)[2], weights))
+
+    return accepted
+
+
+def lazy_k_shortest_paths(graph, edge_weights, source, targets, k=3, tree=None):
+    """
+    Same paths as k_shortest_paths, with lazy spur searches for larger k.
+
+    A target_tree gives every node's unrestricted distance to the targets.
+    Each spur of an accepted path enters the candidate heap with its root
+    cost plus that distance, a lower bound, and is only searched once it
+    reaches the top: most never do. A spur search first reuses the tree
+    path from the spur node when it avoids every mask (then it is the
+    best spur), else runs A* on the tree distances, an exact bound for the
+    unmasked graph. Pass the target_tree of these weights and targets as
+    `tree` to share it between many sources.
+    """
+    weights = np.asarray(edge_weights, dtype=np.float64)
+    arc_weights = weights[graph.arc_edge].tolist()
+    targets = set(targets)
+    cost_to, next_node, next_arc, _ = tree if tree is not None else target_tree(graph, weights, targets)
+    if not np.isfinite(cost_to[source]):
+        return []
+    heuristic, next_node, next_arc = cost_to.tolist(), next_node.tolist(), next_arc.tolist()
+    weights, arc_edge = weights.tolist(), graph._arc_edge
+
+    def search(start, blocked_nodes, blocked_arcs):
+        if heuristic[start] == float("inf"):
+            return None
+        nodes, edges, node, d = [start], [], start, 0.0
+        while next_node[node] >= 0:
+            arc = next_arc[node]
+            node = next_node[node]
+            if blocked_arcs[arc] or blocked_nodes[node]:
+                return astar(graph, arc_weights, start, targets, heuristic, blocked_nodes, blocked_arcs)
+            nodes.append(node)
+            edges.append(arc_edge[arc])
+            d += arc_weights[arc]
+        return Path(nodes, edges, d, node)
+
+    blocked_nodes, blocked_arcs = bytearray(graph.n_nodes), bytearray(len(arc_weights))
+    first = _accept(search(source, blocked_nodes, blocked_arcs), weights)
+    accepted, seen = [first], {tuple(first.edges)}
+    heap, tie = [], count()
+
+    def push_spurs(path):
+        for i in range(path.deviation, len(path.nodes) - 1):
+            heapq.heappush(heap, (path.prefix[i] + heuristic[path.nodes[i]], next(tie), (path, i)))
+
+    push_spurs(first)
+    while heap and len(accepted) < k:
+        _, _, entry = heapq.heappop(heap)
+        if isinstance(entry, Path):
+            # Cheaper than every bound left, so no unsearched spur beats it
+            accepted.append(_accept(entry, weights))
+            push_spurs(entry)
+            continue
+        candidate = _spur(graph, search, *entry, accepted, blocked_nodes, blocked_arcs)
+        if candidate is None:
+            continue
+        key = tuple(candidate.edges)
+        if key in seen:
+            continue
+        seen.add(key)
+        heapq.heappush(heap, (candidate.cost, next(tie), candidate))
+
+    return accepted
+
+
+def rank_paths_by_topsis(paths, mc_weights):
+    """
+    Path-level TOPSIS ranking (rankPathsByTOPSIS): sets `topsisRankScore`
+    and marks the best path `isOptimal`.
+    """
+    if not paths:
+        return paths
+    for p in paths:
+        p["isOptimal"] = False
+    if len(paths) == 1:
+        paths[0]["isOptimal"] = True
+        paths[0]["topsisRankScore"] = 1.0
+        return paths
+
+    weights = {**DEFAULT_MC_WEIGHTS, **(mc_weights or {})}
+    criteria = ["length", "risk", "rainfall"]
+    matrix = np.array([[p["metrics"][c] or 0 for c in criteria] for p in paths], dtype=np.float64)
+    denoms = np.sqrt((matrix ** 2).sum(axis=0))
+    denoms[denoms == 0] = 0.0001
+    weighted = matrix / denoms * np.array([weights[c] for c in criteria])
+    pis, nis = weighted.min(axis=0), weighted.max(axis=0)
+    d_pis = np.sqrt(((weighted - pis) ** 2).sum(axis=1))
+    d_nis = np.sqrt(((weighted - nis) ** 2).sum(axis=1))
+    total = d_pis + d_nis
+    closeness = np.divide(d_nis, total, out=np.zeros_like(total), where=total != 0)
+
+    for p, c in zip(paths, closeness):
+        p["topsisRankScore"] = float(c)
+    paths[int(np.argmax(closeness))]["isOptimal"] = True
+    return paths
+
+
+# ---------------------------------------------------------------------------
+# High-level API used by server.py
+# ---------------------------------------------------------------------------
+
+def bake_weights(graph, simulation_mode, mc_weights, manual_rainfall, rainfall, scorers=None, exposure_weighted=False):
+    """
+    Edge weights exactly as the frontend bakes them before running Yen:
+    WSM in simulation mode (with the manual rainfall), otherwise the
+    risk-multiplier weight using live rainfall (optionally weighted by flood
+    exposure, see risk_weights). Pass a ScorerCache to reuse the WSM
+    normalization across calls. Weights are never negative (see
+    EdgeScorer.baked), which every search here relies on.
+    """
+    if simulation_mode:
+        return manual_scorer(graph, manual_rainfall, scorers).baked(mc_weights)
+    return risk_weights(graph, rainfall, exposure_weighted)
+
+
+def manual_scorer(graph, manual_rainfall, scorers=None):
+    """EdgeScorer for a uniform (simulated) rainfall value."""
+    rainfall = np.full(graph.n_edges, float(manual_rainfall))
+    if scorers is None:
+        return EdgeScorer(graph.edge_length, graph.edge_risk, rainfall)
+    return scorers.get(graph, ("manual", float(manual_rainfall)), rainfall)
+
+
+def path_to_dict(graph, path, rainfall, features=True):
+    edges = path.edges
+    result = {
+        "nodes": [int(graph.node_ids[n]) for n in path.nodes],
+        "edges": [int(e) for e in edges],
+        "targetNode": int(graph.node_ids[path.target]),
+        "totalDistance": float(path.cost),
+        "actualDistance": float(graph.edge_length_raw[edges].sum()) if edges else 0.0,
+        "metrics": {
+            "length": float(graph.edge_length_raw[edges].sum()) if edges else 0.0,
+            "risk": float(graph.edge_risk[edges].sum()) if edges else 0.0,
+            "rainfall": float(rainfall[edges].sum()) if edges else 0.0,
+        },
+    }
+    if graph.edge_exposure is not None:
+        # Metres of the path inside each flood class
+        exposed = graph.edge_length_raw[edges] @ graph.edge_exposure[edges] if edges else np.zeros(len(EXPOSURE_CLASSES))
+        result["floodedLength"] = {str(level): float(m) for level, m in zip(EXPOSURE_CLASSES, exposed)}
+    if features:
+        result["features"] = graph.features(edges)
+    return result
+
+
+def route(graph, source, targets, k, edge_weights, rainfall, landmarks=None, lazy=False):
+    """
+    k shortest paths from a node index to any of the target node indices,
+    by lazy_k_shortest_paths if `lazy`, else k_shortest_paths.
+    """
+    if lazy:
+        paths = lazy_k_shortest_paths(graph, edge_weights, source, targets, k)
+    else:
+        paths = k_shortest_paths(graph, edge_weights, source, targets, k, landmarks)
+    return [path_to_dict(graph, p, rainfall) for p in paths]
+
+
+class GraphStore:
+    """Loads the roads table into a RoadGraph once per table version."""
+
+    def __init__(self, layer_cache, table_name="roads"):
+        self.layer_cache = layer_cache
+        self.table_name = table_name
+        self._graph = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        version = self.layer_cache.version(self.table_name)
+        if self._graph is not None and self._graph.version == version:
+            return self._graph
+        with self._lock:
+            if self._graph is None or self._graph.version != version:
+                print(f"Routing: loading {self.table_name} graph (version {version})")
+                gdf = self.layer_cache.read_gdf(self.table_name)
+                self._graph = RoadGraph(gdf, version)
+        return self._graph
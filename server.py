@@ -1,19 +1,35 @@
-from fastapi import FastAPI
-from fastapi.responses import FileResponse, JSONResponse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import os
+import time
 import numpy as np
 import datetime
 import json
 import geopandas as gpd
 from sqlalchemy import create_engine
 from dotenv import load_dotenv
+from layer_cache import CachedLayer, LayerCache, etag_matches
+from layer_bundles import choose_encoding, compress_variants
+from vector_tiles import TILE_LAYERS, TileCache, is_valid_tile
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    # JAXA ingestion runs beside the event loop, never inside a request
+    await ingest_service.start()
+    yield
+    await ingest_service.stop()
+    db_executor.shutdown(wait=False, cancel_futures=True)
+    batch_pool.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow CORS for development
 app.add_middleware(
@@ -25,7 +41,42 @@ app.add_middleware(
 
 # Database Connection
 DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL)
+# Connections kept open, plus extra ones opened under bursts
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 8))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 4))
+# Without a database the layers are served from the committed GeoJSON files
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", 10)),
+    pool_pre_ping=True,
+) if DATABASE_URL else None
+
+# Blocking data access from async endpoints runs here, never on the event
+# loop. One thread per connection the pool can hand out, so a thread never
+# sits waiting for a connection while requests queue behind it.
+db_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE + DB_MAX_OVERFLOW, thread_name_prefix="db")
+
+async def run_db(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(db_executor, fn, *args)
+
+async def iterate_db(first, chunks):
+    """Async view of a blocking chunk iterator, advanced on the DB executor."""
+    try:
+        yield first
+        while (chunk := await run_db(next, chunks, None)) is not None:
+            yield chunk
+    finally:
+        # A client that disconnects mid-stream hands its connection back now
+        try:
+            chunks.close()
+        except ValueError: # still running on the executor; it closes when collected
+            pass
+
+# Serialized layers are kept in memory and re-validated against the table version
+layer_cache = LayerCache(engine, check_interval=float(os.getenv("LAYER_CACHE_CHECK_SECONDS", 5)))
+tile_cache = TileCache(layer_cache)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -34,74 +85,684 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 async def read_root():
     return FileResponse("index.html")
 
-def get_gdf_as_json(table_name):
-    """Helper to fetch from PostGIS and return as JSON."""
+def send_cached(request: Request, cached, media_type):
+    """
+    Serves the best pre-compressed variant of a CachedLayer; nothing is
+    compressed per request. Browsers keep the body but always revalidate
+    (cheap 304 on a matching ETag).
+    """
+    encoding = choose_encoding(request.headers.get("accept-encoding"), cached.variants)
+    headers = {
+        "ETag": cached.etags[encoding],
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request.headers.get("if-none-match"), cached.etags[encoding]):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=cached.variants[encoding], media_type=media_type, headers=headers)
+
+async def get_gdf_as_json(request: Request, table_name):
+    """
+    Helper to serve a PostGIS table as GeoJSON from the layer cache. A table
+    version that is not cached yet (or is too large to cache) is streamed
+    from PostGIS in batches instead of being built in memory first. Every
+    database or disk access happens on the DB executor.
+    """
     try:
-        query = f"SELECT * FROM {table_name}"
-        gdf = gpd.read_postgis(query, engine, geom_col='geometry')
-        # Ensure it's WGS84
-        if gdf.crs is None:
-            gdf.set_crs(epsg=4326, inplace=True)
-        return json.loads(gdf.to_json())
+        layer = await run_db(layer_cache.cached, table_name)
+        if layer is None:
+            chunks = layer_cache.stream_and_cache(table_name)
+            # Runs the query, so a failing table still gets an error response
+            first = await run_db(next, chunks)
     except Exception as e:
         print(f"Error fetching {table_name}: {e}")
-        return {"error": str(e)}
+        return JSONResponse({"error": str(e)})
+
+    if layer is None:
+        return StreamingResponse(
+            iterate_db(first, chunks),
+            media_type="application/geo+json",
+            headers={"Cache-Control": "no-cache"},
+        )
+    return send_cached(request, layer, "application/geo+json")
 
 @app.get("/flood_clipped.geojson")
-async def get_flood_data():
-    return get_gdf_as_json("flood_hazard")
+async def get_flood_data(request: Request):
+    return await get_gdf_as_json(request, "flood_hazard")
 
 @app.get("/qc_boundary.geojson")
-async def get_boundary_data():
-    return get_gdf_as_json("qc_boundary")
+async def get_boundary_data(request: Request):
+    return await get_gdf_as_json(request, "qc_boundary")
 
 @app.get("/district1_boundary.geojson")
-async def get_district1_boundary():
-    return get_gdf_as_json("district_boundary")
+async def get_district1_boundary(request: Request):
+    return await get_gdf_as_json(request, "district_boundary")
 
 @app.get("/project8_boundary.geojson")
-async def get_project8_boundary_data():
+async def get_project8_boundary_data(request: Request):
     # Maps to district_boundary as per original logic
-    return get_gdf_as_json("district_boundary")
+    return await get_gdf_as_json(request, "district_boundary")
 
 @app.get("/district1_roads.geojson")
-async def get_district1_roads():
-    return get_gdf_as_json("roads")
+async def get_district1_roads(request: Request):
+    return await get_gdf_as_json(request, "roads")
 
 @app.get("/project8_roads.geojson")
-async def get_project8_roads_data():
+async def get_project8_roads_data(request: Request):
     # Maps to roads (district1_roads) as per original logic
-    return get_gdf_as_json("roads")
+    return await get_gdf_as_json(request, "roads")
 
 @app.get("/evacuation_sites.geojson")
-async def get_evacuation_sites():
-    return get_gdf_as_json("evacuation_sites")
+async def get_evacuation_sites(request: Request):
+    return await get_gdf_as_json(request, "evacuation_sites")
+
+@app.get("/tiles/{layer}/{z}/{x}/{y}.mvt")
+def get_vector_tile(request: Request, layer: str, z: int, x: int, y: int):
+    """Mapbox Vector Tile of one layer, so clients only fetch the viewport."""
+    if layer not in TILE_LAYERS:
+        return JSONResponse({"error": f"Unknown tile layer: {layer}"}, status_code=404)
+    if not is_valid_tile(z, x, y):
+        return JSONResponse({"error": f"Invalid tile: {z}/{x}/{y}"}, status_code=404)
+
+    try:
+        tile, version = tile_cache.get(layer, z, x, y)
+    except Exception as e:
+        print(f"Error building tile {layer}/{z}/{x}/{y}: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    headers = {"ETag": f'"{version}-{z}-{x}-{y}"', "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=tile, media_type="application/vnd.mapbox-vector-tile", headers=headers)
 
 # --- Original Logic for JAXA FTP ---
-from jaxa_ftp import fetch_jaxa_forecast
-from pydantic import BaseModel
+from jaxa_ftp import grid_to_geojson, qc_window
+from jaxa_ingest import IngestService
+from rainfall_store import get_store
+from rainfall_index import CELL_SIZE, GRID_LEFT_LON, GRID_TOP_LAT
+from pydantic import BaseModel, Field
+
+# Polls /now/latest/ when JAXA_FTP_USER / JAXA_FTP_PASSWORD are set
+ingest_service = IngestService()
 
 class FTPConfig(BaseModel):
-    host: str
-    user: str
-    password: str
+    host: str = "" # Empty fields fall back to JAXA_FTP_HOST / _USER / _PASSWORD
+    user: str = ""
+    password: str = ""
     date: str = "" # Optional date YYYY-MM-DD
     hour: str = "" # Optional hour 00-23
 
 @app.post("/sync_jaxa_ftp")
 async def sync_ftp(config: FTPConfig):
-    success = fetch_jaxa_forecast(config.host, config.user, config.password, date=config.date, hour=config.hour)
-    if success:
-        return {"status": "success", "message": "JAXA data refreshed from FTP."}
-    else:
-        return {"status": "error", "message": "Failed to connect or download from JAXA FTP."}
+    """Queues a JAXA sync and returns its job id; poll /sync_jaxa_ftp/{job_id}."""
+    job = ingest_service.submit(config.host, config.user, config.password, date=config.date, hour=config.hour)
+    return JSONResponse({**job.to_dict(), "message": job.message or "JAXA sync queued."}, status_code=202)
+
+@app.get("/sync_jaxa_ftp/{job_id}")
+async def sync_ftp_status(job_id: str):
+    job = ingest_service.get(job_id)
+    if job is None:
+        return JSONResponse({"error": f"Unknown job: {job_id}"}, status_code=404)
+    return job.to_dict()
+
+# Versioned rainfall grids; the current one is held pre-compressed in memory
+rainfall_store = get_store()
+
+# GeoJSON and binary forms of the last requested grid version, built only
+# when a client asks; (version, body) pairs swapped in whole, since requests
+# build them on threadpool threads
+_rainfall_derived = {"geojson": (None, None), "binary": (None, None)}
 
 @app.get("/jaxa_rainfall_latest")
-async def get_jaxa_rainfall():
-    path = "cache/jaxa_qc_latest.json"
-    if os.path.exists(path):
-        return FileResponse(path)
-    return {"error": "JAXA data not synced yet."}
+def get_jaxa_rainfall(request: Request, format: str = "grid", version: str = ""):
+    """
+    Latest rainfall frame. `grid` (default) is the compact JSON grid,
+    `binary` the raw little-endian Float32 intensities with the grid
+    geometry in headers, `geojson` the legacy per-cell FeatureCollection.
+    `version` selects one of the recently published grids instead. Every
+    format is built from the same store entry, so they always agree on
+    the frame. Plain def: the store may read from disk.
+    """
+    cached = rainfall_store.get(version) if version else rainfall_store.current()
+    if cached is None:
+        if version:
+            return JSONResponse({"error": f"Unknown rainfall version: {version}"}, status_code=404)
+        return {"error": "JAXA data not synced yet."}
+
+    if format == "grid":
+        return send_cached(request, cached, "application/json")
+
+    if format == "binary":
+        key, binary = _rainfall_derived["binary"]
+        if key != cached.version:
+            grid = json.loads(cached.body)
+            lon0, lat0 = grid["origin"]
+            binary = (np.asarray(grid["intensity"], dtype="<f4").tobytes(), {
+                "X-Grid-Origin": f"{lon0:.6f},{lat0:.6f}",
+                "X-Grid-Cell-Size": str(grid["cell_size"]),
+                "X-Grid-Shape": f"{grid['shape'][0]},{grid['shape'][1]}",
+                "X-Frame": str(grid.get("filename") or ""),
+                "X-Rainfall-Version": cached.version,
+            })
+            _rainfall_derived["binary"] = (cached.version, binary)
+        return Response(content=binary[0], media_type="application/octet-stream", headers=binary[1])
+
+    if format == "geojson":
+        key, layer = _rainfall_derived["geojson"]
+        if key != cached.version:
+            body = json.dumps(grid_to_geojson(json.loads(cached.body))).encode("utf-8")
+            layer = CachedLayer("rainfall_geojson", compress_variants(body), cached.version)
+            _rainfall_derived["geojson"] = (cached.version, layer)
+        return send_cached(request, layer, "application/geo+json")
+
+    return JSONResponse({"error": f"Unknown format: {format}"}, status_code=400)
+
+@app.get("/jaxa_rainfall_latest/versions")
+async def get_rainfall_versions():
+    """Recently published rainfall grids, oldest first."""
+    current = rainfall_store.current()
+    return {"current": current.version if current else None, "versions": rainfall_store.versions()}
+
+from rainfall_series import bbox_to_window, latest_window_rate, parse_window, series as rainfall_series
+
+@app.get("/rainfall/series")
+def get_rainfall_series(bbox: str = "", start: str = "", end: str = "", agg: str = "sum", window: str = "1h", product: str = "now"):
+    """
+    Rolling rainfall over the archived frames: for every frame time in
+    [start, end] (UTC, ISO format; default the newest frame), the `agg` of the
+    trailing `window`. sum is the depth in mm, max the peak rate in mm/h.
+    bbox is west,south,east,north and defaults to the Quezon City grid.
+    """
+    try:
+        if bbox:
+            west, south, east, north = [float(v) for v in bbox.split(",")]
+            cells = bbox_to_window(west, south, east, north)
+        else:
+            cells = qc_window()
+        result = rainfall_series(
+            product, *cells,
+            start=datetime.datetime.fromisoformat(start) if start else None,
+            end=datetime.datetime.fromisoformat(end) if end else None,
+            window=window, agg=agg,
+        )
+    except (ValueError, KeyError) as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        print(f"Rainfall series error: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    if result is None:
+        return JSONResponse({"error": "No archived JAXA frames yet."}, status_code=404)
+
+    row0, _, col0, _ = cells
+    values = result["values"]
+    return {
+        "format": "series",
+        "product": product,
+        "agg": agg,
+        "window": window,
+        "units": "mm" if agg == "sum" else "mm/h",
+        # North-west corner of cell [0, 0]; rows run south, columns east
+        "origin": [round(GRID_LEFT_LON + col0 * CELL_SIZE, 6), round(GRID_TOP_LAT - row0 * CELL_SIZE, 6)],
+        "cell_size": CELL_SIZE,
+        "shape": list(values.shape),
+        "times": [t.strftime("%Y-%m-%dT%H:%MZ") for t in result["times"]],
+        "frames": result["frames"],
+        "values": np.round(values, 3).ravel().tolist(),
+    }
+
+# --- Server-side routing ---
+from typing import Optional
+from evacuation_field import FIELD_PRESETS, EvacuationFieldStore, preset_weights
+from landmarks import LandmarkStore
+from mc_weights import ScorerCache
+from rainfall_index import EdgeRainfallCache
+from route_batch import batch_pool, route_many
+from routing import GraphStore, bake_weights, manual_scorer, path_to_dict, rank_paths_by_topsis, route
+
+graph_store = GraphStore(layer_cache)
+scorer_cache = ScorerCache()
+# ALT distance tables, rebuilt only for a new network or new baked weights
+landmark_store = LandmarkStore()
+# From this many paths on, routes use Yen with lazy spur searches
+LAZY_YEN_MIN_K = int(os.getenv("LAZY_YEN_MIN_K", 8))
+# Most paths one request may ask for (bounds the CPU a request can take)
+ROUTE_MAX_K = int(os.getenv("ROUTE_MAX_K", 20))
+# Cost-to-nearest-site field of each preset, refreshed per rainfall frame
+evacuation_fields = EvacuationFieldStore()
+edge_rainfall = EdgeRainfallCache()
+
+class RouteRequest(BaseModel):
+    start: Optional[int] = None # OSM node id; or give lat/lng to snap
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    target: int
+    k: int = Field(1, ge=1, le=ROUTE_MAX_K)
+    simulation_mode: bool = False
+    mc_weights: dict[str, float] = {}
+    manual_rainfall: float = 0.0
+    rainfall_window: Optional[str] = None # e.g. "3h": mean rate over the last 3h instead of the latest frame
+    exposure_weighted: bool = False # Scale flood risk by the share of each road actually in the hazard zone
+    snap: str = "node" # lat/lng to the nearest node, or "edge": to the nearer end of the nearest road
+
+class EvacuationSite(BaseModel):
+    name: str = "Evacuation Site"
+    barangay: str = ""
+    lat: float
+    lng: float
+
+class EvacuationRouteRequest(BaseModel):
+    start: Optional[int] = None
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    sites: list[EvacuationSite] = [] # Defaults to the evacuation_sites table
+    k: int = Field(3, ge=1, le=ROUTE_MAX_K)
+    simulation_mode: bool = False
+    mc_weights: dict[str, float] = {}
+    manual_rainfall: float = 0.0
+    rainfall_window: Optional[str] = None # e.g. "3h": mean rate over the last 3h instead of the latest frame
+    exposure_weighted: bool = False
+    snap: str = "node"
+
+def live_rainfall(graph, rainfall_window=None):
+    """
+    Per-edge rainfall (mm/h) and its scorer cache key: the latest frame, or
+    the mean rate over the trailing window of archived frames, which tracks
+    flooding better than a single 30-minute snapshot.
+    """
+    if not rainfall_window:
+        rainfall, filename = edge_rainfall.get(graph)
+        return rainfall, ("jaxa", filename)
+    latest = latest_window_rate(rainfall_window)
+    if latest is None:
+        return np.zeros(graph.n_edges, dtype=np.float32), ("jaxa", rainfall_window, None)
+    rate, row0, col0, frame = latest
+    return edge_rainfall.index_for(graph).gather(rate, row0, col0), ("jaxa", rainfall_window, frame)
+
+def invalid_window(rainfall_window):
+    """400 response for a rainfall_window that cannot be parsed, else None."""
+    if rainfall_window:
+        try:
+            parse_window(rainfall_window)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+    return None
+
+SNAP_MODES = ("node", "edge")
+
+def invalid_snap(snap):
+    """400 response for an unknown snap mode, else None."""
+    if snap not in SNAP_MODES:
+        return JSONResponse({"error": f"Unknown snap mode: {snap}. Use one of {', '.join(SNAP_MODES)}."}, status_code=400)
+    return None
+
+def snap_nodes(graph, lats, lngs, snap="node"):
+    """Node indices of lat/lng points: the nearest usable node, or with snap="edge" the nearer end of the nearest road."""
+    if snap == "edge":
+        return graph.snap.nearest_edge_points(lats, lngs)[2]
+    return graph.nearest_nodes(lats, lngs)
+
+def resolve_start(graph, req):
+    if req.start is not None:
+        return graph.node_index(req.start)
+    if req.lat is not None and req.lng is not None:
+        return int(snap_nodes(graph, req.lat, req.lng, req.snap)[0])
+    return None
+
+def default_evacuation_sites():
+    gdf = layer_cache.read_gdf("evacuation_sites")
+    return [
+        EvacuationSite(
+            name=str(row.get("name") or "Evacuation Site"),
+            barangay=str(row.get("barangay") or ""),
+            lat=row.geometry.y,
+            lng=row.geometry.x,
+        )
+        for _, row in gdf.iterrows()
+    ]
+
+class SnapPoint(BaseModel):
+    lat: float
+    lng: float
+
+class SnapRequest(BaseModel):
+    points: list[SnapPoint]
+    snap: str = "node"
+    max_distance: Optional[float] = None # Metres; farther points get null
+
+def snap_records(graph, lats, lngs, snap, max_distance=None):
+    """One JSON record per point: the snapped node (OSM id), distance in metres and, for edges, where on the road."""
+    if snap == "edge":
+        edges, fractions, nodes, points, distances = graph.snap.nearest_edge_points(lats, lngs, max_distance)
+    else:
+        nodes, distances = graph.snap.nearest_nodes(lats, lngs, max_distance)
+    records = []
+    for i, node in enumerate(nodes.tolist()):
+        if node < 0:
+            records.append(None)
+            continue
+        record = {"node": int(graph.node_ids[node]), "distance": round(float(distances[i]), 2)}
+        if snap == "edge":
+            record["edge"] = int(edges[i])
+            record["fraction"] = round(float(fractions[i]), 4)
+            record["latlng"] = {"lat": float(points[i][1]), "lng": float(points[i][0])}
+        else:
+            record["latlng"] = {"lat": float(graph.node_coords[node][1]), "lng": float(graph.node_coords[node][0])}
+        records.append(record)
+    return records
+
+@app.get("/snap")
+def get_snap(lat: float, lng: float, snap: str = "node", max_distance: Optional[float] = None):
+    """Nearest usable road node (or road point, with snap=edge) to a map click."""
+    error = invalid_snap(snap)
+    if error:
+        return error
+    try:
+        graph = graph_store.get()
+        record = snap_records(graph, lat, lng, snap, max_distance)[0]
+        if record is None:
+            return JSONResponse({"error": "No road within max_distance."}, status_code=404)
+        return {**record, "graphVersion": graph.version}
+    except Exception as e:
+        print(f"Snap error: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+@app.post("/snap")
+def post_snap(req: SnapRequest):
+    """Bulk snapping: one record (or null) per point, in order."""
+    error = invalid_snap(req.snap)
+    if error:
+        return error
+    try:
+        graph = graph_store.get()
+        records = snap_records(graph, [p.lat for p in req.points], [p.lng for p in req.points], req.snap, req.max_distance)
+        return {"points": records, "graphVersion": graph.version}
+    except Exception as e:
+        print(f"Snap error: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+@app.post("/route")
+def post_route(req: RouteRequest):
+    error = invalid_window(req.rainfall_window) or invalid_snap(req.snap)
+    if error:
+        return error
+    try:
+        graph = graph_store.get()
+        source = resolve_start(graph, req)
+        target = graph.node_index(req.target)
+        if source is None or target is None:
+            return JSONResponse({"error": "Start or target node is not on the road network."}, status_code=400)
+
+        rainfall, _ = live_rainfall(graph, req.rainfall_window)
+        weights = bake_weights(graph, req.simulation_mode, req.mc_weights, req.manual_rainfall, rainfall, scorer_cache,
+                               req.exposure_weighted)
+        lazy = req.k >= LAZY_YEN_MIN_K
+        landmarks = None if lazy else landmark_store.get(graph, weights)
+        paths = route(graph, source, {target}, req.k, weights, rainfall, landmarks, lazy)
+        return {"paths": paths, "graphVersion": graph.version}
+    except Exception as e:
+        print(f"Routing error: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+@app.post("/route/evacuation")
+def post_evacuation_route(req: EvacuationRouteRequest):
+    error = invalid_window(req.rainfall_window) or invalid_snap(req.snap)
+    if error:
+        return error
+    try:
+        graph = graph_store.get()
+        source = resolve_start(graph, req)
+        if source is None:
+            return JSONResponse({"error": "Start node is not on the road network."}, status_code=400)
+
+        sites = req.sites or default_evacuation_sites()
+        site_nodes = graph.snap.site_nodes(sites)
+        site_by_node = {}
+        for site, node in zip(sites, site_nodes):
+            # First site wins when two snap to the same node (evacuationSites.find)
+            site_by_node.setdefault(int(node), site)
+
+        rainfall, _ = live_rainfall(graph, req.rainfall_window)
+        weights = bake_weights(graph, req.simulation_mode, req.mc_weights, req.manual_rainfall, rainfall, scorer_cache,
+                               req.exposure_weighted)
+        lazy = req.k >= LAZY_YEN_MIN_K
+        landmarks = None if lazy else landmark_store.get(graph, weights)
+        paths = route(graph, source, set(site_by_node), req.k, weights, rainfall, landmarks, lazy)
+
+        for p in paths:
+            site = site_by_node.get(graph.node_index(p["targetNode"]))
+            p["targetName"] = site.name if site else "Evacuation Site"
+            p["targetLatlng"] = {"lat": site.lat, "lng": site.lng} if site else None
+        return {"paths": rank_paths_by_topsis(paths, req.mc_weights), "graphVersion": graph.version}
+    except Exception as e:
+        print(f"Evacuation routing error: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+# Origins accepted by one /route/batch call
+MAX_BATCH_ORIGINS = int(os.getenv("ROUTE_BATCH_MAX_ORIGINS", 5000))
+
+class BatchOrigin(BaseModel):
+    lat: float
+    lng: float
+    id: Optional[str] = None # Echoed back, e.g. a household cluster or barangay hall id
+
+class BatchRouteRequest(BaseModel):
+    origins: list[BatchOrigin]
+    sites: list[EvacuationSite] = [] # Defaults to the evacuation_sites table
+    k: int = Field(1, ge=1, le=ROUTE_MAX_K)
+    simulation_mode: bool = False
+    mc_weights: dict[str, float] = {}
+    manual_rainfall: float = 0.0
+    rainfall_window: Optional[str] = None
+    exposure_weighted: bool = False
+    features: bool = False # Include the GeoJSON features of every path
+    snap: str = "node"
+
+@app.post("/route/batch")
+def post_route_batch(req: BatchRouteRequest):
+    """
+    Evacuation routes for many origins, streamed as NDJSON: one line per
+    origin as its search finishes (with its `index` in the request), then a
+    summary line with the throughput. Origins are snapped in one go, the
+    graph and weights are loaded and baked once, origins that snap to the
+    same node are routed once, and the searches run on the shared process
+    pool.
+    """
+    if not req.origins:
+        return JSONResponse({"error": "No origins given."}, status_code=400)
+    if len(req.origins) > MAX_BATCH_ORIGINS:
+        return JSONResponse({"error": f"At most {MAX_BATCH_ORIGINS} origins per batch."}, status_code=400)
+    error = invalid_window(req.rainfall_window) or invalid_snap(req.snap)
+    if error:
+        return error
+    try:
+        started = time.perf_counter()
+        graph = graph_store.get()
+        sites = req.sites or default_evacuation_sites()
+        site_nodes = graph.snap.site_nodes(sites)
+        site_by_node = {}
+        for site, node in zip(sites, site_nodes):
+            site_by_node.setdefault(int(node), site)
+
+        rainfall, _ = live_rainfall(graph, req.rainfall_window)
+        weights = bake_weights(graph, req.simulation_mode, req.mc_weights, req.manual_rainfall, rainfall, scorer_cache,
+                               req.exposure_weighted)
+        starts = snap_nodes(graph, [o.lat for o in req.origins], [o.lng for o in req.origins], req.snap)
+        unique_starts, origin_start = np.unique(starts, return_inverse=True)
+        origins_of = [[] for _ in unique_starts]
+        for i, u in enumerate(origin_start.tolist()):
+            origins_of[u].append(i)
+        batch = route_many(graph, weights, unique_starts, site_by_node, req.k)
+    except Exception as e:
+        print(f"Batch routing error: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    def lines():
+        routed = unreachable = 0
+        try:
+            for position, found in batch:
+                paths = [path_to_dict(graph, p, rainfall, req.features) for p in found]
+                for p in paths:
+                    site = site_by_node.get(graph.node_index(p["targetNode"]))
+                    p["targetName"] = site.name if site else "Evacuation Site"
+                    p["targetLatlng"] = {"lat": site.lat, "lng": site.lng} if site else None
+                paths = rank_paths_by_topsis(paths, req.mc_weights)
+                for i in origins_of[position]:
+                    record = {"index": i, "id": req.origins[i].id, "startNode": int(graph.node_ids[unique_starts[position]]),
+                              "paths": paths}
+                    if not paths:
+                        record["error"] = "No evacuation site is reachable from this origin."
+                        unreachable += 1
+                    routed += 1
+                    yield json.dumps(record) + "\n"
+        except Exception as e:
+            print(f"Batch routing error: {e}")
+            yield json.dumps({"error": str(e)}) + "\n"
+        seconds = time.perf_counter() - started
+        yield json.dumps({"summary": {
+            "origins": len(req.origins),
+            "uniqueStarts": len(unique_starts),
+            "routed": routed,
+            "unreachable": unreachable,
+            "seconds": round(seconds, 3),
+            "routesPerSecond": round(routed / seconds, 1) if seconds > 0 else None,
+            "graphVersion": graph.version,
+        }}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson",
+                             headers={"X-Origin-Count": str(len(req.origins)), "Cache-Control": "no-cache"})
+
+def refresh_evacuation_fields():
+    """
+    Brings the evacuation field of every preset up to date with the roads,
+    the latest frame and the evacuation sites. A no-op when none of them
+    changed; otherwise only presets whose baked weights changed are rebuilt.
+    Runs after every JAXA ingest, and lazily from /evacuation/field.
+    """
+    graph = graph_store.get()
+    rainfall, rainfall_key = live_rainfall(graph)
+    source_key = (graph.version, rainfall_key, layer_cache.version("evacuation_sites"))
+    if evacuation_fields.source_key == source_key:
+        return graph
+
+    sites = default_evacuation_sites()
+    if not sites:
+        raise ValueError("No evacuation sites to build the field from.")
+    site_nodes = graph.snap.site_nodes(sites)
+    scorer = scorer_cache.get(graph, rainfall_key, rainfall)
+    weights = {name: preset_weights(graph, mc, rainfall, scorer) for name, mc in FIELD_PRESETS.items()}
+    rebuilt = evacuation_fields.refresh(graph, weights, site_nodes, sites, source_key, frame=rainfall_key[1])
+    print(f"Evacuation field: frame {rainfall_key[1]}, rebuilt {', '.join(rebuilt) or 'nothing'}")
+    return graph
+
+ingest_service.on_publish(refresh_evacuation_fields)
+
+@app.get("/evacuation/field")
+def get_evacuation_field(preset: str = "risk", start: Optional[int] = None, lat: Optional[float] = None,
+                         lng: Optional[float] = None):
+    """
+    Best route to the nearest evacuation site from the precomputed field of
+    a preset: from `start` (OSM node id) or `lat`/`lng`. Without an origin,
+    the whole field: cost, next node and nearest site of every node.
+    """
+    if preset not in FIELD_PRESETS:
+        return JSONResponse({"error": f"Unknown preset: {preset}. Use one of {', '.join(FIELD_PRESETS)}."},
+                            status_code=400)
+    try:
+        graph = refresh_evacuation_fields()
+        field = evacuation_fields.get(preset)
+        meta = {"preset": preset, "frame": evacuation_fields.frame, "graphVersion": graph.version}
+
+        if start is None and (lat is None or lng is None):
+            return {
+                **meta,
+                "nodes": graph.node_ids.tolist(),
+                "cost": [c if np.isfinite(c) else None for c in np.round(field.cost, 3).tolist()],
+                "next": [int(graph.node_ids[n]) if n >= 0 else None for n in field.next.tolist()],
+                "site": [evacuation_fields.site_by_node.get(n) for n in field.site.tolist()],
+                "sites": [{"name": s.name, "lat": s.lat, "lng": s.lng} for s in evacuation_fields.sites],
+            }
+
+        source = graph.node_index(start) if start is not None else int(graph.nearest_nodes(lat, lng)[0])
+        if source is None:
+            return JSONResponse({"error": "Start node is not on the road network."}, status_code=400)
+        path = field.path(source)
+        if path is None:
+            return JSONResponse({"error": "No evacuation site is reachable from this node."}, status_code=404)
+
+        rainfall, _ = live_rainfall(graph)
+        result = path_to_dict(graph, path, rainfall)
+        site = evacuation_fields.site_for(path.target)
+        result["targetName"] = site.name if site else "Evacuation Site"
+        result["targetLatlng"] = {"lat": site.lat, "lng": site.lng} if site else None
+        return {**meta, "path": result}
+    except Exception as e:
+        print(f"Evacuation field error: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+class EdgeWeightsRequest(BaseModel):
+    simulation_mode: bool = True
+    mc_weights: dict[str, float] = {}
+    manual_rainfall: float = 0.0
+    rainfall_window: Optional[str] = None # e.g. "3h": mean rate over the last 3h instead of the latest frame
+    score: str = "baked" # baked | wsm | topsis
+
+@app.post("/weights/edges")
+def post_edge_weights(req: EdgeWeightsRequest):
+    """
+    Per-edge multi-criteria scores as a packed little-endian Float32 array,
+    one value per road feature in table order. Normalization is cached, so a
+    slider change only recomputes the final weighted combination.
+    """
+    if req.score not in ("baked", "wsm", "topsis"):
+        return JSONResponse({"error": f"Unknown score: {req.score}"}, status_code=400)
+    error = invalid_window(req.rainfall_window)
+    if error:
+        return error
+    try:
+        graph = graph_store.get()
+        if req.simulation_mode:
+            scorer = manual_scorer(graph, req.manual_rainfall, scorer_cache)
+        else:
+            rainfall, rainfall_key = live_rainfall(graph, req.rainfall_window)
+            scorer = scorer_cache.get(graph, rainfall_key, rainfall)
+
+        values = getattr(scorer, req.score)(req.mc_weights)
+        return Response(
+            content=values.astype("<f4").tobytes(),
+            media_type="application/octet-stream",
+            headers={"X-Edge-Count": str(graph.n_edges), "X-Graph-Version": str(graph.version)},
+        )
+    except Exception as e:
+        print(f"Edge weight error: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+@app.get("/jaxa_rainfall_latest/edges")
+def get_edge_rainfall():
+    """
+    Rainfall of the latest JAXA frame at every road edge midpoint, as a packed
+    little-endian Float32 array in road feature order.
+    """
+    try:
+        graph = graph_store.get()
+        rainfall, filename = edge_rainfall.get(graph)
+    except Exception as e:
+        print(f"Edge rainfall error: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+    if filename is None:
+        return JSONResponse({"error": "JAXA data not synced yet."}, status_code=404)
+    return Response(
+        content=rainfall.astype("<f4").tobytes(),
+        media_type="application/octet-stream",
+        headers={
+            "X-Edge-Count": str(graph.n_edges),
+            "X-Graph-Version": str(graph.version),
+            "X-Frame": filename,
+            "Cache-Control": "no-cache",
+        },
+    )
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,187 @@
+import os
+import threading
+from collections import OrderedDict
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from pyproj import Transformer
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+from landmarks import arc_matrix
+
+# Nodes in smaller fragments of the network are never snapped to: OSM
+# extracts carry many stray pieces of road, and a click that lands on one
+# gets no route to anywhere
+SNAP_MIN_COMPONENT = int(os.getenv("SNAP_MIN_COMPONENT", 10))
+
+# Road segments are cut into pieces at most this long (metres) for the
+# edge-point tree, which bounds how far a piece midpoint can be from the
+# closest point on it
+SNAP_PIECE_LENGTH = 25.0
+
+# Piece midpoints tried per point before falling back to a radius search
+EDGE_CANDIDATES = 16
+
+
+class SnapIndex:
+    """
+    Nearest-node and nearest-edge-point lookups on a RoadGraph, in metres.
+
+    Node coordinates are projected to the network's UTM zone and kept in a
+    KD-tree, so snapping a batch of points is one vectorized query instead
+    of the full scan of findNearestNode in static/data-loader.js (which
+    also measures in degrees, stretching distances east-west). Only usable
+    nodes are indexed: with a road to another node, in a component of at
+    least `min_component` nodes (or the largest one, if none is that big).
+    """
+
+    def __init__(self, graph, min_component=SNAP_MIN_COMPONENT, max_site_sets=8):
+        self.version = graph.version
+        nodes = gpd.GeoSeries(gpd.points_from_xy(graph.node_coords[:, 0], graph.node_coords[:, 1]), crs=4326)
+        self.crs = nodes.estimate_utm_crs() if graph.n_nodes else None
+        self._to_metric = Transformer.from_crs(4326, self.crs or 4326, always_xy=True)
+        self._to_lnglat = Transformer.from_crs(self.crs or 4326, 4326, always_xy=True)
+
+        _, labels = connected_components(arc_matrix(graph, np.ones(graph.n_edges)), directed=False)
+        sizes = np.bincount(labels)
+        linked = np.zeros(graph.n_nodes, dtype=bool)
+        loop = graph.edge_u == graph.edge_v
+        linked[graph.edge_u[~loop]] = True
+        linked[graph.edge_v[~loop]] = True
+        self.usable = linked & (sizes[labels] >= min(min_component, sizes.max(initial=0)))
+        self.nodes = np.flatnonzero(self.usable)
+        self.node_xy = self.project(graph.node_coords[:, 1], graph.node_coords[:, 0])
+        self._node_tree = cKDTree(self.node_xy[self.nodes])
+
+        self._edge_u = graph.edge_u
+        self._edge_v = graph.edge_v
+        self._build_pieces(graph)
+        self._sites = OrderedDict()
+        self._max_site_sets = max_site_sets
+        self._lock = threading.Lock()
+
+    def _build_pieces(self, graph):
+        """Cuts the segments of every usable edge into pieces of at most SNAP_PIECE_LENGTH."""
+        coords, line = shapely.get_coordinates(graph.gdf.geometry.values, return_index=True)
+        xy = self.project(coords[:, 1], coords[:, 0])
+        same = line[1:] == line[:-1]
+        a, b, edge = xy[:-1][same], xy[1:][same], line[:-1][same]
+        keep = self.usable[self._edge_u[edge]]
+        a, b, edge = a[keep], b[keep], edge[keep]
+
+        length = np.hypot(*(b - a).T)
+        # Distance along the edge to each segment start, for the fraction
+        ends = np.cumsum(length)
+        first = np.ones(len(edge), dtype=bool)
+        first[1:] = edge[1:] != edge[:-1]
+        offset = ends - length - np.maximum.accumulate(np.where(first, ends - length, 0.0))
+        self.edge_length = np.bincount(edge, weights=length, minlength=graph.n_edges)
+
+        parts = np.maximum(np.ceil(length / SNAP_PIECE_LENGTH), 1).astype(np.int64)
+        segment = np.repeat(np.arange(len(edge)), parts)
+        step = np.arange(len(segment)) - np.repeat(np.cumsum(parts) - parts, parts)
+        t0 = step / parts[segment]
+        t1 = (step + 1) / parts[segment]
+        direction = (b - a)[segment]
+        self._piece_a = a[segment] + direction * t0[:, None]
+        self._piece_b = a[segment] + direction * t1[:, None]
+        self._piece_edge = edge[segment]
+        self._piece_offset = offset[segment] + length[segment] * t0
+        self._piece_reach = (np.hypot(*(self._piece_b - self._piece_a).T).max(initial=0.0)) / 2
+        self._piece_tree = cKDTree((self._piece_a + self._piece_b) / 2) if len(segment) else None
+
+    def project(self, lats, lngs):
+        """(n, 2) metric x/y of WGS84 points."""
+        x, y = self._to_metric.transform(np.atleast_1d(lngs).astype(np.float64), np.atleast_1d(lats).astype(np.float64))
+        return np.column_stack([x, y])
+
+    def nearest_nodes(self, lats, lngs, max_distance=None):
+        """
+        Node index of the closest usable node to every point and the
+        distance to it in metres. Points farther than `max_distance` from
+        every node get -1.
+        """
+        points = self.project(lats, lngs)
+        distance, i = self._node_tree.query(points, distance_upper_bound=np.inf if max_distance is None else max_distance)
+        found = np.isfinite(distance)
+        nodes = np.full(len(points), -1, dtype=np.int64)
+        nodes[found] = self.nodes[i[found]]
+        return nodes, distance
+
+    def nearest_edge_points(self, lats, lngs, max_distance=None):
+        """
+        The closest point on any usable road to every point, as (edge index,
+        fraction of the edge's length from its u end, node index of the
+        nearer end along the road, [lng, lat] of the point, distance in
+        metres). Edge and node are -1 beyond `max_distance`.
+
+        The k nearest piece midpoints give the answer when the k-th is
+        farther than the best distance plus half a piece; the rest redo the
+        search over every piece within that radius.
+        """
+        points = self.project(lats, lngs)
+        n = len(points)
+        edges = np.full(n, -1, dtype=np.int64)
+        fractions = np.full(n, np.nan)
+        distance = np.full(n, np.inf)
+        snapped = np.full((n, 2), np.nan)
+        if self._piece_tree is None or n == 0:
+            return edges, fractions, edges.copy(), snapped, distance
+
+        k = min(EDGE_CANDIDATES, len(self._piece_edge))
+        mid_distance, candidates = self._piece_tree.query(points, k=k)
+        candidates = candidates.reshape(n, k)
+        best, t, dist = self._closest(points, candidates)
+        exact = mid_distance.reshape(n, k)[:, -1] > dist + self._piece_reach
+        if k == len(self._piece_edge):
+            exact[:] = True
+        for row in np.flatnonzero(~exact):
+            pieces = np.array(self._piece_tree.query_ball_point(points[row], dist[row] + self._piece_reach))
+            i, t_row, d_row = self._closest(points[row:row + 1], pieces[None, :])
+            best[row], t[row], dist[row] = i[0], t_row[0], d_row[0]
+
+        found = dist <= (np.inf if max_distance is None else max_distance)
+        piece = best[found]
+        a, b = self._piece_a[piece], self._piece_b[piece]
+        edge = self._piece_edge[piece]
+        along = self._piece_offset[piece] + np.hypot(*(b - a).T) * t[found]
+        edges[found] = edge
+        total = self.edge_length[edge]
+        fractions[found] = np.where(total > 0, along / np.where(total > 0, total, 1.0), 0.0).clip(0.0, 1.0)
+        distance[found] = dist[found]
+        snapped[found] = np.column_stack(self._to_lnglat.transform(*(a + (b - a) * t[found][:, None]).T))
+        nodes = np.where(fractions <= 0.5, self._edge_u[edges], self._edge_v[edges])
+        nodes[~found] = -1
+        return edges, fractions, nodes, snapped, distance
+
+    def _closest(self, points, pieces):
+        """Per point, the closest of its candidate pieces: (piece, t along it, distance)."""
+        a, b = self._piece_a[pieces], self._piece_b[pieces]
+        ab = b - a
+        denom = (ab ** 2).sum(axis=2)
+        t = (((points[:, None, :] - a) * ab).sum(axis=2) / np.where(denom > 0, denom, 1.0)).clip(0.0, 1.0)
+        dist = np.hypot(*(a + ab * t[..., None] - points[:, None, :]).transpose(2, 0, 1))
+        col = np.argmin(dist, axis=1)
+        rows = np.arange(len(points))
+        return pieces[rows, col], t[rows, col], dist[rows, col]
+
+    def site_nodes(self, sites):
+        """
+        Node index of every site (objects with lat/lng), memoized per set of
+        site coordinates: the index lives as long as this network version,
+        so the default sites are snapped once per version.
+        """
+        key = tuple((float(s.lat), float(s.lng)) for s in sites)
+        with self._lock:
+            nodes = self._sites.get(key)
+            if nodes is not None:
+                self._sites.move_to_end(key)
+                return nodes
+        nodes, _ = self.nearest_nodes([lat for lat, _ in key], [lng for _, lng in key])
+        with self._lock:
+            self._sites[key] = nodes
+            while len(self._sites) > self._max_site_sets:
+                self._sites.popitem(last=False)
+        return nodes
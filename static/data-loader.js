@@ -14,10 +14,11 @@ import { evacuationSitesData } from './evacuation-sites.js';
  * Fetch all required GeoJSON data and initialize layers
  */
 export async function loadData() {
-    const timestamp = new Date().getTime();
+    // No cache-buster: the server sends ETags, so the browser revalidates
+    // and gets a cheap 304 when the layer is unchanged.
 
     // Fetch Flood Data
-    fetch(`${API_ENDPOINTS.flood}?t=${timestamp}`)
+    fetch(API_ENDPOINTS.flood)
         .then(response => response.json())
         .then(data => {
             state.floodLayer = L.geoJSON(data, {
@@ -36,7 +37,7 @@ export async function loadData() {
         .catch(err => console.error("Error loading flood data:", err));
 
     // Fetch QC Boundary Data
-    fetch(`${API_ENDPOINTS.boundary}?t=${timestamp}`)
+    fetch(API_ENDPOINTS.boundary)
         .then(response => response.json())
         .then(data => {
             state.boundaryLayer = L.geoJSON(data, {
@@ -50,7 +51,7 @@ export async function loadData() {
         .catch(err => console.error("Error loading boundary data:", err));
 
     // Fetch District 1 Boundary Data
-    fetch(`${API_ENDPOINTS.district1Boundary}?t=${timestamp}`)
+    fetch(API_ENDPOINTS.district1Boundary)
         .then(response => response.json())
         .then(data => {
             state.district1BoundaryLayer = L.geoJSON(data, {
@@ -64,13 +65,16 @@ export async function loadData() {
         .catch(err => console.error("Error loading District 1 boundary data:", err));
 
     // Fetch District 1 Road Data
-    fetch(`${API_ENDPOINTS.roads}?t=${timestamp}`)
+    fetch(API_ENDPOINTS.roads)
         .then(response => response.json())
         .then(data => {
             const nodes = new Map();
             state.adjacencyList.clear();
 
-            data.features.forEach(feature => {
+            state.roadFeatureCount = data.features.length;
+            data.features.forEach((feature, index) => {
+                // Position in the roads table, used to read per-edge rainfall
+                feature.edgeIndex = index;
                 const coords = feature.geometry.coordinates;
                 const u = feature.properties.u;
                 const v = feature.properties.v;
@@ -86,7 +86,7 @@ export class PriorityQueue {
 }
 
 import { state } from './state.js';
-import { getIntensityAt } from './jaxa-api.js';
+import { getEdgeIntensity } from './jaxa-api.js';
 
 /**
  * Normalizes a value between 0 and 1
@@ -111,9 +111,7 @@ export function calculateMCWeights(adjacencyList) {
             const feature = neighbor.feature;
             const length = feature.properties.length || 1;
             const risk = feature.properties.risk_level || 0;
-            const coords = feature.geometry.coordinates;
-            const midPoint = coords[Math.floor(coords.length / 2)];
-            const rainfall = state.simulationMode ? manualRainfall : getIntensityAt(midPoint[1], midPoint[0]);
+            const rainfall = state.simulationMode ? manualRainfall : getEdgeIntensity(feature);
 
             allEdges.push({
                 u,
@@ -226,11 +224,8 @@ function getEffectedWeight(neighbor) {
 
     const feature = neighbor.feature;
     const staticRisk = feature.properties.risk_level || 0;
-    const coords = feature.geometry.coordinates;
-    const midIdx = Math.floor(coords.length / 2);
-    const midPoint = coords[midIdx];
 
-    const rainfallIntensity = getIntensityAt(midPoint[1], midPoint[0]);
+    const rainfallIntensity = getEdgeIntensity(feature);
 
     let riskMultiplier = 1.0;
     const combinedRisk = Math.max(staticRisk, rainfallIntensity > 30 ? 3 : (rainfallIntensity > 15 ? 2 : (rainfallIntensity > 5 ? 1 : 0)));
@@ -437,11 +432,7 @@ export function findNearestEvacuationPath(startNode, evacuationSites, adjacencyL
 
         // Calculate total raw metrics for the path
         const totalRisk = p.features.reduce((sum, f) => sum + (f.properties.risk_level || 0), 0);
-        const totalRainfall = p.features.reduce((sum, f) => {
-            const coords = f.geometry.coordinates;
-            const mid = coords[Math.floor(coords.length / 2)];
-            return sum + getIntensityAt(mid[1], mid[0]);
-        }, 0);
+        const totalRainfall = p.features.reduce((sum, f) => sum + getEdgeIntensity(f), 0);
 
         return {
             ...p,
@@ -13,7 +13,8 @@ export async function fetchRainfallData(timeframe = 'now') {
     console.log(`FETCH: Getting REAL JAXA rainfall data for timeframe: ${timeframe}`);
 
     try {
-        const response = await fetch(`/jaxa_rainfall_latest?t=${new Date().getTime()}`);
+        // Revalidated with the grid's ETag; an unchanged frame is a 304
+        const response = await fetch('/jaxa_rainfall_latest', { cache: 'no-cache' });
         const data = await response.json();
 
         if (data.error) {
@@ -21,27 +22,18 @@ export async function fetchRainfallData(timeframe = 'now') {
             return simulateRainfall(timeframe);
         }
 
+        // Compact grid: origin (NW corner), cell size, shape and flat intensities
+        data.intensity = Float32Array.from(data.intensity);
         state.rainfallData = data;
-
-        // Pre-process for performance
-        state.rainfallGrid = data.features.map(f => {
-            const coords = f.geometry.coordinates[0];
-            return {
-                minLon: coords[0][0],
-                maxLon: coords[2][0],
-                minLat: coords[0][1],
-                maxLat: coords[2][1],
-                intensity: f.properties.intensity
-            };
-        });
+        await fetchEdgeRainfall();
 
         // Log the retrieved statistics
-        const intensities = data.features.map(f => f.properties.intensity);
-        const maxRain = Math.max(...intensities);
+        const intensities = data.intensity;
+        const maxRain = intensities.reduce((a, b) => Math.max(a, b), 0);
         const avgRain = intensities.reduce((a, b) => a + b, 0) / intensities.length;
 
         console.log(`REAL RAINFALL DATA LOADED:`, {
-            features: data.features.length,
+            cells: intensities.length,
             maxIntensity: maxRain.toFixed(2) + " mm/h",
             avgIntensity: avgRain.toFixed(2) + " mm/h",
             timestamp: data.timestamp,
@@ -55,12 +47,25 @@ export async function fetchRainfallData(timeframe = 'now') {
     }
 }
 
+/**
+ * Fetches the per-edge rainfall vector published with the latest JAXA frame,
+ * so edges never have to search the rainfall grid.
+ */
+async function fetchEdgeRainfall() {
+    try {
+        const response = await fetch('/jaxa_rainfall_latest/edges');
+        state.edgeRainfall = response.ok ? new Float32Array(await response.arrayBuffer()) : null;
+    } catch (err) {
+        console.warn("Per-edge rainfall not available, using grid lookups.", err);
+        state.edgeRainfall = null;
+    }
+}
+
 /**
  * Original simulation logic (kept as fallback)
  */
 function simulateRainfall(timeframe) {
     const gridResolution = 0.05;
-    const features = [];
     const centers = {
         'now': [{ lat: 14.68, lon: 121.05, intensity: 25 }],
         '1h': [{ lat: 14.70, lon: 121.08, intensity: 40 }],
@@ -70,45 +75,70 @@ function simulateRainfall(timeframe) {
 
     const activeCenters = centers[timeframe] || centers.now;
 
-    for (let lat = 14.60; lat <= 14.76; lat += gridResolution) {
-        for (let lon = 121.00; lon <= 121.16; lon += gridResolution) {
-            let intensity = 0;
-            activeCenters.forEach(c => {
-                const dist = Math.sqrt(Math.pow(lat - c.lat, 2) + Math.pow(lon - c.lon, 2));
-                intensity += c.intensity * Math.exp(-dist * 20);
+    const lats = [];
+    const lons = [];
+    for (let lat = 14.60; lat <= 14.76; lat += gridResolution) lats.push(lat);
+    for (let lon = 121.00; lon <= 121.16; lon += gridResolution) lons.push(lon);
+
+    // Same layout as the JAXA grid: rows run north to south
+    const rows = lats.length;
+    const cols = lons.length;
+    const intensity = new Float32Array(rows * cols);
+    for (let r = 0; r < rows; r++) {
+        const lat = lats[rows - 1 - r]; // south edge of the cell
+        for (let c = 0; c < cols; c++) {
+            const lon = lons[c];
+            let value = 0;
+            activeCenters.forEach(center => {
+                const dist = Math.sqrt(Math.pow(lat - center.lat, 2) + Math.pow(lon - center.lon, 2));
+                value += center.intensity * Math.exp(-dist * 20);
             });
-            intensity = Math.max(0, intensity);
+            intensity[r * cols + c] = Math.max(0, value);
+        }
+    }
+
+    state.rainfallData = {
+        format: 'grid',
+        origin: [lons[0], lats[rows - 1] + gridResolution],
+        cell_size: gridResolution,
+        shape: [rows, cols],
+        intensity: intensity,
+        timeframe: timeframe
+    };
+    state.edgeRainfall = null;
+
+    return state.rainfallData;
+}
+
+/**
+ * Expands the rainfall grid into one Polygon feature per cell (overlay only)
+ */
+function gridToFeatures(grid) {
+    const [rows, cols] = grid.shape;
+    const size = grid.cell_size;
+    const features = [];
+
+    for (let r = 0; r < rows; r++) {
+        const lat = grid.origin[1] - r * size; // north edge of the row
+        for (let c = 0; c < cols; c++) {
+            const lon = grid.origin[0] + c * size;
             features.push({
                 type: 'Feature',
                 geometry: {
                     type: 'Polygon',
                     coordinates: [[
                         [lon, lat],
-                        [lon + gridResolution, lat],
-                        [lon + gridResolution, lat + gridResolution],
-                        [lon, lat + gridResolution],
+                        [lon + size, lat],
+                        [lon + size, lat - size],
+                        [lon, lat - size],
                         [lon, lat]
                     ]]
                 },
-                properties: { intensity: intensity, timeframe: timeframe }
+                properties: { intensity: grid.intensity[r * cols + c] }
             });
         }
     }
-    state.rainfallData = { type: 'FeatureCollection', features: features };
-
-    // Pre-process simulated grid for performance
-    state.rainfallGrid = features.map(f => {
-        const coords = f.geometry.coordinates[0];
-        return {
-            minLon: coords[0][0],
-            maxLon: coords[2][0],
-            minLat: coords[0][1],
-            maxLat: coords[2][1],
-            intensity: f.properties.intensity
-        };
-    });
-
-    return state.rainfallData;
+    return { type: 'FeatureCollection', features: features };
 }
 
 /**
@@ -121,7 +151,7 @@ export function updateRainfallOverlay() {
 
     if (!state.showRainfall || !state.rainfallData) return;
 
-    state.rainfallLayer = L.geoJSON(state.rainfallData, {
+    state.rainfallLayer = L.geoJSON(gridToFeatures(state.rainfallData), {
         style: (feature) => {
             const intensity = feature.properties.intensity;
             let color = 'transparent';
@@ -152,13 +182,28 @@ export function updateRainfallOverlay() {
  * Gets rainfall intensity for a specific coordinate
  */
 export function getIntensityAt(lat, lon) {
-    if (!state.rainfallGrid) return 0;
+    const grid = state.rainfallData;
+    if (!grid || grid.format !== 'grid') return 0;
+
+    // Direct cell index instead of scanning every cell
+    const [rows, cols] = grid.shape;
+    const row = Math.floor((grid.origin[1] - lat) / grid.cell_size);
+    const col = Math.floor((lon - grid.origin[0]) / grid.cell_size);
+    if (row < 0 || row >= rows || col < 0 || col >= cols) return 0;
+    return grid.intensity[row * cols + col];
+}
 
-    for (let i = 0; i < state.rainfallGrid.length; i++) {
-        const cell = state.rainfallGrid[i];
-        if (lon >= cell.minLon && lon <= cell.maxLon && lat >= cell.minLat && lat <= cell.maxLat) {
-            return cell.intensity;
-        }
+/**
+ * Gets rainfall intensity for a road feature, using the backend's per-edge
+ * vector when it matches the loaded road network
+ */
+export function getEdgeIntensity(feature) {
+    if (state.edgeRainfall && feature.edgeIndex !== undefined &&
+        state.edgeRainfall.length === state.roadFeatureCount) {
+        return state.edgeRainfall[feature.edgeIndex];
     }
-    return 0;
+
+    const coords = feature.geometry.coordinates;
+    const midPoint = coords[Math.floor(coords.length / 2)];
+    return getIntensityAt(midPoint[1], midPoint[0]);
 }
@@ -63,7 +63,7 @@ function getFloodStyle(feature) {
 }
 
 // Fetch and Add Flood Data
-fetch('/flood_clipped.geojson?t=' + new Date().getTime())
+fetch('/flood_clipped.geojson')
     .then(response => response.json())
     .then(data => {
         floodLayer = L.geoJSON(data, {
@@ -78,7 +78,7 @@ fetch('/flood_clipped.geojson?t=' + new Date().getTime())
     .catch(err => console.error("Error loading flood data:", err));
 
 // Fetch and Add Boundary Data
-fetch('/qc_boundary.geojson?t=' + new Date().getTime())
+fetch('/qc_boundary.geojson')
     .then(response => response.json())
     .then(data => {
         boundaryLayer = L.geoJSON(data, {
@@ -98,7 +98,7 @@ const project8BoundaryStyle = {
 
 // Fetch and Add Project 8 Boundary Data
 let project8BoundaryLayer = null;
-fetch('/project8_boundary.geojson?t=' + new Date().getTime())
+fetch('/project8_boundary.geojson')
     .then(response => response.json())
     .then(data => {
         project8BoundaryLayer = L.geoJSON(data, {
@@ -130,7 +130,7 @@ map.getPane('roadPane').style.zIndex = 650;
 
 // Fetch Project 8 Road Data (Filtered to Project 8 area only)
 let project8RoadLayer = null;
-fetch('/project8_roads.geojson?t=' + new Date().getTime())
+fetch('/project8_roads.geojson')
     .then(response => response.json())
     .then(data => {
         // Extract unique nodes and build Adjacency List
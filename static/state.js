@@ -24,6 +24,8 @@ export const state = {
     // Data structures
     adjacencyList: new Map(),
     rainfallData: null,
+    edgeRainfall: null, // Float32Array of rainfall per road feature (from the backend)
+    roadFeatureCount: 0,
     evacuationSites: [],
 
     // UI state
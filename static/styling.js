@@ -36,7 +36,7 @@ export function getFloodStyle(feature) {
     };
 }
 
-import { getIntensityAt } from './jaxa-api.js';
+import { getEdgeIntensity } from './jaxa-api.js';
 
 /**
  * Get road risk style based on risk level and rainfall
@@ -49,10 +49,7 @@ export function getRoadRiskStyle(feature) {
     if (state.simulationMode) {
         rainfallIntensity = state.manualRainfall;
     } else {
-        const coords = feature.geometry.coordinates;
-        const midIdx = Math.floor(coords.length / 2);
-        const midPoint = coords[midIdx];
-        rainfallIntensity = getIntensityAt(midPoint[1], midPoint[0]);
+        rainfallIntensity = getEdgeIntensity(feature);
     }
 
     // Calculate combined risk or rainfall-only risk
@@ -138,7 +138,8 @@ export function initSidebarControls() {
                 body: JSON.stringify({ host, user, password: pass, date, hour })
             });
 
-            const result = await response.json();
+            // The sync runs in the background; wait for its job to finish
+            const result = await waitForSyncJob(await response.json());
             if (result.status === 'success') {
                 alert("Success: " + result.message);
                 await fetchRainfallData(timeframe);
@@ -160,6 +161,23 @@ export function initSidebarControls() {
     initSimulationControls();
 }
 
+/**
+ * Polls a queued JAXA sync job until it succeeds or fails
+ */
+async function waitForSyncJob(job, timeoutMs = 180000) {
+    const started = Date.now();
+    while (job.status === 'queued' || job.status === 'running') {
+        if (Date.now() - started > timeoutMs) {
+            return { status: 'error', message: 'Sync is still running in the background.' };
+        }
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const response = await fetch(`/sync_jaxa_ftp/${job.job_id}`);
+        job = await response.json();
+        if (job.error) return { status: 'error', message: job.error };
+    }
+    return job;
+}
+
 /**
  * Initialize Simulation Sidebar Controls
  */
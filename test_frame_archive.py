@@ -0,0 +1,137 @@
+import datetime
+import json
+import os
+
+import numpy as np
+import pytest
+
+from frame_archive import FrameArchive
+
+# About 10 x 10 lattice cells, so every frame is a few hundred bytes
+BBOX = (15.0, 14.0, 121.0, 122.0)
+START = datetime.datetime(2024, 7, 24, 0, 0)
+
+
+def make_archive(tmp_path):
+    return FrameArchive("now", str(tmp_path), bbox=BBOX)
+
+
+def frames(archive, n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.random(archive.shape, dtype=np.float32) * 20 for _ in range(n)]
+
+
+def stamp(i):
+    return START + datetime.timedelta(minutes=30 * i)
+
+
+def test_round_trip(tmp_path):
+    archive = make_archive(tmp_path)
+    data = frames(archive, 4)
+    # Out of order on purpose: keys and series are sorted by time
+    for i in (2, 0, 3, 1):
+        archive.append(stamp(i), data[i], f"frame{i}.dat.gz")
+
+    assert len(archive) == 4
+    assert archive.timestamps() == [stamp(i) for i in range(4)]
+    assert stamp(2) in archive and stamp(9) not in archive
+    assert archive.frame(stamp(9)) is None
+    for i in range(4):
+        np.testing.assert_array_equal(archive.frame(stamp(i)), data[i])
+        assert archive.source(stamp(i)) == f"frame{i}.dat.gz"
+
+    r0, c0 = archive.row0 + 2, archive.col0 + 3
+    np.testing.assert_array_equal(archive.window(stamp(1), r0, r0 + 4, c0, c0 + 5), data[1][2:6, 3:8])
+    times, stack = archive.series(stamp(1), stamp(3), r0, r0 + 4, c0, c0 + 5)
+    assert times == [stamp(1), stamp(2), stamp(3)]
+    np.testing.assert_array_equal(stack, np.stack([d[2:6, 3:8] for d in data[1:]]))
+
+    # A second instance (another process) reads the same frames from disk
+    reopened = make_archive(tmp_path)
+    assert reopened.keys() == archive.keys()
+    np.testing.assert_array_equal(reopened.frame(stamp(3)), data[3])
+
+
+def test_identical_frames_share_a_slot(tmp_path):
+    archive = make_archive(tmp_path)
+    first, second = frames(archive, 2)
+    assert archive.append(stamp(0), first) == 0
+    assert archive.append(stamp(1), second) == 1
+    size = os.path.getsize(archive.data_path)
+
+    # Same content at another time (a dry spell of all-zero frames, say)
+    assert archive.append(stamp(2), first.copy()) == 0
+    assert os.path.getsize(archive.data_path) == size
+    assert archive.index["slots"] == 2
+    np.testing.assert_array_equal(archive.frame(stamp(2)), first)
+
+    # Re-ingesting a time replaces its frame
+    assert archive.append(stamp(0), second) == 1
+    np.testing.assert_array_equal(archive.frame(stamp(0)), second)
+
+
+def test_appends_from_another_instance_are_picked_up(tmp_path):
+    reader = make_archive(tmp_path)
+    writer = make_archive(tmp_path)
+    data = frames(writer, 2)
+    writer.append(stamp(0), data[0])
+    assert reader.keys() == [stamp(0).strftime("%Y%m%d%H%M")]
+    np.testing.assert_array_equal(reader.frame(stamp(0)), data[0])
+    version = reader.version
+    writer.append(stamp(1), data[1])
+    assert reader.version != version
+    np.testing.assert_array_equal(reader.frame(stamp(1)), data[1])
+
+
+def test_partial_slot_is_dropped_on_next_append(tmp_path):
+    archive = make_archive(tmp_path)
+    data = frames(archive, 2)
+    archive.append(stamp(0), data[0])
+    # A crash halfway through writing the next frame
+    with open(archive.data_path, "ab") as f:
+        f.write(data[1].tobytes()[:100])
+
+    reopened = make_archive(tmp_path)
+    assert len(reopened) == 1
+    np.testing.assert_array_equal(reopened.frame(stamp(0)), data[0])
+    assert reopened.append(stamp(1), data[1]) == 1
+    assert os.path.getsize(reopened.data_path) == 2 * data[0].nbytes
+    np.testing.assert_array_equal(reopened.frame(stamp(1)), data[1])
+
+
+def test_failed_index_write_keeps_the_previous_index(tmp_path, monkeypatch):
+    archive = make_archive(tmp_path)
+    data = frames(archive, 2)
+    archive.append(stamp(0), data[0])
+    with open(archive.index_path) as f:
+        before = f.read()
+
+    def crash(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", crash)
+    with pytest.raises(OSError):
+        archive.append(stamp(1), data[1])
+    monkeypatch.undo()
+
+    # The data was appended, but the index on disk never saw the frame
+    with open(archive.index_path) as f:
+        assert f.read() == before
+    json.loads(before)
+    reopened = make_archive(tmp_path)
+    assert reopened.keys() == [stamp(0).strftime("%Y%m%d%H%M")]
+    assert reopened.append(stamp(1), data[1]) == 1
+    assert os.path.getsize(reopened.data_path) == 2 * data[0].nbytes
+    np.testing.assert_array_equal(reopened.frame(stamp(1)), data[1])
+
+
+def test_shape_and_window_checks(tmp_path):
+    archive = make_archive(tmp_path)
+    rows, cols = archive.shape
+    with pytest.raises(ValueError):
+        archive.append(stamp(0), np.zeros((rows + 1, cols), dtype=np.float32))
+    with pytest.raises(ValueError):
+        archive.window(stamp(0), archive.row0 - 1, archive.row0 + 1, archive.col0, archive.col0 + 1)
+    assert archive.window(stamp(0), archive.row0, archive.row0 + 1, archive.col0, archive.col0 + 1) is None
+    times, stack = archive.series(stamp(0), stamp(5), archive.row0, archive.row0 + 2, archive.col0, archive.col0 + 3)
+    assert times == [] and stack.shape == (0, 2, 3)
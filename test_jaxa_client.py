@@ -0,0 +1,162 @@
+import os
+import threading
+import time
+
+import pytest
+from pyftpdlib.authorizers import DummyAuthorizer
+from pyftpdlib.handlers import FTPHandler
+from pyftpdlib.ioloop import IOLoop
+from pyftpdlib.servers import ThreadedFTPServer
+
+from jaxa_client import JaxaFTPClient
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.logins = 0
+        self.open = 0
+        self.max_open = 0
+        self.commands = {"NLST": 0, "RETR": 0}
+        # Next N NLST / RETR commands drop the control connection
+        self.drop = {"NLST": 0, "RETR": 0}
+        self.retr_delay = 0.0
+
+    def count(self, command):
+        with self.lock:
+            self.commands[command] += 1
+            if self.drop[command]:
+                self.drop[command] -= 1
+                return True
+        return False
+
+
+@pytest.fixture
+def ftp_server(tmp_path):
+    """pyftpdlib on 127.0.0.1 serving tmp_path/remote as user/password, one thread per session."""
+    root = tmp_path / "remote"
+    (root / "now").mkdir(parents=True)
+    for i in range(8):
+        (root / "now" / f"gsmap_gauge_now.20240101.{i:02d}00.dat.gz").write_bytes(bytes([i]) * 1024)
+
+    stats = Stats()
+
+    class Handler(FTPHandler):
+        def on_connect(self):
+            with stats.lock:
+                stats.open += 1
+                stats.max_open = max(stats.max_open, stats.open)
+
+        def on_disconnect(self):
+            with stats.lock:
+                stats.open -= 1
+
+        def on_login(self, username):
+            with stats.lock:
+                stats.logins += 1
+
+        def ftp_NLST(self, path):
+            if stats.count("NLST"):
+                return self.close()
+            return super().ftp_NLST(path)
+
+        def ftp_RETR(self, file):
+            if stats.count("RETR"):
+                return self.close()
+            time.sleep(stats.retr_delay)
+            return super().ftp_RETR(file)
+
+    authorizer = DummyAuthorizer()
+    authorizer.add_user("user", "password", str(root), perm="elr")
+    Handler.authorizer = authorizer
+    # Own loop per server: the default IOLoop is a process-wide singleton
+    server = ThreadedFTPServer(("127.0.0.1", 0), Handler, ioloop=IOLoop())
+    thread = threading.Thread(target=server.serve_forever, kwargs={"timeout": 0.05}, daemon=True)
+    thread.start()
+    yield server.address[1], stats
+    server.close_all()
+    thread.join(5)
+
+
+def make_client(port, **kwargs):
+    kwargs.setdefault("backoff", 0.0)
+    return JaxaFTPClient("127.0.0.1", "user", "password", port=port, timeout=5, **kwargs)
+
+
+def test_sessions_are_reused_and_bounded(ftp_server, tmp_path):
+    port, stats = ftp_server
+    client = make_client(port, pool_size=2)
+    for _ in range(5):
+        client.list_dir("/now/", use_cache=False)
+    assert stats.logins == 1
+
+    items = [(f"/now/gsmap_gauge_now.20240101.{i:02d}00.dat.gz", str(tmp_path / "local" / f"{i}.gz")) for i in range(8)]
+    results = list(client.download_many(items))
+    assert all(error is None for _, _, error in results)
+    assert stats.max_open <= 2
+    assert stats.logins <= 2
+    assert (tmp_path / "local" / "3.gz").read_bytes() == bytes([3]) * 1024
+    client.close()
+
+
+def test_retry_after_dropped_connection(ftp_server):
+    port, stats = ftp_server
+    client = make_client(port, retries=2)
+    client.list_dir("/now/", use_cache=False)
+    stats.drop["NLST"] = 1
+    names = client.list_dir("/now/", use_cache=False)
+    assert len(names) == 8
+    assert stats.commands["NLST"] == 3
+    client.close()
+
+
+def test_no_retry_on_550(ftp_server, tmp_path):
+    port, stats = ftp_server
+    client = make_client(port, retries=3)
+    local = tmp_path / "local" / "missing.gz"
+    with pytest.raises(Exception) as error:
+        client.download("/now/missing.dat.gz", str(local))
+    assert str(error.value).startswith("550")
+    assert stats.commands["RETR"] == 1
+    assert os.listdir(local.parent) == []
+    client.close()
+
+
+def test_listing_ttl(ftp_server):
+    port, stats = ftp_server
+    client = make_client(port, listing_ttl=0.3)
+    client.list_dir("/now/")
+    client.list_dir("/now/")
+    assert stats.commands["NLST"] == 1
+    time.sleep(0.4)
+    client.list_dir("/now/")
+    assert stats.commands["NLST"] == 2
+    client.list_dir("/now/", use_cache=False)
+    assert stats.commands["NLST"] == 3
+    client.close()
+
+
+def test_failed_retr_leaves_no_partial_file(ftp_server, tmp_path):
+    port, stats = ftp_server
+    client = make_client(port, retries=0)
+    stats.drop["RETR"] = 1
+    local = tmp_path / "local" / "frame.gz"
+    with pytest.raises(Exception):
+        client.download("/now/gsmap_gauge_now.20240101.0100.dat.gz", str(local))
+    assert os.listdir(local.parent) == []
+    client.close()
+
+
+def test_closing_download_many_cancels_queued_transfers(ftp_server, tmp_path):
+    port, stats = ftp_server
+    stats.retr_delay = 0.2
+    client = make_client(port, pool_size=1)
+    items = [(f"/now/gsmap_gauge_now.20240101.{i:02d}00.dat.gz", str(tmp_path / "local" / f"{i}.gz")) for i in range(8)]
+    downloads = client.download_many(items)
+    next(downloads)
+    downloads.close()
+    time.sleep(0.5)
+    # The first transfer and at most the one already running when closed
+    assert stats.commands["RETR"] <= 2
+    assert len(os.listdir(tmp_path / "local")) <= 2
+    client.close()
@@ -0,0 +1,101 @@
+import datetime
+
+import numpy as np
+import pytest
+
+import rainfall_series
+from frame_archive import FrameArchive
+from jaxa_client import PRODUCT_INTERVALS
+from rainfall_series import AccumulationStack, parse_window, series
+
+BBOX = (15.0, 14.0, 121.0, 122.0)
+START = datetime.datetime(2024, 7, 24, 0, 0)
+INTERVAL = PRODUCT_INTERVALS["now"]
+
+# Half-hourly frames with a gap, so windows hold fewer frames than they span
+STEPS = [i for i in range(24) if i not in (5, 6, 13)]
+
+
+def stamp(step):
+    return START + datetime.timedelta(minutes=30 * step)
+
+
+def rain(shape, seed):
+    rng = np.random.default_rng(seed)
+    frame = (rng.random(shape) * 30).astype(np.float32)
+    # JAXA no-data, a NaN and an implausible value: all count as no rain
+    frame[0, 0] = -999.9
+    frame[1, 1] = np.nan
+    frame[2, 2] = 900.0
+    return frame
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return FrameArchive("now", str(tmp_path), bbox=BBOX)
+
+
+def use_stack(monkeypatch, archive, max_frames):
+    stack = AccumulationStack(archive, INTERVAL, max_frames=max_frames)
+    monkeypatch.setitem(rainfall_series._stacks, "now", stack)
+    return stack
+
+
+def fill(archive, steps):
+    frames = {}
+    for step in steps:
+        frames[stamp(step)] = rain(archive.shape, step)
+        archive.append(stamp(step), frames[stamp(step)])
+    return frames
+
+
+def brute_force(frames, end, window, rows, cols, agg):
+    """(value, frame count) over the archived frames in (end - window, end]."""
+    inside = [np.nan_to_num(f[rows, cols].astype(np.float64), nan=-1.0)
+              for t, f in sorted(frames.items()) if end - window < t <= end]
+    inside = [np.where((f >= 0) & (f <= 500), f, 0.0) for f in inside]
+    if agg == "sum":
+        return sum(f * INTERVAL for f in inside), len(inside)
+    return np.max(inside, axis=0), len(inside)
+
+
+def check(archive, frames, window, agg, start, end, r=(2, 7), c=(1, 9)):
+    row_start, row_stop = archive.row0 + r[0], archive.row0 + r[1]
+    col_start, col_stop = archive.col0 + c[0], archive.col0 + c[1]
+    result = series("now", row_start, row_stop, col_start, col_stop, start, end, window, agg)
+
+    expected_times = [t for t in sorted(frames) if start <= t <= end]
+    assert result["times"] == expected_times
+    for t, value, count in zip(result["times"], result["values"], result["frames"]):
+        want, want_count = brute_force(frames, t, parse_window(window), slice(*r), slice(*c), agg)
+        assert count == want_count
+        np.testing.assert_allclose(value, want, rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("max_frames", [144, 6])
+@pytest.mark.parametrize("window", ["30m", "1h", "90m", "3h", "24h"])
+@pytest.mark.parametrize("agg", ["sum", "max"])
+def test_series_matches_brute_force(monkeypatch, archive, max_frames, window, agg):
+    # 144 frames keep every window on the running sums; 6 send the long ones to the memmap
+    use_stack(monkeypatch, archive, max_frames)
+    frames = fill(archive, STEPS)
+    check(archive, frames, window, agg, stamp(0), stamp(23))
+    check(archive, frames, window, agg, stamp(8), stamp(15))
+
+
+def test_running_sums_follow_new_and_backfilled_frames(monkeypatch, archive):
+    stack = use_stack(monkeypatch, archive, 144)
+    frames = fill(archive, STEPS[:10])
+    check(archive, frames, "3h", "sum", stamp(0), stamp(12))
+    cum = list(stack.cum)
+
+    # Newer frames extend the sums in place
+    frames.update(fill(archive, STEPS[10:]))
+    check(archive, frames, "3h", "sum", stamp(0), stamp(23))
+    assert len(stack.cum) > len(cum)
+    assert all(a is b for a, b in zip(stack.cum, cum))
+
+    # A late frame inside the gap rebuilds them
+    frames.update(fill(archive, [5]))
+    check(archive, frames, "3h", "sum", stamp(0), stamp(23))
+    assert stack.keys == [t.strftime("%Y%m%d%H%M") for t in sorted(frames)]
@@ -0,0 +1,39 @@
+import warnings
+
+import numpy as np
+
+from artifacts import load_layer
+from mc_weights import DEFAULT_MC_WEIGHTS
+from routing import RoadGraph, bake_weights, k_shortest_paths, lazy_k_shortest_paths
+
+warnings.filterwarnings("ignore", message="Could not parse column")
+
+GRAPH = RoadGraph(load_layer("project8_roads.geojson", ["u", "v", "length", "risk_level"]), version="test")
+
+
+def test_simulation_weights_are_not_negative():
+    # The roads table has risk_level -2 edges, which made the WSM negative
+    assert GRAPH.edge_risk.min() < 0
+    weights = bake_weights(GRAPH, True, DEFAULT_MC_WEIGHTS, 0.0, np.zeros(GRAPH.n_edges))
+    assert weights.min() >= 0
+
+
+def test_simulation_mode_routes_terminate():
+    weights = bake_weights(GRAPH, True, DEFAULT_MC_WEIGHTS, 0.0, np.zeros(GRAPH.n_edges))
+    rng = np.random.default_rng(0)
+    sites = set(rng.choice(GRAPH.n_nodes, 12, replace=False).tolist())
+    for origin in rng.choice(GRAPH.n_nodes, 10, replace=False).tolist():
+        paths = k_shortest_paths(GRAPH, weights, origin, sites, 3)
+        costs = [p.cost for p in paths]
+        assert costs == sorted(costs)
+        assert all(c >= 0 for c in costs)
+
+
+def test_lazy_yen_matches_yen_in_simulation_mode():
+    weights = bake_weights(GRAPH, True, DEFAULT_MC_WEIGHTS, 0.0, np.zeros(GRAPH.n_edges))
+    rng = np.random.default_rng(1)
+    sites = set(rng.choice(GRAPH.n_nodes, 12, replace=False).tolist())
+    for origin in rng.choice(GRAPH.n_nodes, 10, replace=False).tolist():
+        eager = [round(p.cost, 6) for p in k_shortest_paths(GRAPH, weights, origin, sites, 5)]
+        lazy = [round(p.cost, 6) for p in lazy_k_shortest_paths(GRAPH, weights, origin, sites, 5)]
+        assert lazy == eager
@@ -0,0 +1,199 @@
+import struct
+
+import geopandas as gpd
+import numpy as np
+import pytest
+import shapely
+
+from vector_tiles import BUFFER, EXTENT, _varint, _zigzag, python_tile, tile_bounds
+
+# A tile over Quezon City; shapes are placed on its pixel grid so the
+# quantized coordinates are known exactly
+Z, X, Y = 14, 13705, 7598
+MINX, MINY, MAXX, MAXY = tile_bounds(Z, X, Y)
+UNIT = (MAXX - MINX) / EXTENT
+
+
+def at(px, py):
+    """Web Mercator coordinates of a point in tile units (y down)."""
+    return MINX + px * UNIT, MAXY - py * UNIT
+
+
+def read_varint(buf, i):
+    value = shift = 0
+    while True:
+        byte = buf[i]
+        i += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, i
+
+
+def unzigzag(n):
+    return (n >> 1) ^ -(n & 1)
+
+
+def fields(buf):
+    """(field number, value) of a protobuf message: ints for varints, bytes otherwise."""
+    out, i = [], 0
+    while i < len(buf):
+        key, i = read_varint(buf, i)
+        number, wire = key >> 3, key & 7
+        if wire == 0:
+            value, i = read_varint(buf, i)
+        elif wire == 1:
+            value, i = buf[i:i + 8], i + 8
+        elif wire == 2:
+            size, i = read_varint(buf, i)
+            value, i = buf[i:i + size], i + size
+        else:
+            raise AssertionError(f"unexpected wire type {wire}")
+        out.append((number, value))
+    return out
+
+
+def packed(buf):
+    values, i = [], 0
+    while i < len(buf):
+        value, i = read_varint(buf, i)
+        values.append(value)
+    return values
+
+
+def decode_value(buf):
+    (number, value), = fields(buf)
+    return {1: lambda v: v.decode("utf-8"), 3: lambda v: struct.unpack("<d", v)[0], 5: int,
+            6: unzigzag, 7: bool}[number](value)
+
+
+def decode_geometry(commands):
+    """Parts as (points, closed), with absolute tile coordinates."""
+    parts, x, y, i = [], 0, 0, 0
+    while i < len(commands):
+        command, count = commands[i] & 7, commands[i] >> 3
+        i += 1
+        if command == 7:
+            assert count == 1
+            parts[-1][1] = True
+            continue
+        assert command in (1, 2)
+        for _ in range(count):
+            x += unzigzag(commands[i])
+            y += unzigzag(commands[i + 1])
+            i += 2
+            if command == 1:
+                parts.append([[(x, y)], False])
+            else:
+                parts[-1][0].append((x, y))
+    return [(points, closed) for points, closed in parts]
+
+
+def decode_tile(tile):
+    layers = {}
+    for number, layer in fields(tile):
+        assert number == 3
+        message = {"features": [], "keys": [], "values": []}
+        for field, value in fields(layer):
+            if field == 15:
+                message["version"] = value
+            elif field == 1:
+                message["name"] = value.decode("utf-8")
+            elif field == 2:
+                message["features"].append(value)
+            elif field == 3:
+                message["keys"].append(value.decode("utf-8"))
+            elif field == 4:
+                message["values"].append(decode_value(value))
+            elif field == 5:
+                message["extent"] = value
+        features = []
+        for raw in message["features"]:
+            feature = {"tags": {}}
+            for field, value in fields(raw):
+                if field == 1:
+                    feature["id"] = value
+                elif field == 2:
+                    tags = packed(value)
+                    feature["tags"] = {message["keys"][k]: message["values"][v] for k, v in zip(tags[::2], tags[1::2])}
+                elif field == 3:
+                    feature["type"] = value
+                elif field == 4:
+                    feature["geometry"] = decode_geometry(packed(value))
+            features.append(feature)
+        message["features"] = features
+        layers[message["name"]] = message
+    return layers
+
+
+def shoelace(points):
+    """Twice the signed area of a ring given without its closing point."""
+    xy = np.array(points + points[:1], dtype=np.float64)
+    return float(np.sum(xy[:-1, 0] * xy[1:, 1] - xy[1:, 0] * xy[:-1, 1]))
+
+
+def frame(geometries, **columns):
+    return gpd.GeoDataFrame(columns, geometry=geometries, crs=3857)
+
+
+@pytest.mark.parametrize("value", [0, 1, 127, 128, 300, 2 ** 32 + 5])
+def test_varint_round_trip(value):
+    assert read_varint(_varint(value), 0) == (value, len(_varint(value)))
+
+
+@pytest.mark.parametrize("value", [0, -1, 1, -64, 4096, -4160])
+def test_zigzag_round_trip(value):
+    assert _zigzag(value) >= 0
+    assert unzigzag(_zigzag(value)) == value
+
+
+def test_line_and_properties():
+    points = [(10, 20), (500, 20), (500, 3000), (4000, 4000)]
+    gdf = frame([shapely.LineString([at(*p) for p in points])],
+                u=[7], v=[-3], name=["Katipunan Ave"], highway=[["primary", "trunk"]], length=[12.5],
+                risk_level=[None])
+    layer = decode_tile(python_tile(gdf, "roads", Z, X, Y))["roads"]
+
+    assert layer["version"] == 2
+    assert layer["extent"] == EXTENT
+    feature, = layer["features"]
+    assert feature["type"] == 2
+    assert feature["geometry"] == [(points, False)]
+    assert feature["tags"] == {"u": 7, "v": -3, "name": "Katipunan Ave", "highway": "primary, trunk", "length": 12.5}
+
+
+@pytest.mark.parametrize("sign", [1.0, -1.0])
+def test_polygon_rings_are_wound_for_mvt(sign):
+    exterior = [(100, 100), (3000, 100), (3000, 3000), (100, 3000)]
+    hole = [(1000, 1000), (1000, 2000), (2000, 2000), (2000, 1000)]
+    polygon = shapely.geometry.polygon.orient(shapely.Polygon([at(*p) for p in exterior], [[at(*p) for p in hole]]), sign)
+    layer = decode_tile(python_tile(frame([polygon], Var=[3]), "flood_hazard", Z, X, Y))["flood_hazard"]
+
+    feature, = layer["features"]
+    assert feature["type"] == 3
+    assert feature["tags"] == {"Var": 3}
+    (outer, outer_closed), (inner, inner_closed) = feature["geometry"]
+    assert outer_closed and inner_closed
+    # Exterior clockwise on screen (positive area with y down), hole the other way
+    assert shoelace(outer) > 0
+    assert shoelace(inner) < 0
+    assert set(outer) == set(exterior)
+    assert set(inner) == set(hole)
+
+
+def test_geometries_are_clipped_to_the_buffer():
+    line = shapely.LineString([at(-20000, 2048), at(20000, 2048)])
+    square = shapely.box(*at(-9000, 9000), *at(9000, -9000))
+    layer = decode_tile(python_tile(frame([line, square]), "qc_boundary", Z, X, Y))["qc_boundary"]
+
+    assert [f["type"] for f in layer["features"]] == [2, 3]
+    assert layer["features"][0]["geometry"] == [([(-BUFFER, 2048), (EXTENT + BUFFER, 2048)], False)]
+    ring, closed = layer["features"][1]["geometry"][0]
+    assert closed
+    assert set(ring) == {(-BUFFER, -BUFFER), (EXTENT + BUFFER, -BUFFER), (EXTENT + BUFFER, EXTENT + BUFFER),
+                         (-BUFFER, EXTENT + BUFFER)}
+
+
+def test_empty_tile():
+    far = shapely.LineString([at(-90000, 0), at(-80000, 0)])
+    assert python_tile(frame([far]), "qc_boundary", Z, X, Y) == b""
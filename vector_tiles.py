@@ -0,0 +1,343 @@
+import math
+import os
+import shutil
+import threading
+
+import numpy as np
+import shapely
+from sqlalchemy import text
+
+TILE_CACHE_DIR = "cache/tiles/"
+EXTENT = 4096
+BUFFER = 64
+MAX_ZOOM = 22
+
+# Half the width of the Web Mercator world in metres
+ORIGIN_SHIFT = 20037508.342789244
+
+# Layers that can be tiled and the attributes kept in each tile
+TILE_LAYERS = {
+    "flood_hazard": ["Var"],
+    "roads": ["u", "v", "name", "highway", "length", "risk_level"],
+    "qc_boundary": [],
+    "district_boundary": [],
+}
+
+
+def tile_bounds(z, x, y):
+    """Web Mercator (EPSG:3857) bounds of an XYZ tile: (minx, miny, maxx, maxy)."""
+    size = 2 * ORIGIN_SHIFT / (2 ** z)
+    minx = -ORIGIN_SHIFT + x * size
+    maxy = ORIGIN_SHIFT - y * size
+    return minx, maxy - size, minx + size, maxy
+
+
+def is_valid_tile(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def simplify_tolerance(z):
+    """
+    Simplification tolerance in metres for a zoom level: about one tile pixel
+    (at 256 px per tile), so low zooms carry far fewer vertices.
+    """
+    return 2 * ORIGIN_SHIFT / (256 * 2 ** z)
+
+
+# ---------------------------------------------------------------------------
+# PostGIS path
+# ---------------------------------------------------------------------------
+
+def postgis_tile(engine, layer, z, x, y):
+    """Builds one tile entirely inside PostGIS with ST_AsMVT."""
+    columns = "".join(f', t."{c}"' for c in TILE_LAYERS[layer])
+    query = text(f"""
+        WITH bounds AS (
+            SELECT ST_TileEnvelope(:z, :x, :y) AS geom,
+                   ST_Expand(ST_TileEnvelope(:z, :x, :y), :pad) AS buffered
+        ),
+        mvtgeom AS (
+            SELECT ST_AsMVTGeom(
+                       ST_SimplifyPreserveTopology(ST_Transform(t.geometry, 3857), :tolerance),
+                       bounds.geom, {EXTENT}, {BUFFER}, true
+                   ) AS geom{columns}
+            FROM {layer} t, bounds
+            -- Same buffered box ST_AsMVTGeom clips to (and python_tile uses), so
+            -- features reaching only into the buffer still draw across the seam
+            WHERE t.geometry && ST_Transform(bounds.buffered, 4326)
+        )
+        SELECT ST_AsMVT(mvtgeom.*, :layer, {EXTENT}, 'geom') FROM mvtgeom WHERE geom IS NOT NULL
+    """)
+    minx, _, maxx, _ = tile_bounds(z, x, y)
+    with engine.connect() as conn:
+        tile = conn.execute(query, {
+            "z": z, "x": x, "y": y,
+            "pad": (maxx - minx) * BUFFER / EXTENT,
+            "tolerance": simplify_tolerance(z),
+            "layer": layer,
+        }).scalar()
+    return bytes(tile) if tile else b""
+
+
+# ---------------------------------------------------------------------------
+# Pure-Python path (local GeoJSON fallback)
+# ---------------------------------------------------------------------------
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _field(number, wire_type, payload):
+    key = _varint((number << 3) | wire_type)
+    if wire_type == 2:
+        return key + _varint(len(payload)) + payload
+    return key + payload
+
+
+def _packed(number, values):
+    return _field(number, 2, b"".join(_varint(v) for v in values))
+
+
+def _encode_value(value):
+    """Encodes a property value as an MVT Value message."""
+    if isinstance(value, (bool, np.bool_)):
+        return _field(7, 0, _varint(int(value)))
+    if isinstance(value, (int, np.integer)):
+        value = int(value)
+        if value >= 0:
+            return _field(5, 0, _varint(value))
+        return _field(6, 0, _varint(_zigzag(value)))
+    if isinstance(value, (float, np.floating)):
+        return _field(3, 1, np.float64(value).astype("<f8").tobytes())
+    return _field(1, 2, str(value).encode("utf-8"))
+
+
+class _Cursor:
+    """Emits delta-encoded geometry commands relative to the last point."""
+
+    def __init__(self):
+        self.x = 0
+        self.y = 0
+        self.commands = []
+
+    def _command(self, cmd_id, count):
+        self.commands.append((cmd_id & 0x7) | (count << 3))
+
+    def _points(self, coords):
+        for px, py in coords:
+            self.commands.append(_zigzag(px - self.x))
+            self.commands.append(_zigzag(py - self.y))
+            self.x, self.y = px, py
+
+    def line(self, coords):
+        self._command(1, 1)
+        self._points(coords[:1])
+        self._command(2, len(coords) - 1)
+        self._points(coords[1:])
+
+    def ring(self, coords):
+        # The closing point is implied by ClosePath
+        self.line(coords[:-1])
+        self._command(7, 1)
+
+
+def _dedupe(coords):
+    """Drops consecutive duplicate integer points (they encode as zero-length moves)."""
+    keep = np.ones(len(coords), dtype=bool)
+    keep[1:] = np.any(coords[1:] != coords[:-1], axis=1)
+    return coords[keep]
+
+
+def _ring_area(coords):
+    x, y = coords[:, 0], coords[:, 1]
+    return 0.5 * float(np.sum(x[:-1] * y[1:] - x[1:] * y[:-1]))
+
+
+def _encode_geometry(geom):
+    """Returns (GeomType, command list) for a geometry in integer tile coordinates."""
+    cursor = _Cursor()
+    if geom.geom_type in ("Point", "MultiPoint"):
+        points = [tuple(p) for p in shapely.get_coordinates(geom).astype(np.int64).tolist()]
+        cursor._command(1, len(points))
+        cursor._points(points)
+        return 1, cursor.commands
+
+    if geom.geom_type in ("LineString", "MultiLineString"):
+        for part in getattr(geom, "geoms", [geom]):
+            coords = _dedupe(shapely.get_coordinates(part).astype(np.int64))
+            if len(coords) >= 2:
+                cursor.line(coords.tolist())
+        return 2, cursor.commands
+
+    if geom.geom_type in ("Polygon", "MultiPolygon"):
+        for part in getattr(geom, "geoms", [geom]):
+            rings = [part.exterior] + list(part.interiors)
+            for i, ring in enumerate(rings):
+                coords = _dedupe(shapely.get_coordinates(ring).astype(np.int64))
+                if len(coords) < 4:
+                    continue
+                # Tile space is y-down: exterior rings must have positive
+                # shoelace area (clockwise on screen), holes negative.
+                area = _ring_area(coords)
+                if area == 0:
+                    continue
+                if (i == 0) != (area > 0):
+                    coords = coords[::-1]
+                cursor.ring(coords.tolist())
+        return 3, cursor.commands
+
+    return 0, []
+
+
+def encode_layer(name, geometries, properties, extent=EXTENT):
+    """
+    Encodes one MVT layer. `geometries` are already in integer tile
+    coordinates; `properties` is a list of dicts, one per geometry.
+    """
+    keys, key_index = [], {}
+    values, value_index = [], {}
+    features = []
+
+    for fid, (geom, props) in enumerate(zip(geometries, properties)):
+        if geom is None or geom.is_empty:
+            continue
+        geom_type, commands = _encode_geometry(geom)
+        if not commands:
+            continue
+
+        tags = []
+        for key, value in props.items():
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+            if isinstance(value, (list, tuple, np.ndarray)):
+                # OSM tags such as name/highway can hold several values
+                value = ", ".join(str(v) for v in value)
+            if key not in key_index:
+                key_index[key] = len(keys)
+                keys.append(key)
+            value_key = (type(value).__name__, value)
+            if value_key not in value_index:
+                value_index[value_key] = len(values)
+                values.append(_encode_value(value))
+            tags.extend([key_index[key], value_index[value_key]])
+
+        feature = _field(1, 0, _varint(fid))
+        if tags:
+            feature += _packed(2, tags)
+        feature += _field(3, 0, _varint(geom_type)) + _packed(4, commands)
+        features.append(feature)
+
+    if not features:
+        return b""
+
+    layer = _field(15, 0, _varint(2)) + _field(1, 2, name.encode("utf-8"))
+    layer += b"".join(_field(2, 2, f) for f in features)
+    layer += b"".join(_field(3, 2, k.encode("utf-8")) for k in keys)
+    layer += b"".join(_field(4, 2, v) for v in values)
+    layer += _field(5, 0, _varint(extent))
+    # A Tile is just a list of layers (field 3)
+    return _field(3, 2, layer)
+
+
+def python_tile(gdf_3857, layer, z, x, y):
+    """
+    Builds one tile from an in-memory GeoDataFrame in EPSG:3857: bbox query
+    on the spatial index, clip to the buffered tile, zoom-dependent
+    simplification, then quantize to the tile grid.
+    """
+    minx, miny, maxx, maxy = tile_bounds(z, x, y)
+    pad = (maxx - minx) * BUFFER / EXTENT
+    clip_box = (minx - pad, miny - pad, maxx + pad, maxy + pad)
+
+    hits = gdf_3857.sindex.query(shapely.box(*clip_box))
+    if len(hits) == 0:
+        return b""
+    subset = gdf_3857.iloc[np.sort(hits)]
+
+    geoms = shapely.simplify(subset.geometry.values, simplify_tolerance(z), preserve_topology=True)
+    geoms = shapely.clip_by_rect(geoms, *clip_box)
+
+    scale_x = EXTENT / (maxx - minx)
+    scale_y = EXTENT / (maxy - miny)
+    geoms = shapely.transform(
+        geoms,
+        lambda c: np.column_stack([
+            np.round((c[:, 0] - minx) * scale_x),
+            np.round((maxy - c[:, 1]) * scale_y),
+        ]),
+    )
+
+    columns = [c for c in TILE_LAYERS[layer] if c in subset.columns]
+    properties = subset[columns].to_dict("records") if columns else [{}] * len(subset)
+    return encode_layer(layer, geoms, properties)
+
+
+class TileCache:
+    """
+    Serves vector tiles from an on-disk cache keyed by layer version, so a
+    table change simply starts a fresh directory instead of purging tiles.
+    The first tile written for a new version removes the directories of
+    the layer's older versions.
+    """
+
+    def __init__(self, layer_cache, cache_dir=TILE_CACHE_DIR):
+        self.layer_cache = layer_cache
+        self.cache_dir = cache_dir
+        self._frames = {}
+        self._written = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, layer, version):
+        """Deletes every cached version of a layer but `version`, once per version."""
+        with self._lock:
+            if self._written.get(layer) == version:
+                return
+            self._written[layer] = version
+        layer_dir = os.path.join(self.cache_dir, layer)
+        for name in os.listdir(layer_dir):
+            if name != version:
+                shutil.rmtree(os.path.join(layer_dir, name), ignore_errors=True)
+
+    def _local_frame(self, layer, version):
+        """GeoDataFrame of a local fallback layer, projected once per version."""
+        with self._lock:
+            cached = self._frames.get(layer)
+            if cached and cached[0] == version:
+                return cached[1]
+            gdf = self.layer_cache.read_gdf(layer, TILE_LAYERS[layer]).to_crs(epsg=3857)
+            gdf.sindex  # build the STRtree up front
+            self._frames[layer] = (version, gdf)
+            return gdf
+
+    def get(self, layer, z, x, y):
+        """Returns (tile bytes, layer version)."""
+        version = self.layer_cache.version(layer)
+        path = os.path.join(self.cache_dir, layer, version, str(z), str(x), f"{y}.mvt")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return f.read(), version
+
+        if self.layer_cache.engine is not None:
+            tile = postgis_tile(self.layer_cache.engine, layer, z, x, y)
+        else:
+            tile = python_tile(self._local_frame(layer, version), layer, z, x, y)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._prune(layer, version)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(tile)
+        os.replace(tmp_path, path)
+        return tile, version